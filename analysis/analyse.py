@@ -2,22 +2,49 @@
 
 Analyses the data obtained by the crawler following the description of the assignment.
 """
-from collections import Counter
+import argparse
+import cache
 from colors import *
-import glob
+from concurrent.futures import ProcessPoolExecutor
+from crawl_files import iter_records, list_crawl_files
+import database
 from itertools import chain
-import json
+from lazy_requests import iter_request_rows, project_requests
 import os
 import re
+import sys
+from statistics import NormalDist
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 from operator import itemgetter
+from streaming import PrevalenceAggregator
+from summary import count_values, summarise
+from tracker_tags import TrackerTags, read_blocklist_rules
 from tld import get_fld
 from urllib.parse import urlparse
 
+# Locations of the input data and of the generated tables and plots (relative to the analysis directory)
+BLOCKLIST_PATH = "data/disconnect_blocklist.json"
+CRAWL_DATA_DIR = "../crawl_data"
+OUTPUT_DIR = "data"
+
+# The number of processes rendering the figures in parallel (0 renders them one after another in the main process)
+FIGURE_WORKERS = os.cpu_count() or 0
+# The fit of the regression line in the scatter plots: "bootstrap" lets seaborn bootstrap the confidence interval
+# (SCATTER_N_BOOT times), "analytic" precomputes the least-squares fit and its confidence interval in closed form
+SCATTER_FIT = "bootstrap"
+SCATTER_CI = 95
+SCATTER_N_BOOT = 1000
+# The number of keys monitored per prevalence counter, None counts every distinct key exactly
+PREVALENCE_CAPACITY = None
+
+figure_pool = None
+pending_figures = []
+
 
 def read_blocklist():
     """Read all domains and their corresponding entities from the blocklist into a set
@@ -27,87 +54,7 @@ def read_blocklist():
     dict
         A dictionary with domains of trackers as key and the corresponding entity name as the value
     """
-    with open("data/disconnect_blocklist.json", 'rb') as f:
-        blocklist = json.load(f)
-
-    # Add every domain in the blocklist to a set
-    tracker_domains = dict()
-
-    for cat in blocklist['categories'].keys():
-        for item in blocklist['categories'][cat]:
-            for entityname, urls in item.items():
-                for url, domains in urls.items():
-                    if url == "performance":
-                        continue
-                    for domain in domains:
-                        tracker_domains[domain] = entityname
-    return tracker_domains
-
-
-def domain_in_blocklist(tracker_domains, domain):
-    """Check whether `domain` is present in the set of tracker domains
-
-    Parameters
-    ----------
-    tracker_domains: set
-        A set of domains that are present in the blocklist
-    domain: str
-        The domain that needs to be checked
-
-    Returns
-    -------
-    bool
-        A boolean indicating whether the domain is present in the blocklist or not
-    """
-    if domain in tracker_domains:
-        return domain, True
-
-    # Check up to four domains formed by starting with the least five components
-    # Following the example of Mozilla's trackingprotection-tools library:
-    # (https://github.com/mozilla/trackingprotection-tools/blob/a55109119f0f66ddda92c133cee1d8ee31b64da9/trackingprotection_tools/DisconnectParser.py#L315)
-    domain = ".".join(domain.rsplit(".", 5)[1:])
-    count = 0
-    while domain != "":
-        count += 1
-        if count > 4:
-            return None, False
-        if domain in tracker_domains:
-            return domain, True
-        try:
-            domain = domain.split(".", 1)[1]
-        except IndexError:
-            return None, False
-    return None, False
-
-
-def extract_tracker_domains_entities(third_party_domains, blocklist, blocklist_domains):
-    """Extract tracker domains and their corresponding entity name from a list of third-party domains
-        using a blocklist
-
-    Parameters
-    ----------
-    third_party_domains: set
-        A set with all distinct third-party domains for a request
-    blocklist: dict
-        A dictionary with the domains and their corresponding entity names from the blocklist
-    blocklist_domains: set
-        A set of domains that are present in the blocklist
-
-    Returns
-    -------
-    tracker_domains: set
-        A set of all (distinct) tracker domains for a request
-    tracker_entities: set
-        A set of all (distinct) tracker entities for a request
-    """
-    # Store the domains that are present in the blocklist in order to match them with the entity later
-    domains = list(filter(None, [domain_in_blocklist(blocklist_domains, d)[0] for d in third_party_domains]))
-
-    # Store the sets with (distinct) tracker domains and their corresponding entities
-    tracker_domains = {domain for domain in third_party_domains if domain_in_blocklist(blocklist_domains, domain)[1]}
-    tracker_entities = {blocklist[domain] for domain in domains}
-
-    return tracker_domains, tracker_entities
+    return {domain: entity for domain, (entity, _) in read_blocklist_rules(BLOCKLIST_PATH).items()}
 
 
 def calculate_page_load_time(start_time, end_time):
@@ -132,92 +79,345 @@ def calculate_page_load_time(start_time, end_time):
     return page_load_time
 
 
-def write_data_to_dataframe(headers, blocklist, blocklist_domains):
-    """Writes the data from the JSON files for all the crawled websites to a CSV file
+# All columns of the dataframe with the crawl data, in the order they are stored in. The requests themselves are not
+# part of it, the questions that need them declare the request fields they use (see lazy_requests.py)
+COLUMNS = ["website_domain", "tranco_rank", "crawl_mode", "pageload_start_ts", "pageload_end_ts", "page_load_time",
+           "post_pageload_url", "consent_status", "cookies", "third_party_domains", "nr_third_party_domains",
+           "nr_requests", "tracker_domains", "nr_tracker_domains", "tracker_entities", "nr_tracker_entities",
+           "redirection_pairs"]
+# The columns that are derived using the blocklist, these need to be recomputed whenever the blocklist changes
+TRACKER_COLUMNS = {"tracker_domains", "nr_tracker_domains", "tracker_entities", "nr_tracker_entities"}
+# The columns the tracker columns and targets are derived from with the tracker tags
+TRACKER_BASE_COLUMNS = ["crawl_mode", "third_party_domains", "redirection_pairs"]
+# Functions that extract a column from a JSON file, `trackers` holds the tracker domains and entities of the website
+COLUMN_EXTRACTORS = {
+    "website_domain": lambda json_file, trackers: json_file['website_domain'],
+    "tranco_rank": lambda json_file, trackers: json_file['tranco_rank'],
+    "crawl_mode": lambda json_file, trackers: json_file['crawl_mode'],
+    "pageload_start_ts": lambda json_file, trackers: json_file['pageload_start_ts'],
+    "pageload_end_ts": lambda json_file, trackers: json_file['pageload_end_ts'],
+    "page_load_time": lambda json_file, trackers: calculate_page_load_time(json_file['pageload_start_ts'],
+                                                                           json_file['pageload_end_ts']),
+    "post_pageload_url": lambda json_file, trackers: json_file['post_pageload_url'],
+    "consent_status": lambda json_file, trackers: json_file['consent_status'],
+    "cookies": lambda json_file, trackers: json_file['cookies'],
+    "third_party_domains": lambda json_file, trackers: json_file['third_party_domains'],
+    "nr_third_party_domains": lambda json_file, trackers: len(json_file['third_party_domains']),
+    "nr_requests": lambda json_file, trackers: len(json_file['requests']),
+    "tracker_domains": lambda json_file, trackers: list(trackers[0]),
+    "nr_tracker_domains": lambda json_file, trackers: len(trackers[0]),
+    "tracker_entities": lambda json_file, trackers: list(trackers[1]),
+    "nr_tracker_entities": lambda json_file, trackers: len(trackers[1]),
+    "redirection_pairs": lambda json_file, trackers: json_file['redirect_pairs']
+}
+# Functions that extract the keys that are counted for a prevalence target from a JSON file, `tags` holds the
+# tracker_tags.TrackerTags of the blocklist
+PREVALENCE_EXTRACTORS = {
+    "third_party_domains": lambda json_file, trackers, tags: json_file['third_party_domains'],
+    "tracker_domains": lambda json_file, trackers, tags: trackers[0],
+    "tracker_entities": lambda json_file, trackers, tags: trackers[1],
+    "tracker_redirection_pairs": lambda json_file, trackers, tags: tracker_redirection_pairs(
+        json_file['redirect_pairs'], tags)
+}
+# The prevalence targets that are derived using the blocklist
+TRACKER_TARGETS = {"tracker_domains", "tracker_entities", "tracker_redirection_pairs"}
+# The columns of the request-level table, holding one row per request of every crawled website. The request_url field is
+# replaced by the request_hostname and first_party columns, the other request fields are kept as they are
+REQUEST_COLUMNS = ["website_domain", "crawl_mode", "request_hostname", "nr_cookies", "first_party"]
+
+
+def tracker_redirection_pairs(redirection_pairs, tags):
+    """Filter the redirection pairs that involve a tracker domain
+
+    Parameters
+    ----------
+    redirection_pairs: list
+        A list with the (source, target) redirection pairs of a website
+    tags: tracker_tags.TrackerTags
+        The tags of the domains and hostnames with the blocklist
+
+    Returns
+    -------
+    list
+        A list with the redirection pairs (as tuples) of which the source or target is a tracker domain
+    """
+    return [tuple(p) for p in redirection_pairs if tags.is_tracker(p[0]) or tags.is_tracker(p[1])]
+
+
+def write_data_to_dataframe(headers, tags, files, aggregator=None, request_rows=None, request_fields=()):
+    """Writes the data from the JSON files for all the crawled websites to a Pandas dataframe
 
     Parameters
     ----------
     headers: list
-        A list with the values for the headers of the data in the JSON files
-    blocklist: dict
-        A dictionary with domains of trackers as key and the corresponding entity name as the value
-    blocklist_domains: set
-        A list of domains that are in the blocklist
+        A list with the columns that need to be extracted from the JSON files
+    tags: tracker_tags.TrackerTags
+        The tags of the domains and hostnames with the blocklist
+    files: list
+        A list with the paths of the crawl files (see crawl_files.py)
+    aggregator: streaming.PrevalenceAggregator, optional
+        An aggregator that is fed with the prevalence targets of every website while the files are read
+    request_rows: list, optional
+        A list that the website domain, crawl mode and `request_fields` of every request are appended to
+    request_fields: list, optional
+        The fields of the requests that are appended to `request_rows`
 
     Returns
     -------
     dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+        A Pandas dataframe with all the data that needs to be analysed, indexed by the path of the JSON file
     err_dataframe: pandas.core.frame.DataFrame
         A Pandas dataframe containing all domains where errors occured
     """
     data = []
+    index = []
     errors = []
+    targets = aggregator.targets if aggregator is not None else set()
+    # Only match the third-party domains against the blocklist if a tracker column or target is requested
+    needs_trackers = bool(TRACKER_COLUMNS.intersection(headers) or {"tracker_domains", "tracker_entities"} & targets)
 
-    # Get all JSON files within the crawl_data folder
-    files = glob.glob("../crawl_data/*.json")
-    for file in files:
-        with open(file, 'r') as f:
-            try:
-                json_file = json.load(f)
-                # If an error occured, only 4 items will be stored in the json file
-                if len(json_file) == 4:
-                    errors.append([json_file['website_domain'],
-                                   json_file['tranco_rank'],
-                                   json_file['crawl_mode'],
-                                   json_file['error']])
-                else:
-                    tracker_domains, tracker_entities = extract_tracker_domains_entities(
-                        json_file['third_party_domains'], blocklist, blocklist_domains)
-                    page_load_time = calculate_page_load_time(json_file['pageload_start_ts'], json_file['pageload_end_ts'])
-                    data.append([json_file['website_domain'],
-                                 json_file['tranco_rank'],
-                                 json_file['crawl_mode'],
-                                 json_file['pageload_start_ts'],
-                                 json_file['pageload_end_ts'],
-                                 page_load_time,
-                                 json_file['post_pageload_url'],
-                                 json_file['consent_status'],
-                                 json_file['cookies'],
-                                 json_file['third_party_domains'],
-                                 len(json_file['third_party_domains']),
-                                 json_file['requests'],
-                                 len(json_file['requests']),
-                                 list(tracker_domains),
-                                 len(tracker_domains),
-                                 list(tracker_entities),
-                                 len(tracker_entities),
-                                 json_file['redirect_pairs']])
-            except KeyError:
-                print(f"Skipping {file} because of bad formatting.")
+    # The visits are decoded one at a time, from a JSON file per domain or from (compressed) JSON Lines streams
+    for source, json_file in iter_records(files):
+        try:
+            # If an error occured, the json file has an error field instead of the visit data
+            if "error" in json_file:
+                errors.append([json_file['website_domain'],
+                               json_file['tranco_rank'],
+                               json_file['crawl_mode'],
+                               json_file['error']])
+            else:
+                trackers = None
+                if needs_trackers:
+                    trackers = tags.trackers(json_file['third_party_domains'])
+                row = [COLUMN_EXTRACTORS[header](json_file, trackers) for header in headers]
+                keys = {target: PREVALENCE_EXTRACTORS[target](json_file, trackers, tags)
+                        for target in targets}
+                data.append(row)
+                index.append(source)
+                for target in targets:
+                    aggregator.add(json_file['crawl_mode'], target, keys[target])
+                if request_rows is not None:
+                    request_rows.extend(project_requests(json_file, request_fields))
+        except KeyError:
+            print(f"Skipping {source} because of bad formatting.")
 
     # Write the data to a Pandas dataframe
-    dataframe = pd.DataFrame(data, columns=headers)
+    dataframe = pd.DataFrame(data, columns=headers, index=index)
     err_dataframe = pd.DataFrame(errors, columns=["website_domain", "tranco_rank", "crawl_mode", "error"])
 
     return dataframe, err_dataframe
 
 
-def preprocess_data():
-    """This function turns the data into a csv file and in turn this csv file to a Pandas dataframe
+def build_request_dataframe(request_rows, request_fields):
+    """Build the request-level table from the requests collected while reading the crawl data
+
+    Parameters
+    ----------
+    request_rows: list
+        A list with the website domain, crawl mode and `request_fields` of every request
+    request_fields: list
+        The fields of the requests that were collected
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe with the columns in REQUEST_COLUMNS that can be derived from the request fields, followed by
+        the other request fields
+    """
+    request_dataframe = pd.DataFrame(request_rows, columns=["website_domain", "crawl_mode"] + list(request_fields))
+    if "request_url" in request_fields:
+        request_dataframe["request_hostname"] = [urlparse(url).hostname for url in request_dataframe["request_url"]]
+
+        # Hostnames repeat a lot, so look up the first-party domain only once for every distinct hostname
+        hostname_domains = {hostname: get_fld(hostname, fix_protocol=True, fail_silently=True)
+                            for hostname in request_dataframe["request_hostname"].dropna().unique()}
+        request_dataframe["first_party"] = \
+            request_dataframe["request_hostname"].map(hostname_domains) == request_dataframe["website_domain"]
+        request_dataframe = request_dataframe.drop(columns="request_url")
+
+    for column in ["website_domain", "crawl_mode", "request_hostname"]:
+        if column in request_dataframe:
+            request_dataframe[column] = request_dataframe[column].astype("category")
+
+    columns = [column for column in REQUEST_COLUMNS if column in request_dataframe]
+    return request_dataframe[columns + [column for column in request_dataframe if column not in columns]]
+
+
+def top_requests(request_dataframe, column, n=1):
+    """Find the `n` requests with the highest value in `column` for every crawl mode, in a single sorting pass
+
+    Parameters
+    ----------
+    request_dataframe: pandas.core.frame.DataFrame
+        The request-level table (see REQUEST_COLUMNS)
+    column: str
+        The column to rank the requests by, e.g., nr_cookies
+    n: int, default=1
+        The number of requests to return per crawl mode
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe with (at most) `n` rows per crawl mode, ties are resolved in favour of the request that was
+        read first
+    """
+    ranked = request_dataframe.sort_values(column, ascending=False, kind="stable")
+    return ranked.groupby("crawl_mode", sort=False, observed=True).head(n)
+
+
+def derive_tracker_data(base_data, headers, targets, tags):
+    """Derive the tracker columns and count the tracker targets from the base columns of the websites
+
+    Parameters
+    ----------
+    base_data: dict
+        The columns in TRACKER_BASE_COLUMNS, indexed by the crawl file (and line) of every website
+    headers: list
+        The tracker columns that need to be derived
+    targets: set
+        The tracker targets that need to be counted
+    tags: tracker_tags.TrackerTags
+        The tags of the domains and hostnames with the blocklist
 
     Returns
     -------
     dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
-    err_dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe containing all domains where errors occured
+        A Pandas dataframe with the tracker columns, with the same index as the base columns
+    aggregator: streaming.PrevalenceAggregator
+        The prevalence counters of the tracker targets
     """
-    headers = ["website_domain", "tranco_rank", "crawl_mode", "pageload_start_ts", "pageload_end_ts", "page_load_time",
-               "post_pageload_url", "consent_status", "cookies", "third_party_domains", "nr_third_party_domains",
-               "requests", "nr_requests", "tracker_domains", "nr_tracker_domains", "tracker_entities",
-               "nr_tracker_entities", "redirection_pairs"]
-    blocklist = read_blocklist()
-    blocklist_domains = set(blocklist.keys())
+    base = pd.concat([base_data[header] for header in TRACKER_BASE_COLUMNS], axis=1, join="inner")
+    aggregator = PrevalenceAggregator(targets, PREVALENCE_CAPACITY)
+    data = []
+    for crawl_mode, third_party_domains, redirection_pairs in base.itertuples(index=False):
+        # The extractors of the columns and targets only need these fields of the JSON file
+        json_file = {"crawl_mode": crawl_mode, "third_party_domains": third_party_domains,
+                     "redirect_pairs": redirection_pairs}
+        trackers = tags.trackers(third_party_domains)
+        data.append([COLUMN_EXTRACTORS[header](json_file, trackers) for header in headers])
+        for target in targets:
+            aggregator.add(crawl_mode, target, PREVALENCE_EXTRACTORS[target](json_file, trackers, tags))
+
+    return pd.DataFrame(data, columns=headers, index=base.index), aggregator
 
-    dataframe, err_dataframe = write_data_to_dataframe(headers, blocklist, blocklist_domains)
 
-    return dataframe, err_dataframe, blocklist_domains
+def preprocess_data(columns=None, targets=None, request_fields=None):
+    """This function turns the data into a Pandas dataframe and prevalence counters, only (re)computing the parts that
+    are not cached yet
+
+    Parameters
+    ----------
+    columns: set, optional
+        The columns that are needed for the analysis, all columns are computed if it is not provided
+    targets: set, optional
+        The prevalence targets that need to be counted, all targets are counted if it is not provided
+    request_fields: list, optional
+        The fields of the requests that are needed for the analysis, the fields used by the questions are loaded if it
+        is not provided and the request-level table is not built if it is empty
+
+    Returns
+    -------
+    dict
+        A dictionary holding the inputs of the questions:
+        - dataframe: a Pandas dataframe with all the data that needs to be analysed
+        - err_dataframe: a Pandas dataframe containing all domains where errors occured
+        - blocklist_domains: a set of domains that are present in the blocklist
+        - prevalence_counters: the prevalence counters (streaming.PrevalenceAggregator) of the targets per crawl mode
+        - request_dataframe: the request-level table (see REQUEST_COLUMNS), or None if it is not needed
+    """
+    headers = [header for header in COLUMNS if columns is None or header in columns]
+    targets = set(PREVALENCE_EXTRACTORS) if targets is None else set(targets)
+    if request_fields is None:
+        request_fields = required_inputs(QUESTIONS, "request_fields")
+    request_fields = sorted(request_fields)
+    tags = TrackerTags(BLOCKLIST_PATH)
+
+    # The cache keys change whenever a crawl data file or the blocklist changes
+    files = list_crawl_files(CRAWL_DATA_DIR)
+    data_key = cache.fingerprint_files(files)
+    tracker_key = cache.combine_keys(data_key, tags.version)
+
+    # Load the columns and counters that were already computed in a previous run
+    columns_data = {}
+    for header in headers:
+        hit, column = cache.load(f"column_{header}", tracker_key if header in TRACKER_COLUMNS else data_key)
+        if hit:
+            columns_data[header] = column
+    prevalence_counters = PrevalenceAggregator(targets, PREVALENCE_CAPACITY)
+    counter_names = {target: f"prevalence_{target}_{PREVALENCE_CAPACITY or 'exact'}" for target in targets}
+    missing_targets = set()
+    for target in targets:
+        hit, counters = cache.load(counter_names[target], tracker_key if target in TRACKER_TARGETS else data_key)
+        if hit:
+            prevalence_counters.counters[target] = counters
+        else:
+            missing_targets.add(target)
+    request_dataframe = None
+    request_table_name = f"request_table_{'_'.join(request_fields)}"
+    if request_fields:
+        _, request_dataframe = cache.load(request_table_name, data_key)
+    errors_hit, err_dataframe = cache.load("errors", data_key)
+
+    # The tracker columns and targets are derived from the (cached) base columns with the tracker tags, so a change of
+    # the blocklist does not require parsing the crawl data again
+    missing_headers = [header for header in headers if header not in columns_data]
+    missing_tracker_headers = [header for header in missing_headers if header in TRACKER_COLUMNS]
+    missing_tracker_targets = missing_targets & TRACKER_TARGETS
+    missing_headers = [header for header in missing_headers if header not in TRACKER_COLUMNS]
+    missing_targets = missing_targets - TRACKER_TARGETS
+    base_data = {}
+    if missing_tracker_headers or missing_tracker_targets:
+        for header in TRACKER_BASE_COLUMNS:
+            if header in columns_data:
+                base_data[header] = columns_data[header]
+                continue
+            hit_base, column = cache.load(f"column_{header}", data_key)
+            if hit_base:
+                base_data[header] = column
+            elif header not in missing_headers:
+                missing_headers.append(header)
+
+    # Parse the crawl data only for the columns and counters that are missing
+    missing_request_table = bool(request_fields) and request_dataframe is None
+    request_rows = [] if missing_request_table else None
+    if missing_headers or missing_targets or not errors_hit:
+        aggregator = PrevalenceAggregator(missing_targets, PREVALENCE_CAPACITY)
+        # The projected requests are collected in the same pass if the request-level table is missing as well
+        dataframe, err_dataframe = write_data_to_dataframe(missing_headers, tags, files, aggregator, request_rows,
+                                                           request_fields)
+        for header in missing_headers:
+            columns_data[header] = base_data[header] = dataframe[header]
+            cache.store(f"column_{header}", data_key, dataframe[header])
+        for target in missing_targets:
+            prevalence_counters.counters[target] = aggregator.counters[target]
+            cache.store(counter_names[target], data_key, aggregator.counters[target])
+        cache.store("errors", data_key, err_dataframe)
+    elif missing_request_table:
+        # Only the request-level table is missing, so only the projected requests are read
+        request_rows.extend(iter_request_rows(files, request_fields))
+    if missing_request_table:
+        request_dataframe = build_request_dataframe(request_rows, request_fields)
+        cache.store(request_table_name, data_key, request_dataframe)
+
+    if missing_tracker_headers or missing_tracker_targets:
+        tracker_dataframe, aggregator = derive_tracker_data(base_data, missing_tracker_headers,
+                                                            missing_tracker_targets, tags)
+        for header in missing_tracker_headers:
+            columns_data[header] = tracker_dataframe[header]
+            cache.store(f"column_{header}", tracker_key, tracker_dataframe[header])
+        for target in missing_tracker_targets:
+            prevalence_counters.counters[target] = aggregator.counters[target]
+            cache.store(counter_names[target], tracker_key, aggregator.counters[target])
+        tags.save()
+
+    if headers:
+        dataframe = pd.concat([columns_data[header] for header in headers], axis=1, join="inner")
+    else:
+        dataframe = pd.DataFrame()
+    dataframe = dataframe.reset_index(drop=True)
+
+    return {"dataframe": dataframe, "err_dataframe": err_dataframe, "blocklist_domains": set(tags.rules),
+            "prevalence_counters": prevalence_counters, "request_dataframe": request_dataframe}
 
 
 def generate_entry_table_question_1(header):
@@ -226,19 +426,18 @@ def generate_entry_table_question_1(header):
     Parameters
     ----------
     header: tuple
-        A tuple holding the header name and value that need to be filtered, the belonging text that should appear
-            in the entry and the dataframe that the data should be filtered from
+        A tuple holding the value that needs to be counted, the belonging text that should appear in the entry and the
+            number of websites per crawl mode and value (see summary.count_values) that the count is taken from
 
     Returns
     -------
     string
         A string that holds the precise entry text that will be added in the table
     """
-    target, val, text, df = header
-    err_desktop = df[(df['crawl_mode'] == "Desktop") & (df[target] == val)]
-    err_mobile = df[(df['crawl_mode'] == "Mobile") & (df[target] == val)]
+    val, text, counts = header
+    counts = counts.reindex(index=["Desktop", "Mobile"], columns=[val], fill_value=0)[val]
 
-    entry = "%s & %s & %s \\\\ \hline \n" % (text, len(err_desktop), len(err_mobile))
+    entry = "%s & %s & %s \\\\ \hline \n" % (text, counts["Desktop"], counts["Mobile"])
 
     return entry
 
@@ -253,16 +452,19 @@ def generate_table_question_1(dataframe, err_dataframe):
     err_dataframe: pandas.core.frame.DataFrame
         A Pandas dataframe containing all domains where errors occured
     """
+    # The number of websites per crawl mode and error and per crawl mode and consent status, counted in one pass each
+    error_counts = count_values(err_dataframe, "error")
+    consent_counts = count_values(dataframe, "consent_status")
     # # A list of tuples holding the error and text that should appear in the table for that error
-    headers = [("error", "Timeout", "Page load timeout", err_dataframe), ("error", "TLS", "TLS error", err_dataframe),
-               ("consent_status", "errored", "Consent click error", dataframe)]
+    headers = [("Timeout", "Page load timeout", error_counts), ("TLS", "TLS error", error_counts),
+               ("errored", "Consent click error", consent_counts)]
 
     # Remove the file if it is already existing
-    if os.path.isfile("data/table_question_1.tex"):
-        os.remove("data/table_question_1.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_1.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_1.tex")
 
     # Open the file and write to it
-    file = open("data/table_question_1.tex", "a")
+    file = open(f"{OUTPUT_DIR}/table_question_1.tex", "a")
     file.write("\\begin{table}[ht] \n")
     file.write("\caption{Number of failures encountered during each crawl.} \n")
     file.write("\centering \n")
@@ -341,6 +543,65 @@ def customize_box_plot_color(ax):
         flier.set(color=BOX_EDGECOLOR[i], marker='o')
 
 
+def init_figure_worker(output_dir, scatter_ci, scatter_n_boot):
+    """Prepare a worker process for rendering figures with a non-interactive backend
+
+    Parameters
+    ----------
+    output_dir: str
+        The directory the figures are written to
+    scatter_ci: int
+        The size of the confidence interval of the scatter plot regressions
+    scatter_n_boot: int
+        The number of bootstrap samples for the confidence interval of the scatter plot regressions
+    """
+    global OUTPUT_DIR, SCATTER_CI, SCATTER_N_BOOT
+    OUTPUT_DIR, SCATTER_CI, SCATTER_N_BOOT = output_dir, scatter_ci, scatter_n_boot
+    plt.switch_backend("Agg")
+    sns.set_theme(color_codes=True)
+
+
+def render_figure(function, *args):
+    """Render a figure in the pool of figure workers, or directly if no workers are used
+
+    Parameters
+    ----------
+    function: callable
+        The function that renders and saves the figure
+    args:
+        The arguments of the function, these should only hold the data needed for the figure
+    """
+    global figure_pool
+
+    if FIGURE_WORKERS <= 1:
+        function(*args)
+        return
+
+    if figure_pool is None:
+        figure_pool = ProcessPoolExecutor(max_workers=FIGURE_WORKERS, initializer=init_figure_worker,
+                                          initargs=(OUTPUT_DIR, SCATTER_CI, SCATTER_N_BOOT))
+    pending_figures.append(figure_pool.submit(function, *args))
+
+
+def wait_for_figures():
+    """Wait until all figures that were dispatched to the figure workers have been saved
+    """
+    while pending_figures:
+        # Raises the exception of the worker if rendering the figure failed
+        pending_figures.pop(0).result()
+
+
+def shutdown_figure_pool():
+    """Wait for all dispatched figures and stop the figure workers
+    """
+    global figure_pool
+
+    wait_for_figures()
+    if figure_pool is not None:
+        figure_pool.shutdown()
+        figure_pool = None
+
+
 def generate_box_plot(dataframe, header, crawl_mode, metric):
     """Generate a box plot for dataframe[header] grouped by crawl_mode
 
@@ -362,7 +623,7 @@ def generate_box_plot(dataframe, header, crawl_mode, metric):
     plt.suptitle("")  # Remove the automatic "grouped by" title
     plt.xlabel("Crawl mode")
     plt.ylabel(metric.capitalize())
-    plt.savefig(f"data/box_plot_{header}.png", bbox_inches='tight')
+    plt.savefig(f"{OUTPUT_DIR}/box_plot_{header}.png", bbox_inches='tight')
     # plt.show()
     plt.close()
 
@@ -375,20 +636,24 @@ def generate_box_plots_question_2(dataframe):
     dataframe: pandas.core.frame.DataFrame
         A Pandas dataframe with all the data that needs to be analysed
     """
-    generate_box_plot(dataframe, "page_load_time", "crawl_mode", "page load time")
-    generate_box_plot(dataframe, "nr_requests", "crawl_mode", "number of requests")
-    generate_box_plot(dataframe, "nr_third_party_domains", "crawl_mode", "number of disctinct third-party domains")
-    generate_box_plot(dataframe, "nr_tracker_domains", "crawl_mode", "number of disctinct tracker domains")
-    generate_box_plot(dataframe, "nr_tracker_entities", "crawl_mode", "number of disctinct tracker entities")
+    box_plots = [("page_load_time", "page load time"),
+                 ("nr_requests", "number of requests"),
+                 ("nr_third_party_domains", "number of disctinct third-party domains"),
+                 ("nr_tracker_domains", "number of disctinct tracker domains"),
+                 ("nr_tracker_entities", "number of disctinct tracker entities")]
+
+    for header, metric in box_plots:
+        # Only send the columns that are plotted to the figure worker
+        render_figure(generate_box_plot, dataframe[["crawl_mode", header]], header, "crawl_mode", metric)
 
 
-def generate_entry_table_question_3(dataframe, header):
+def generate_entry_table_question_3(summary, header):
     """Generate a header specific entry for the table about the comparison of desktop and mobile crawl data
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    summary: pandas.core.frame.DataFrame
+        The summary statistics of the metrics per crawl mode (see summary.summarise)
     header: tuple
         A tuple holding the header name and belonging text that should appear in the entry
 
@@ -397,16 +662,10 @@ def generate_entry_table_question_3(dataframe, header):
     string
         A string that holds the precise entry text that will be added in the table
     """
-    # Sort the CSV data by crawl_mode and then by the value of the provided header
-    df = dataframe.sort_values(['crawl_mode', header[0]]).groupby('crawl_mode')
-
     # Get the minimum, maximum and median values for each provided header
-    min_desktop = df[header[0]].min()[0]
-    max_desktop = df[header[0]].max()[0]
-    median_desktop = df[header[0]].median()[0]
-    min_mobile = df[header[0]].min()[1]
-    max_mobile = df[header[0]].max()[1]
-    median_mobile = df[header[0]].median()[1]
+    statistics = summary[header[0]]
+    min_desktop, max_desktop, median_desktop = [statistics.at["Desktop", stat] for stat in ["min", "max", "median"]]
+    min_mobile, max_mobile, median_mobile = [statistics.at["Mobile", stat] for stat in ["min", "max", "median"]]
 
     entry = "%s & \multicolumn{1}{r|}{%s} & \multicolumn{1}{r|}{%s} & \multicolumn{1}{r|}{%s} & \multicolumn{1}{r|}{%s} & \multicolumn{1}{r|}{%s} & \multicolumn{1}{r|}{%s} \\\\ \hline \n" % (
         header[1], min_desktop, max_desktop, median_desktop, min_mobile, max_mobile, median_mobile)
@@ -427,13 +686,15 @@ def generate_table_question_3(dataframe):
                ("nr_third_party_domains", "\# distinct third parties"),
                ("nr_tracker_domains", "\# distinct tracker domains"),
                ("nr_tracker_entities", "\# distinct tracker entities/companies")]
+    # The statistics of all metrics are computed at once
+    summary = summarise(dataframe, [header[0] for header in headers])
 
     # Remove the file if it is already existing
-    if os.path.isfile("data/table_question_3.tex"):
-        os.remove("data/table_question_3.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_3.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_3.tex")
 
     # Open the file and write to it
-    file = open("data/table_question_3.tex", "a")
+    file = open(f"{OUTPUT_DIR}/table_question_3.tex", "a")
     file.write("\\begin{table}[ht] \n")
     file.write("\caption{Comparison of the desktop and mobile crawl data.} \n")
     file.write("\centering \n")
@@ -445,7 +706,7 @@ def generate_table_question_3(dataframe):
         "\\textbf{Metric} & \multicolumn{1}{r|}{\\textbf{Min}} & \multicolumn{1}{r|}{\\textbf{Max}} & \\textbf{Median} & \multicolumn{1}{l|}{\\textbf{Min}} & \multicolumn{1}{l|}{\\textbf{Max}} & \\textbf{Median} \\\\ \hline \n")
 
     for header in headers:
-        entry = generate_entry_table_question_3(dataframe, header)
+        entry = generate_entry_table_question_3(summary, header)
         file.write(entry)
 
     file.write("\end{tabular} \n")
@@ -456,34 +717,6 @@ def generate_table_question_3(dataframe):
     file.close()
 
 
-def prevalence(dataframe, mode, target):
-    """Find the prevalence of the targeted group in the crawl
-
-    Parameters
-    ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
-    mode: string
-        A string that holds the crawl-mode to use: either desktop or mobile
-    target: string
-        The group that the prevalence needs to be found for, e.g., third-party domains
-
-    Returns
-    -------
-    collections.Counter
-        A counter object, holding a dictionary of all items of the targeted group (as keys)
-        and their prevalence (as values) in the crawl
-    """
-    # Collect all items belonging to the target group for the (desktop or mobile) crawl
-    third_parties = dataframe.loc[dataframe["crawl_mode"] == mode, target]
-    # Turn the pandas series into a list and flatten it
-    third_parties_list = list(chain.from_iterable(third_parties))
-    # Use Python Counter to return the count of every element in the list
-    counter_third_parties = Counter(third_parties_list)
-
-    return counter_third_parties
-
-
 def generate_table_question(questionnr, target, top_ten_desktop, top_ten_mobile, label=""):
     """Generate a LaTeX table for questions 4, 5 and 6
 
@@ -499,11 +732,11 @@ def generate_table_question(questionnr, target, top_ten_desktop, top_ten_mobile,
         The top ten prevalent instances of the target for the mobile crawl mode
     """
     # Remove the file if it is already existing
-    if os.path.isfile(f"data/table_question_{questionnr}.tex"):
-        os.remove(f"data/table_question_{questionnr}.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_{questionnr}.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_{questionnr}.tex")
 
     # Open the file and write to it
-    file = open(f"data/table_question_{questionnr}.tex", 'a')
+    file = open(f"{OUTPUT_DIR}/table_question_{questionnr}.tex", 'a')
     file.write("\\begin{table}[ht] \n")
     file.write("\caption{The ten most prevalent %ss for each crawl.} \n" % (re.sub(r'y$', r'ie', target)))
     file.write("\centering \n")
@@ -532,48 +765,84 @@ def generate_table_question(questionnr, target, top_ten_desktop, top_ten_mobile,
     file.close()
 
 
-def generate_table_question_4(dataframe):
+def generate_table_question_4(prevalence_counters):
     """Generate a LaTeX table holding the ten most prevalent third-party domains for each crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    prevalence_counters: streaming.PrevalenceAggregator
+        The prevalence counters of the targets per crawl mode
     """
-    top_ten_desktop = prevalence(dataframe, "Desktop", "third_party_domains").most_common(10)
-    top_ten_mobile = prevalence(dataframe, "Mobile", "third_party_domains").most_common(10)
+    top_ten_desktop = prevalence_counters.most_common("Desktop", "third_party_domains", 10)
+    top_ten_mobile = prevalence_counters.most_common("Mobile", "third_party_domains", 10)
 
     generate_table_question(4, "third-party domain", top_ten_desktop, top_ten_mobile)
 
 
-def generate_table_question_5(dataframe):
+def generate_table_question_5(prevalence_counters):
     """Generate a LaTeX table holding the ten most prevalent third-party tracker domains for each crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    prevalence_counters: streaming.PrevalenceAggregator
+        The prevalence counters of the targets per crawl mode
     """
-    top_ten_tracker_desktop = prevalence(dataframe, "Desktop", "tracker_domains").most_common(10)
-    top_ten_tracker_mobile = prevalence(dataframe, "Mobile", "tracker_domains").most_common(10)
+    top_ten_tracker_desktop = prevalence_counters.most_common("Desktop", "tracker_domains", 10)
+    top_ten_tracker_mobile = prevalence_counters.most_common("Mobile", "tracker_domains", 10)
 
     generate_table_question(5, "tracker domain", top_ten_tracker_desktop, top_ten_tracker_mobile)
 
 
-def generate_table_question_6(dataframe):
+def generate_table_question_6(prevalence_counters):
     """Generate a LaTeX table holding the ten most prevalent tracker entities (companies) for each crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    prevalence_counters: streaming.PrevalenceAggregator
+        The prevalence counters of the targets per crawl mode
     """
-    top_ten_entities_desktop = prevalence(dataframe, "Desktop", "tracker_entities").most_common(10)
-    top_ten_entities_mobile = prevalence(dataframe, "Mobile", "tracker_entities").most_common(10)
+    top_ten_entities_desktop = prevalence_counters.most_common("Desktop", "tracker_entities", 10)
+    top_ten_entities_mobile = prevalence_counters.most_common("Mobile", "tracker_entities", 10)
     generate_table_question(6, "tracker entity", top_ten_entities_desktop, top_ten_entities_mobile)
 
 
-def generate_scatter_plot(dataframe, mode, png_text, plot_text, target):
+def fit_regression(x, y, ci):
+    """Compute the least-squares regression line and its confidence interval in closed form
+
+    Parameters
+    ----------
+    x: numpy.ndarray
+        The values on the x-axis
+    y: numpy.ndarray
+        The values on the y-axis
+    ci: int
+        The size of the confidence interval in percent, 0 for no confidence interval
+
+    Returns
+    -------
+    grid: numpy.ndarray
+        The x values the regression line is evaluated at
+    y_hat: numpy.ndarray
+        The values of the regression line
+    lower, upper: numpy.ndarray
+        The bounds of the confidence interval of the regression line, or None if ci is 0
+    """
+    grid = np.linspace(x.min(), x.max(), 100)
+    slope, intercept = np.polyfit(x, y, 1)
+    y_hat = intercept + slope * grid
+    if not ci or len(x) < 3:
+        return grid, y_hat, None, None
+
+    # Standard error of the mean prediction of ordinary least squares
+    residuals = y - (intercept + slope * x)
+    sigma = np.sqrt(np.sum(residuals ** 2) / (len(x) - 2))
+    standard_error = sigma * np.sqrt(1 / len(x) + (grid - x.mean()) ** 2 / np.sum((x - x.mean()) ** 2))
+    z = NormalDist().inv_cdf(0.5 + ci / 200)
+
+    return grid, y_hat, y_hat - z * standard_error, y_hat + z * standard_error
+
+
+def generate_scatter_plot(dataframe, mode, png_text, plot_text, target, fit=None):
     """Generate scatter plots of the provided data along with a linear regression line
 
     Parameters
@@ -588,19 +857,53 @@ def generate_scatter_plot(dataframe, mode, png_text, plot_text, target):
         A string that holds information on how to name the text on the y-axis
     target: string
         The group that the scatter plot needs to plot
+    fit: tuple, optional
+        A precomputed regression line (see `fit_regression`), seaborn fits the line itself if it is not provided
     """
     # Make a dataframe with the columns tranco rank and number of third party domains filtered on crawl mode
     df = dataframe.loc[dataframe["crawl_mode"] == mode, ["tranco_rank", target]].rename(
         columns={"tranco_rank": "Website's Tranco rank", target: plot_text})
 
     # Make the scatter plot
-    sns.lmplot(x="Website's Tranco rank", y=plot_text, data=df)
+    if fit is None:
+        sns.lmplot(x="Website's Tranco rank", y=plot_text, data=df, ci=SCATTER_CI or None, n_boot=SCATTER_N_BOOT)
+    else:
+        grid = sns.lmplot(x="Website's Tranco rank", y=plot_text, data=df, fit_reg=False)
+        x, y_hat, lower, upper = fit
+        color = sns.color_palette()[0]
+        grid.ax.plot(x, y_hat, color=color, linewidth=2)
+        if lower is not None:
+            grid.ax.fill_between(x, lower, upper, facecolor=color, alpha=.15)
     plt.title(f"The {plot_text.lower()} vs the website's Tranco rank ({mode}-crawl)")
-    plt.savefig(f"data/scatter_plot_{png_text}_{mode}.png", bbox_inches='tight')
+    plt.savefig(f"{OUTPUT_DIR}/scatter_plot_{png_text}_{mode}.png", bbox_inches='tight')
     # plt.show()  # use plt.show(block=True) if the window closes too soon
     plt.close()
 
 
+def generate_scatter_plots(dataframe, png_text, plot_text, target):
+    """Dispatch the desktop and mobile scatter plots of `target` vs the website's Tranco rank to the figure workers
+
+    Parameters
+    ----------
+    dataframe: pandas.core.frame.DataFrame
+        A Pandas dataframe with all the data that needs to be analysed
+    png_text: string
+        A string that holds information on how to name the output .png file
+    plot_text: string
+        A string that holds information on how to name the text on the y-axis
+    target: string
+        The group that the scatter plot needs to plot
+    """
+    for mode in ["Desktop", "Mobile"]:
+        # Only send the rows and columns that are plotted to the figure worker
+        df = dataframe.loc[dataframe["crawl_mode"] == mode, ["crawl_mode", "tranco_rank", target]]
+        fit = None
+        if SCATTER_FIT == "analytic":
+            fit = fit_regression(df["tranco_rank"].to_numpy(dtype=float), df[target].to_numpy(dtype=float),
+                                 SCATTER_CI)
+        render_figure(generate_scatter_plot, df, mode, png_text, plot_text, target, fit)
+
+
 def generate_scatter_plots_question_7(dataframe):
     """Generate the scatter plots showing the number of distinct third parties vs the website's Tranco rank
 
@@ -609,8 +912,7 @@ def generate_scatter_plots_question_7(dataframe):
     dataframe: pandas.core.frame.DataFrame
         A Pandas dataframe with all the data that needs to be analysed
     """
-    generate_scatter_plot(dataframe, "Desktop", "third_parties", "Number of distinct third parties", "nr_third_party_domains")
-    generate_scatter_plot(dataframe, "Mobile", "third_parties", "Number of distinct third parties", "nr_third_party_domains")
+    generate_scatter_plots(dataframe, "third_parties", "Number of distinct third parties", "nr_third_party_domains")
 
 
 def generate_scatter_plots_question_8(dataframe):
@@ -621,57 +923,33 @@ def generate_scatter_plots_question_8(dataframe):
     dataframe: pandas.core.frame.DataFrame
         A Pandas dataframe with all the data that needs to be analysed
     """
-    generate_scatter_plot(dataframe, "Desktop", "trackers", "Number of distinct trackers", "nr_tracker_domains")
-    generate_scatter_plot(dataframe, "Mobile", "trackers", "Number of distinct trackers", "nr_tracker_domains")
+    generate_scatter_plots(dataframe, "trackers", "Number of distinct trackers", "nr_tracker_domains")
 
 
-def find_request_with_most_cookies(dataframe, mode):
-    """Find the request (and website domain) with the most number of cookies
+def find_request_with_most_cookies(request_dataframe):
+    """Find the request (and website domain) with the most number of cookies for every crawl mode
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
-    mode: string
-        A string that holds the crawl-mode to use: either desktop or mobile
+    request_dataframe: pandas.core.frame.DataFrame
+        The request-level table (see REQUEST_COLUMNS)
 
     Returns
     -------
-    request_hostname: string
-        A string holding the hostname of the request
-    website: string
-        A string holding the website domain belonging to the request
-    most_number_of_cookies: int
-        An integer holding the number of cookies set by the request
+    pandas.core.frame.DataFrame
+        A Pandas dataframe indexed by crawl mode, holding the hostname of the request, the website domain belonging to
+        the request, the number of cookies set by the request and whether it is a first-party request
     """
-    # reset_index(drop=True) resets the indices from 0 to the length of the number of entries in the
-    # dataframe that correspond to the right crawl mode
-    requests = dataframe.loc[dataframe["crawl_mode"] == mode, "requests"].reset_index(drop=True)
-    website_domain = dataframe.loc[dataframe["crawl_mode"] == mode, "website_domain"].reset_index(drop=True)
-    most_number_of_cookies = 0
-    request_hostname = ""
-    website = ""
-
-    # Search through all requests in the requests_list for the most cookies
-    for i, requests_domain in enumerate(requests):
-        for request in requests_domain:
-            request_url = request.get("request_url")
-            nr_cookies = request.get("nr_cookies")
-            if most_number_of_cookies < nr_cookies:
-                most_number_of_cookies = nr_cookies
-                request_hostname = urlparse(request_url).hostname
-                website = website_domain[i]
-
-    return request_hostname, website, most_number_of_cookies
-
-
-def generate_entry_table_question_9(dataframe, mode):
+    return top_requests(request_dataframe, "nr_cookies").set_index("crawl_mode")
+
+
+def generate_entry_table_question_9(request, mode):
     """Generate a header specific entry for the table about the request with the most cookies
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    request: pandas.core.series.Series
+        The row of the request-level table holding the request with the most cookies
     mode: string
         A string that holds the crawl-mode to use: either desktop or mobile
 
@@ -680,33 +958,33 @@ def generate_entry_table_question_9(dataframe, mode):
     string
         A string that holds the precise entry text that will be added in the table
     """
-    request_hostname, website, most_number_of_cookies = find_request_with_most_cookies(dataframe, mode)
-
     # Check if the request hostname matches the website domain and set first_party accordingly
-    if get_fld(request_hostname, fix_protocol=True) == website:
-        first_party = "Yes"
-    else:
-        first_party = "No"
+    first_party = "Yes" if request["first_party"] else "No"
 
-    entry = "\\textbf{%s} & %s & %s & %s & %s \\\\ \hline \n" % (mode, request_hostname, website, most_number_of_cookies, first_party)
+    entry = "\\textbf{%s} & %s & %s & %s & %s \\\\ \hline \n" % (mode, request["request_hostname"],
+                                                                  request["website_domain"], request["nr_cookies"],
+                                                                  first_party)
 
     return entry
 
 
-def generate_table_question_9(dataframe):
+def generate_table_question_9(request_dataframe):
     """Generate a LaTeX table holding the request with the most cookies for each crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    request_dataframe: pandas.core.frame.DataFrame
+        The request-level table (see REQUEST_COLUMNS)
     """
+    # Find the request with the most cookies for both crawl modes at once
+    most_cookies = find_request_with_most_cookies(request_dataframe)
+
     # Remove the file if it is already existing
-    if os.path.isfile(f"data/table_question_9.tex"):
-        os.remove(f"data/table_question_9.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_9.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_9.tex")
 
     # Open the file and write to it
-    file = open(f"data/table_question_9.tex", 'a')
+    file = open(f"{OUTPUT_DIR}/table_question_9.tex", 'a')
     file.write("\\begin{table}[ht] \n")
     file.write("\caption{Request with the most cookies for the desktop and mobile crawl.} \n")
     file.write("\centering \n")
@@ -716,11 +994,12 @@ def generate_table_question_9(dataframe):
         "\\textbf{Crawl} & \\textbf{Request hostname} & \\textbf{Website} & " +
         "\multicolumn{1}{l|}{\\textbf{\# cookies}} & \multicolumn{1}{l|}{\\textbf{First-party request}} \\\\ \hline \n")
 
-    # Write the data for the request with the most cookies to the file
-    entry_desktop = generate_entry_table_question_9(dataframe, "Desktop")
-    file.write(entry_desktop)
-    entry_mobile = generate_entry_table_question_9(dataframe, "Mobile")
-    file.write(entry_mobile)
+    # Write the data for the request with the most cookies to the file, a crawl mode without any successful request
+    # gets an empty row
+    no_request = pd.Series({"request_hostname": "", "website_domain": "", "nr_cookies": 0, "first_party": False})
+    for mode in ["Desktop", "Mobile"]:
+        request = most_cookies.loc[mode] if mode in most_cookies.index else no_request
+        file.write(generate_entry_table_question_9(request, mode))
 
     file.write("\end{tabular} \n")
     file.write("\label{tab:mostcookies} \n")
@@ -863,11 +1142,11 @@ def generate_table_question_10(dataframe, mode):
         The crawl mode for which the table needs to be generated
     """
     # Remove the file if it is already existing
-    if os.path.isfile(f"data/table_question_10_{mode.lower()}.tex"):
-        os.remove(f"data/table_question_10_{mode.lower()}.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_10_{mode.lower()}.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_10_{mode.lower()}.tex")
 
     # Open the file and write to it
-    file = open(f"data/table_question_10_{mode.lower()}.tex", 'a')
+    file = open(f"{OUTPUT_DIR}/table_question_10_{mode.lower()}.tex", 'a')
     file.write("\\begin{table}[!htbp] \n")
     file.write("\caption{Three cookies with the longest lifespan in the %s crawl.} \n" % mode)
     file.write("\centering \n")
@@ -891,30 +1170,23 @@ def generate_table_question_10(dataframe, mode):
     file.close()
 
 
-def top_ten_tracker_redirection_pairs(dataframe, mode, tracker_domains):
+def top_ten_tracker_redirection_pairs(prevalence_counters, mode):
     """Generate a list holding the ten most prevalent cross-domain HTTP redirection pairs for the `mode` crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
+    prevalence_counters: streaming.PrevalenceAggregator
+        The prevalence counters of the targets per crawl mode
     mode: str
         The crawl mode for which the list needs to be generated
-    tracker_domains: set
-        A set of all (distinct) tracker domains in the blocklist
 
     Returns:
     --------
     list
         A list with the top ten prevalent cross-domain HTTP redirection pairs
     """
-    # Filter the redirection pairs for the crawl mode
-    pairs = dataframe.loc[dataframe["crawl_mode"] == mode, "redirection_pairs"]
-    # Get all tuples of redirection pairs into a list of tuples
-    pairs_tuples = [tuple(i) for i in list(chain.from_iterable(pairs))]
-    # Filter the redirection pairs that involve a tracker domain and get the top ten most prevalent pairs
-    tracker_pairs = [p for p in pairs_tuples if domain_in_blocklist(tracker_domains, p[0])[1] or domain_in_blocklist(tracker_domains, p[1])[1]]
-    top_ten_pairs = Counter(tracker_pairs).most_common(10)
+    # The redirection pairs that involve a tracker domain were already filtered and counted while reading the data
+    top_ten_pairs = prevalence_counters.most_common(mode, "tracker_redirection_pairs", 10)
 
     return top_ten_pairs
 
@@ -930,11 +1202,11 @@ def generate_table_question_11(crawl_mode, top_ten_redirection_pairs):
         A list with the top ten prevalent cross-domain HTTP redirection pairs
     """
     # Remove the file if it is already existing
-    if os.path.isfile(f"data/table_question_11_{crawl_mode.lower()}.tex"):
-        os.remove(f"data/table_question_11_{crawl_mode.lower()}.tex")
+    if os.path.isfile(f"{OUTPUT_DIR}/table_question_11_{crawl_mode.lower()}.tex"):
+        os.remove(f"{OUTPUT_DIR}/table_question_11_{crawl_mode.lower()}.tex")
 
     # Open the file and write to it
-    file = open(f"data/table_question_11_{crawl_mode.lower()}.tex", 'a')
+    file = open(f"{OUTPUT_DIR}/table_question_11_{crawl_mode.lower()}.tex", 'a')
     file.write("\\begin{table}[ht] \n")
     file.write("\caption{The ten most prevalent cross-domain HTTP redirection pairs (%s crawl).} \n" % (crawl_mode))
     file.write("\centering \n")
@@ -957,40 +1229,146 @@ def generate_table_question_11(crawl_mode, top_ten_redirection_pairs):
     file.close()
 
 
-def generate_tables_question_11(dataframe, tracker_domains):
+def generate_tables_question_11(prevalence_counters):
     """Generate a LaTeX table holding the ten most prevalent third-party domains for each crawl
 
     Parameters
     ----------
-    dataframe: pandas.core.frame.DataFrame
-        A Pandas dataframe with all the data that needs to be analysed
-    tracker_domains: set
-        A set of all (distinct) tracker domains in the blocklist
+    prevalence_counters: streaming.PrevalenceAggregator
+        The prevalence counters of the targets per crawl mode
     """
-    top_ten_desktop = top_ten_tracker_redirection_pairs(dataframe, "Desktop", tracker_domains)
-    top_ten_mobile = top_ten_tracker_redirection_pairs(dataframe, "Mobile", tracker_domains)
+    top_ten_desktop = top_ten_tracker_redirection_pairs(prevalence_counters, "Desktop")
+    top_ten_mobile = top_ten_tracker_redirection_pairs(prevalence_counters, "Mobile")
 
     generate_table_question_11("Desktop", top_ten_desktop)
     generate_table_question_11("Mobile", top_ten_mobile)
 
 
+# The questions of the assignment, the columns of the crawl data and the prevalence targets they need, the request
+# fields they use from the request-level table and the function generating their output from the preprocessed inputs
+QUESTIONS = {
+    "q1": {"columns": ["crawl_mode", "consent_status"], "targets": [],
+           "run": lambda inputs: generate_table_question_1(inputs["dataframe"], inputs["err_dataframe"])},
+    "q2": {"columns": ["crawl_mode", "page_load_time", "nr_requests", "nr_third_party_domains", "nr_tracker_domains",
+                       "nr_tracker_entities"], "targets": [],
+           "run": lambda inputs: generate_box_plots_question_2(inputs["dataframe"])},
+    "q3": {"columns": ["crawl_mode", "page_load_time", "nr_requests", "nr_third_party_domains", "nr_tracker_domains",
+                       "nr_tracker_entities"], "targets": [],
+           "run": lambda inputs: generate_table_question_3(inputs["dataframe"])},
+    "q4": {"columns": [], "targets": ["third_party_domains"],
+           "run": lambda inputs: generate_table_question_4(inputs["prevalence_counters"])},
+    "q5": {"columns": [], "targets": ["tracker_domains"],
+           "run": lambda inputs: generate_table_question_5(inputs["prevalence_counters"])},
+    "q6": {"columns": [], "targets": ["tracker_entities"],
+           "run": lambda inputs: generate_table_question_6(inputs["prevalence_counters"])},
+    "q7": {"columns": ["crawl_mode", "tranco_rank", "nr_third_party_domains"], "targets": [],
+           "run": lambda inputs: generate_scatter_plots_question_7(inputs["dataframe"])},
+    "q8": {"columns": ["crawl_mode", "tranco_rank", "nr_tracker_domains"], "targets": [],
+           "run": lambda inputs: generate_scatter_plots_question_8(inputs["dataframe"])},
+    "q9": {"columns": [], "targets": [], "request_fields": ["request_url", "nr_cookies"],
+           "run": lambda inputs: generate_table_question_9(inputs["request_dataframe"])},
+    "q10": {"columns": ["crawl_mode", "cookies"], "targets": [],
+            "run": lambda inputs: (generate_table_question_10(inputs["dataframe"], "Desktop"),
+                                   generate_table_question_10(inputs["dataframe"], "Mobile"))},
+    "q11": {"columns": [], "targets": ["tracker_redirection_pairs"],
+            "run": lambda inputs: generate_tables_question_11(inputs["prevalence_counters"])}
+}
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", action="store", type=str, required=False,
+                        help="A comma-separated list of the questions to answer, e.g., q4,q11 (default: all).")
+    parser.add_argument("--no-cache", action="store_true", required=False,
+                        help="Do not use or update the cache with intermediate results.")
+    parser.add_argument("--figure-workers", action="store", type=int, default=FIGURE_WORKERS,
+                        help="The number of processes rendering the figures (0 renders them in the main process).")
+    parser.add_argument("--scatter-fit", action="store", type=str, default=SCATTER_FIT,
+                        choices=["bootstrap", "analytic"],
+                        help="Bootstrap the confidence interval of the scatter plot regressions or compute it "
+                             "in closed form.")
+    parser.add_argument("--scatter-ci", action="store", type=int, default=SCATTER_CI,
+                        help="The size of the confidence interval of the scatter plot regressions (0 for none).")
+    parser.add_argument("--n-boot", action="store", type=int, default=SCATTER_N_BOOT,
+                        help="The number of bootstrap samples for the confidence interval of the regressions.")
+    parser.add_argument("--top-k-capacity", action="store", type=int, default=PREVALENCE_CAPACITY,
+                        help="Approximate the prevalence tables with Space-Saving counters monitoring at most this "
+                             "number of keys (default: exact counts).")
+    parser.add_argument("--database", action="store", type=str, nargs="?", const=database.DATABASE_PATH,
+                        help="Answer the questions with queries against the database built by ingest.py "
+                             f"(default path: {database.DATABASE_PATH}).")
+    arguments = parser.parse_args()
+
+    if arguments.only:
+        arguments.only = [question.strip().lower() for question in arguments.only.split(",")]
+        unknown = [question for question in arguments.only if question not in QUESTIONS]
+        if unknown:
+            parser.error(f"Unknown question(s): {', '.join(unknown)}. Choose from {', '.join(QUESTIONS)}.")
+    if arguments.top_k_capacity is not None and arguments.top_k_capacity < 10:
+        # Every prevalence table lists the top ten keys, so at least that many keys need to be monitored
+        parser.error(f"Invalid --top-k-capacity {arguments.top_k_capacity}: the prevalence tables need a capacity "
+                     f"of at least 10.")
+
+    return vars(arguments)
+
+
+def required_inputs(questions, field):
+    """Collect the columns, prevalence targets or request fields of the crawl data that are needed to answer the given
+    questions
+
+    Parameters
+    ----------
+    questions: list
+        A list with the names of the questions, e.g., ["q4", "q11"]
+    field: str
+        Either "columns", "targets" or "request_fields"
+
+    Returns
+    -------
+    set
+        A set with the names of all needed columns, targets or request fields
+    """
+    return set(chain.from_iterable(QUESTIONS[question].get(field, []) for question in questions))
+
+
 def main():
-    # We first preprocess the data and turn it into a Pandas dataframe
-    dataframe, err_dataframe, tracker_domains = preprocess_data()
-
-    # Generate answers for all the questions in the assignment
-    generate_table_question_1(dataframe, err_dataframe)
-    generate_box_plots_question_2(dataframe)
-    generate_table_question_3(dataframe)
-    generate_table_question_4(dataframe)
-    generate_table_question_5(dataframe)
-    generate_table_question_6(dataframe)
-    generate_scatter_plots_question_7(dataframe)
-    generate_scatter_plots_question_8(dataframe)
-    generate_table_question_9(dataframe)
-    generate_table_question_10(dataframe, "Desktop")
-    generate_table_question_10(dataframe, "Mobile")
-    generate_tables_question_11(dataframe, tracker_domains)
+    """Parse arguments, preprocess the data needed for the selected questions and generate their answers
+    """
+    global FIGURE_WORKERS, SCATTER_FIT, SCATTER_CI, SCATTER_N_BOOT, PREVALENCE_CAPACITY
+
+    args = parse_arguments()
+    cache.ENABLED = not args["no_cache"]
+    FIGURE_WORKERS = args["figure_workers"]
+    SCATTER_FIT, SCATTER_CI, SCATTER_N_BOOT = args["scatter_fit"], args["scatter_ci"], args["n_boot"]
+    PREVALENCE_CAPACITY = args["top_k_capacity"]
+    questions = args["only"] or list(QUESTIONS)
+
+    request_fields = required_inputs(questions, "request_fields")
+    if args["database"]:
+        # The inputs of the questions are queried from the database
+        if not os.path.isfile(args["database"]):
+            sys.exit(f"No database found at {args['database']}, run ingest.py first.")
+        connection = database.connect(args["database"])
+        if database.read_meta(connection, "data_fingerprint") != cache.fingerprint_files(
+                list_crawl_files(CRAWL_DATA_DIR)):
+            print(f"Warning: the crawl data changed since it was ingested into {args['database']}, run ingest.py.")
+        inputs = database.question_inputs(connection, required_inputs(questions, "columns"), bool(request_fields))
+    else:
+        # We first preprocess the data needed for the questions into Pandas dataframes and prevalence counters
+        inputs = preprocess_data(required_inputs(questions, "columns"), required_inputs(questions, "targets"),
+                                 request_fields)
+
+    # Generate answers for the (selected) questions in the assignment
+    for question in questions:
+        QUESTIONS[question]["run"](inputs)
+    shutdown_figure_pool()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,201 @@
+"""Analyser benchmark
+
+Times the preprocessing step and every question of the analyser (see `analyse.QUESTIONS`) separately on a (synthetic)
+crawl data directory, records the peak memory of every step and compares the results against a stored baseline. Tables
+and plots are written to a temporary directory, so the results in the data directory are never overwritten. The figures
+are rendered in the main process (as with --figure-workers 0), so their memory is part of the measured peak.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+
+import analyse
+
+BASELINE_PATH = "data/benchmark_baseline.json"
+# Differences below this number of seconds are considered noise and never reported as a regression
+MIN_TIME_DIFFERENCE = 0.05
+# The name of the step of every question, these are the names of the functions answering the questions so the results
+# can be compared with baselines that were stored before the questions were numbered
+STEP_NAMES = {
+    "q1": "generate_table_question_1",
+    "q2": "generate_box_plots_question_2",
+    "q3": "generate_table_question_3",
+    "q4": "generate_table_question_4",
+    "q5": "generate_table_question_5",
+    "q6": "generate_table_question_6",
+    "q7": "generate_scatter_plots_question_7",
+    "q8": "generate_scatter_plots_question_8",
+    "q9": "generate_table_question_9",
+    "q10": "generate_table_question_10",
+    "q11": "generate_tables_question_11"
+}
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--data", action="store", type=str, default="../synthetic_crawl_data",
+                        help="The directory with the crawl data (JSON files) to run the analyser on.")
+    parser.add_argument("-b", "--baseline", action="store", type=str, default=BASELINE_PATH,
+                        help="The path to the JSON file holding the baseline results.")
+    parser.add_argument("--save-baseline", action="store_true", required=False,
+                        help="Store the results of this run as the new baseline.")
+    parser.add_argument("--tolerance", action="store", type=float, default=0.10,
+                        help="The relative slowdown or memory increase that is reported as a regression.")
+    return vars(parser.parse_args())
+
+
+def measure(name, function, results):
+    """Run a single benchmark step and record its wall time and peak memory
+
+    Parameters
+    ----------
+    name: str
+        The name of the step
+    function: callable
+        The function that runs the step
+    results: dict
+        A dictionary the measurements are added to
+
+    Returns
+    -------
+    object
+        The return value of the function
+    """
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    output = function()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    results[name] = {"time": duration, "peak_memory": peak}
+    print(f"{name:<40} {duration:>10.3f} s {peak / 2 ** 20:>10.1f} MiB")
+
+    return output
+
+
+def run_benchmark(data_dir):
+    """Run the preprocessing step and all questions of the analyser on the crawl data in `data_dir`
+
+    Parameters
+    ----------
+    data_dir: str
+        The directory with the crawl data (JSON files)
+
+    Returns
+    -------
+    dict
+        A dictionary with the wall time (seconds) and peak memory (bytes) of every step
+    """
+    results = {}
+    analyse.CRAWL_DATA_DIR = data_dir
+    analyse.OUTPUT_DIR = tempfile.mkdtemp(prefix="analyser_benchmark_")
+    analyse.sns.set_theme(color_codes=True)
+    # Measure the actual computations instead of cache lookups
+    analyse.cache.ENABLED = False
+    # Render the figures in this process, tracemalloc does not see the memory of the figure workers
+    analyse.FIGURE_WORKERS = 0
+
+    tracemalloc.start()
+    inputs = measure("preprocess_data", analyse.preprocess_data, results)
+
+    for question, task in analyse.QUESTIONS.items():
+        measure(STEP_NAMES[question], lambda: (task["run"](inputs), analyse.wait_for_figures()), results)
+    tracemalloc.stop()
+    analyse.shutdown_figure_pool()
+
+    results["total"] = {"time": sum(result["time"] for result in results.values()),
+                        "peak_memory": max(result["peak_memory"] for result in results.values())}
+
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Print the comparison of the results of this run with the baseline results
+
+    Parameters
+    ----------
+    results: dict
+        The measurements of this run
+    baseline: dict
+        The measurements of the baseline run
+    tolerance: float
+        The relative slowdown or memory increase that is reported as a regression
+
+    Returns
+    -------
+    list
+        A list with the names of the steps that regressed
+
+    Raises
+    ------
+    ValueError
+        If the steps of this run and the baseline differ, e.g., because the baseline was stored by an older version
+    """
+    missing = sorted(set(results) ^ set(baseline["steps"]))
+    if missing:
+        raise ValueError(f"The steps {', '.join(missing)} are not measured in both this run and the baseline, run "
+                         f"with --save-baseline to store a new baseline.")
+
+    regressions = []
+    print(f"\nComparison with the baseline ({baseline['files']} files, {baseline['machine']}):")
+    print(f"{'step':<40} {'time':>10} {'memory':>10}")
+
+    for name, result in results.items():
+        base = baseline["steps"][name]
+        time_ratio = result["time"] / base["time"] if base["time"] else 1
+        memory_ratio = result["peak_memory"] / base["peak_memory"] if base["peak_memory"] else 1
+        print(f"{name:<40} {time_ratio:>9.2f}x {memory_ratio:>9.2f}x")
+
+        slower = time_ratio > 1 + tolerance and result["time"] - base["time"] > MIN_TIME_DIFFERENCE
+        if slower or memory_ratio > 1 + tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    """Parse arguments, run the benchmark and compare it with (or store it as) the baseline
+    """
+    args = parse_arguments()
+    nr_files = len(os.listdir(args["data"]))
+    print(f"Running the analyser benchmark on {nr_files} files in {args['data']}.\n")
+
+    results = run_benchmark(args["data"])
+
+    if args["save_baseline"]:
+        with open(args["baseline"], "w") as f:
+            json.dump({"files": nr_files, "machine": platform.node(), "steps": results}, f, indent=4)
+        print(f"\nThe results have been stored as the new baseline in {args['baseline']}!")
+    elif os.path.isfile(args["baseline"]):
+        with open(args["baseline"]) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare_with_baseline(results, baseline, args["tolerance"])
+        except ValueError as error:
+            sys.exit(f"\n{error}")
+        if regressions:
+            print(f"\nRegressions of more than {args['tolerance']:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\nNo baseline found at {args['baseline']}, run with --save-baseline to create one.")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
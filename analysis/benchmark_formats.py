@@ -0,0 +1,150 @@
+"""Output format benchmark
+
+Converts a crawl data directory to every output format of crawler_src/result_writer.py and compares the formats
+against the current format (an indented JSON file per domain) on:
+- the disk usage of the crawl data
+- the time to write the crawl data
+- the time to decode all records (crawl_files.iter_records)
+- the time the analyser needs to ingest the crawl data into its dataframe (analyse.write_data_to_dataframe)
+The converted crawl data is written to a temporary directory that is removed afterwards.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import analyse
+from crawl_files import iter_records, list_crawl_files, open_crawl_file, orjson
+from tracker_tags import TrackerTags
+
+FORMATS = ["json", "json.gz", "json.zst", "jsonl", "jsonl.gz", "jsonl.zst"]
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--data", action="store", type=str, default="../synthetic_crawl_data",
+                        help="The directory with the crawl data (JSON files) to convert.")
+    parser.add_argument("-r", "--repeat", action="store", type=int, default=3,
+                        help="The number of times the reading steps are repeated, the fastest run is reported.")
+    return vars(parser.parse_args())
+
+
+def encode(record):
+    """Encode a record the way the crawler writes the compressed formats
+
+    Parameters
+    ----------
+    record: dict
+        The crawl data of a single visit
+
+    Returns
+    -------
+    bytes
+        The UTF-8 encoded JSON document, without indentation
+    """
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def convert(files, output_dir, output_format):
+    """Write the records of the crawl files to `output_dir` in the given format
+
+    Parameters
+    ----------
+    files: list
+        The paths of the crawl files in the current format
+    output_dir: str
+        The directory to write the converted crawl data to
+    output_format: str
+        One of FORMATS
+    """
+    os.makedirs(output_dir)
+    if output_format == "json":
+        for file in files:
+            shutil.copy(file, output_dir)
+    elif output_format.startswith("jsonl"):
+        with open_crawl_file(os.path.join(output_dir, f"crawl.{output_format}"), "wb") as stream:
+            for _, record in iter_records(files):
+                stream.write(encode(record) + b"\n")
+    else:
+        for file, record in iter_records(files):
+            name = os.path.basename(file)[:-len(".json")]
+            with open_crawl_file(os.path.join(output_dir, f"{name}.{output_format}"), "wb") as out_file:
+                out_file.write(encode(record))
+
+
+def best_time(function, repeat):
+    """Run a function a number of times and return the fastest wall time
+
+    Parameters
+    ----------
+    function: callable
+        The function to time
+    repeat: int
+        The number of runs
+
+    Returns
+    -------
+    float
+        The wall time of the fastest run in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    """Parse arguments, convert the crawl data to every format and print the comparison
+    """
+    args = parse_arguments()
+    files = [file for file in list_crawl_files(args["data"]) if file.endswith(".json")]
+    tags = TrackerTags(analyse.BLOCKLIST_PATH)
+    print(f"Comparing the output formats on {len(files)} files in {args['data']} "
+          f"(JSON decoder: {'orjson' if orjson is not None else 'json'}).\n")
+
+    results = {}
+    temp_dir = tempfile.mkdtemp(prefix="format_benchmark_")
+    try:
+        for output_format in FORMATS:
+            output_dir = os.path.join(temp_dir, output_format)
+            start = time.perf_counter()
+            convert(files, output_dir, output_format)
+            write_time = time.perf_counter() - start
+            converted = list_crawl_files(output_dir)
+
+            results[output_format] = {
+                "size": sum(os.path.getsize(file) for file in converted),
+                "write": write_time,
+                "decode": best_time(lambda: sum(1 for _ in iter_records(converted)), args["repeat"]),
+                "ingest": best_time(lambda: analyse.write_data_to_dataframe(analyse.COLUMNS, tags, converted),
+                                    args["repeat"])}
+    finally:
+        shutil.rmtree(temp_dir)
+
+    base = results["json"]
+    print(f"{'format':<12} {'size (MiB)':>12} {'ratio':>8} {'write (s)':>10} {'decode (s)':>11} {'ingest (s)':>11} "
+          f"{'speedup':>8}")
+    for output_format, result in results.items():
+        print(f"{output_format:<12} {result['size'] / 2 ** 20:>12.1f} {result['size'] / base['size']:>8.3f} "
+              f"{result['write']:>10.2f} {result['decode']:>11.2f} {result['ingest']:>11.2f} "
+              f"{base['ingest'] / result['ingest']:>7.2f}x")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
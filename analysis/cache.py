@@ -0,0 +1,168 @@
+"""Cache
+
+Stores intermediate results of the analyser (extracted columns, prevalence counters, tracker sets, ...) on disk, so
+that running only a few questions or re-running the analyser does not require parsing all crawl data again. Every
+entry is stored under a key that is derived from the crawl data and/or the blocklist it was computed from, so entries
+are invalidated automatically as soon as one of these inputs changes.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import re
+
+CACHE_DIR = "cache"
+ENABLED = True
+
+
+def fingerprint_files(files):
+    """Compute a fingerprint of a list of files based on their paths, sizes and modification times
+
+    Parameters
+    ----------
+    files: list
+        A list with the paths of the files
+
+    Returns
+    -------
+    str
+        A hexadecimal string that changes whenever a file is added, removed or modified
+    """
+    digest = hashlib.sha1()
+    for file in sorted(files):
+        stat = os.stat(file)
+        digest.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+
+    return digest.hexdigest()
+
+
+def fingerprint_file_contents(file):
+    """Compute a fingerprint of the contents of a single file
+
+    Parameters
+    ----------
+    file: str
+        The path to the file
+
+    Returns
+    -------
+    str
+        A hexadecimal string that changes whenever the contents of the file change
+    """
+    digest = hashlib.sha1()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def combine_keys(*keys):
+    """Combine multiple fingerprints into a single cache key
+
+    Returns
+    -------
+    str
+        A hexadecimal string derived from all given fingerprints
+    """
+    return hashlib.sha1(":".join(keys).encode()).hexdigest()
+
+
+def cache_path(name, key):
+    """Get the path of the file holding the cache entry `name` for `key`
+
+    Parameters
+    ----------
+    name: str
+        The name of the intermediate result, e.g., prevalence_Desktop_third_party_domains
+    key: str
+        The cache key of the inputs the result was computed from
+
+    Returns
+    -------
+    str
+        The path to the cache file
+    """
+    return f"{CACHE_DIR}/{re.sub(r'[^A-Za-z0-9_-]', '_', name)}-{key[:16]}.pickle"
+
+
+def load(name, key):
+    """Load an intermediate result from the cache
+
+    Parameters
+    ----------
+    name: str
+        The name of the intermediate result
+    key: str
+        The cache key of the inputs the result was computed from
+
+    Returns
+    -------
+    hit: bool
+        A boolean indicating whether the result was present in the cache
+    value: object
+        The cached result, or None if it was not present
+    """
+    path = cache_path(name, key)
+    if not ENABLED or not os.path.isfile(path):
+        return False, None
+
+    try:
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except (EOFError, pickle.UnpicklingError):
+        print(f"Ignoring the corrupt cache entry {path}.")
+        return False, None
+
+
+def store(name, key, value):
+    """Store an intermediate result in the cache and remove the outdated entries for the same result
+
+    Parameters
+    ----------
+    name: str
+        The name of the intermediate result
+    key: str
+        The cache key of the inputs the result was computed from
+    value: object
+        The result that needs to be stored
+    """
+    if not ENABLED:
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(name, key)
+    for outdated in glob.glob(f"{CACHE_DIR}/{re.sub(r'[^A-Za-z0-9_-]', '_', name)}-*.pickle"):
+        if outdated != path:
+            os.remove(outdated)
+
+    with open(path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def cached(name, key, compute):
+    """Load an intermediate result from the cache or compute (and store) it when it is not present
+
+    Parameters
+    ----------
+    name: str
+        The name of the intermediate result
+    key: str
+        The cache key of the inputs the result is computed from, None disables caching for this result
+    compute: callable
+        A function without arguments that computes the result
+
+    Returns
+    -------
+    object
+        The (cached) result
+    """
+    if key is None:
+        return compute()
+
+    hit, value = load(name, key)
+    if not hit:
+        value = compute()
+        store(name, key, value)
+
+    return value
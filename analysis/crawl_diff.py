@@ -0,0 +1,452 @@
+"""Crawl diff
+
+Compares two crawls of the same websites (two crawl data directories) and reports what changed for every website: new
+and removed third parties, new trackers, added and removed cookies, redirection changes, consent status flips and page
+load time regressions.
+
+Every visit is first summarised by a compact fingerprint: a hash of its sorted third-party domains, of its sorted cookie
+names and of its sorted redirection pairs, together with its consent status, error and page load time. The fingerprints
+of a crawl are cached, so a crawl that is compared again is not read again. Websites with the same fingerprint in both
+crawls (and no page load time regression) are skipped, and only the records of the changed websites are read again to
+compute their detailed diff, in parallel.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+
+import analyse
+import cache
+from crawl_files import iter_records, list_crawl_files
+from tracker_tags import TrackerTags
+
+# The increase of the page load time (in seconds) from which a website is reported as a regression
+LOAD_TIME_REGRESSION = 1.0
+# The number of processes computing the fingerprints and diffs (0 computes them in the main process)
+DIFF_WORKERS = os.cpu_count() or 0
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--old", action="store", type=str, required=True,
+                        help="The directory with the crawl data of the previous crawl.")
+    parser.add_argument("--new", action="store", type=str, default=analyse.CRAWL_DATA_DIR,
+                        help="The directory with the crawl data of the new crawl.")
+    parser.add_argument("-o", "--output", action="store", type=str, default=f"{analyse.OUTPUT_DIR}/crawl_diff.txt",
+                        help="The path of the report.")
+    parser.add_argument("-t", "--threshold", action="store", type=float, default=LOAD_TIME_REGRESSION,
+                        help="The increase of the page load time (in seconds) from which it is reported.")
+    parser.add_argument("-w", "--workers", action="store", type=int, default=DIFF_WORKERS,
+                        help="The number of processes computing the fingerprints and diffs (0 for none).")
+    parser.add_argument("--no-cache", action="store_true", required=False,
+                        help="Do not use or update the cache with the fingerprints of the crawls.")
+    return vars(parser.parse_args())
+
+
+def cookie_names(cookies):
+    """Get the names of the cookies of a visit
+
+    Parameters
+    ----------
+    cookies: list
+        The cookie dictionaries of the visit, of which the first item holds the name and value of the cookie
+
+    Returns
+    -------
+    list
+        The names of the cookies
+    """
+    return [next(iter(cookie)) for cookie in cookies if cookie]
+
+
+def redirection_pairs(json_file):
+    """Get the redirection pairs of a visit as strings
+
+    Parameters
+    ----------
+    json_file: dict
+        The crawl record of a successful visit
+
+    Returns
+    -------
+    list
+        The redirection pairs, formatted as "source -> target"
+    """
+    return [f"{source} -> {target}" for source, target in json_file['redirect_pairs']]
+
+
+def set_digest(items):
+    """Hash the distinct items of a list, independent of their order
+
+    Parameters
+    ----------
+    items: list
+        The strings to hash
+
+    Returns
+    -------
+    bytes
+        A 64-bit digest of the sorted distinct items
+    """
+    return hashlib.blake2b("\n".join(sorted(set(items))).encode(), digest_size=8).digest()
+
+
+def visit_fingerprint(json_file):
+    """Summarise a visit by the fields that are compared between the crawls
+
+    Parameters
+    ----------
+    json_file: dict
+        The crawl record of a visit
+
+    Returns
+    -------
+    tuple
+        The digests of the third-party domains, cookie names and redirection pairs, the consent status, the error and
+        the page load time of the visit. The digests and page load time are None if the visit failed.
+    """
+    if "error" in json_file:
+        return None, None, None, None, json_file['error'], None
+    return (set_digest(json_file['third_party_domains']), set_digest(cookie_names(json_file['cookies'])),
+            set_digest(redirection_pairs(json_file)), json_file['consent_status'], None,
+            analyse.calculate_page_load_time(json_file['pageload_start_ts'], json_file['pageload_end_ts']))
+
+
+def fingerprint_files(files):
+    """Compute the fingerprints of the visits in a number of crawl files
+
+    Parameters
+    ----------
+    files: list
+        The paths of the crawl files
+
+    Returns
+    -------
+    list
+        A list of ((website domain, crawl mode), source, fingerprint) tuples, see crawl_files.iter_records and
+        visit_fingerprint
+    """
+    fingerprints = []
+    for source, json_file in iter_records(files):
+        try:
+            fingerprints.append(((json_file['website_domain'], json_file['crawl_mode']), source,
+                                 visit_fingerprint(json_file)))
+        except KeyError:
+            print(f"Skipping {source} because of bad formatting.")
+    return fingerprints
+
+
+def chunks(items, workers):
+    """Split a list into chunks that are divided over the worker processes
+
+    Parameters
+    ----------
+    items: list
+        The items to split
+    workers: int
+        The number of worker processes
+
+    Returns
+    -------
+    list
+        A list of consecutive slices of `items`, a few per worker to balance the load
+    """
+    size = max(1, -(-len(items) // (4 * max(workers, 1))))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def map_chunks(function, items, pool, workers):
+    """Apply a function returning a list to chunks of items, in the worker processes if there is a pool
+
+    Parameters
+    ----------
+    function: callable
+        The function to apply to every chunk
+    items: list
+        The items to split into chunks
+    pool: concurrent.futures.ProcessPoolExecutor or None
+        The worker processes, None applies the function in the main process
+    workers: int
+        The number of worker processes
+
+    Returns
+    -------
+    list
+        The concatenated results of all chunks, in the order of the items
+    """
+    if pool is None:
+        return function(items)
+    return [result for results in pool.map(function, chunks(items, workers)) for result in results]
+
+
+def fingerprint_crawl(directory, pool, workers):
+    """Compute (or load from the cache) the fingerprints of all visits of a crawl
+
+    Parameters
+    ----------
+    directory: str
+        The directory with the crawl data
+    pool: concurrent.futures.ProcessPoolExecutor or None
+        The worker processes reading the crawl files
+    workers: int
+        The number of worker processes
+
+    Returns
+    -------
+    dict
+        A dictionary with the (website domain, crawl mode) of every visit as key and its (source, fingerprint) as value
+    """
+    files = list_crawl_files(directory)
+    # The name holds the directory, so the fingerprints of both crawls are cached next to each other
+    name = f"crawl_fingerprints_{os.path.abspath(directory)}"
+    key = cache.fingerprint_files(files)
+    hit, fingerprints = cache.load(name, key)
+    if not hit:
+        fingerprints = {site: (source, fingerprint)
+                        for site, source, fingerprint in map_chunks(fingerprint_files, files, pool, workers)}
+        cache.store(name, key, fingerprints)
+    return fingerprints
+
+
+def changed_sites(old, new, threshold):
+    """Find the websites of which the fingerprint differs between the crawls or of which the page load time regressed
+
+    Parameters
+    ----------
+    old: dict
+        The fingerprints of the previous crawl, see fingerprint_crawl
+    new: dict
+        The fingerprints of the new crawl
+    threshold: float
+        The increase of the page load time (in seconds) from which it is a regression
+
+    Returns
+    -------
+    list
+        A sorted list with the (website domain, crawl mode) of the changed websites that are part of both crawls
+    """
+    changed = []
+    for site in old.keys() & new.keys():
+        old_fingerprint, new_fingerprint = old[site][1], new[site][1]
+        old_load_time, new_load_time = old_fingerprint[-1], new_fingerprint[-1]
+        if old_fingerprint[:-1] != new_fingerprint[:-1] or \
+                (old_load_time is not None and new_load_time is not None
+                 and new_load_time - old_load_time >= threshold):
+            changed.append(site)
+    return sorted(changed)
+
+
+def load_records(sources):
+    """Read the crawl records with the given sources
+
+    Parameters
+    ----------
+    sources: list
+        The sources of the records, see crawl_files.iter_records
+
+    Returns
+    -------
+    dict
+        A dictionary with the source as key and the crawl record as value
+    """
+    wanted = set(sources)
+    # The source of a record in a JSON Lines stream is the path of the stream followed by the line number
+    files = sorted({source if os.path.isfile(source) else source.rsplit(":", 1)[0] for source in sources})
+    return {source: json_file for source, json_file in iter_records(files) if source in wanted}
+
+
+def diff_lists(old, new):
+    """Compare the distinct items of two lists
+
+    Parameters
+    ----------
+    old: list
+        The items in the previous crawl
+    new: list
+        The items in the new crawl
+
+    Returns
+    -------
+    added: list
+        The sorted items that are only present in the new crawl
+    removed: list
+        The sorted items that are only present in the previous crawl
+    """
+    old, new = set(old), set(new)
+    return sorted(new - old), sorted(old - new)
+
+
+def diff_visits(old_file, new_file):
+    """Compute the detailed diff of the visits of a website in both crawls
+
+    Parameters
+    ----------
+    old_file: dict
+        The crawl record of the website in the previous crawl
+    new_file: dict
+        The crawl record of the website in the new crawl
+
+    Returns
+    -------
+    dict
+        The added and removed third parties, cookies and redirection pairs, and the error, consent status and page load
+        time in both crawls
+    """
+    diff = {"error": (old_file.get('error'), new_file.get('error'))}
+    if "error" in old_file or "error" in new_file:
+        return diff
+
+    diff["third_parties"] = diff_lists(old_file['third_party_domains'], new_file['third_party_domains'])
+    diff["cookies"] = diff_lists(cookie_names(old_file['cookies']), cookie_names(new_file['cookies']))
+    diff["redirects"] = diff_lists(redirection_pairs(old_file), redirection_pairs(new_file))
+    diff["consent_status"] = (old_file['consent_status'], new_file['consent_status'])
+    diff["page_load_time"] = tuple(analyse.calculate_page_load_time(json_file['pageload_start_ts'],
+                                                                    json_file['pageload_end_ts'])
+                                   for json_file in [old_file, new_file])
+    return diff
+
+
+def diff_sites(pairs):
+    """Compute the detailed diffs of a number of websites
+
+    Parameters
+    ----------
+    pairs: list
+        A list of ((website domain, crawl mode), old source, new source) tuples
+
+    Returns
+    -------
+    list
+        A list of ((website domain, crawl mode), diff) tuples, see diff_visits
+    """
+    old_records = load_records([old_source for _, old_source, _ in pairs])
+    new_records = load_records([new_source for _, _, new_source in pairs])
+    return [(site, diff_visits(old_records[old_source], new_records[new_source]))
+            for site, old_source, new_source in pairs]
+
+
+def write_report(path, old_dir, new_dir, old, new, diffs, tags, threshold):
+    """Write the report of the differences between the crawls
+
+    Parameters
+    ----------
+    path: str
+        The path of the report
+    old_dir: str
+        The directory with the crawl data of the previous crawl
+    new_dir: str
+        The directory with the crawl data of the new crawl
+    old: dict
+        The fingerprints of the previous crawl
+    new: dict
+        The fingerprints of the new crawl
+    diffs: list
+        The ((website domain, crawl mode), diff) tuples of the changed websites
+    tags: tracker_tags.TrackerTags
+        The tags of the domains with the blocklist, used to find the new trackers
+    threshold: float
+        The increase of the page load time (in seconds) from which it is a regression
+
+    Returns
+    -------
+    dict
+        The number of websites with every kind of change
+    """
+    counts = {"added websites": len(new.keys() - old.keys()), "removed websites": len(old.keys() - new.keys()),
+              "changed websites": len(diffs), "new third parties": 0, "new trackers": 0, "cookie changes": 0,
+              "redirection changes": 0, "consent status flips": 0, "load time regressions": 0, "error changes": 0}
+    lines = []
+    for (website_domain, crawl_mode), diff in diffs:
+        site_lines = []
+        if diff["error"][0] != diff["error"][1]:
+            counts["error changes"] += 1
+            site_lines.append(f"  error: {diff['error'][0] or 'none'} -> {diff['error'][1] or 'none'}")
+        if "third_parties" in diff:
+            added, removed = diff["third_parties"]
+            trackers = [domain for domain in added if tags.is_tracker(domain)]
+            counts["new third parties"] += bool(added)
+            counts["new trackers"] += bool(trackers)
+            if added:
+                site_lines.append(f"  new third parties: {', '.join(added)}")
+            if trackers:
+                entities = [f"{domain} ({tags.tag(domain)[1]})" for domain in trackers]
+                site_lines.append(f"  new trackers: {', '.join(entities)}")
+            if removed:
+                site_lines.append(f"  removed third parties: {', '.join(removed)}")
+
+            for field, description, count in [("cookies", "cookies", "cookie changes"),
+                                               ("redirects", "redirections", "redirection changes")]:
+                added, removed = diff[field]
+                counts[count] += bool(added or removed)
+                if added:
+                    site_lines.append(f"  added {description}: {', '.join(added)}")
+                if removed:
+                    site_lines.append(f"  removed {description}: {', '.join(removed)}")
+
+            old_status, new_status = diff["consent_status"]
+            if old_status != new_status:
+                counts["consent status flips"] += 1
+                site_lines.append(f"  consent status: {old_status} -> {new_status}")
+            old_time, new_time = diff["page_load_time"]
+            if new_time - old_time >= threshold:
+                counts["load time regressions"] += 1
+                site_lines.append(f"  page load time: {old_time:.2f} s -> {new_time:.2f} s "
+                                  f"(+{new_time - old_time:.2f} s)")
+        if site_lines:
+            lines += [f"{website_domain} ({crawl_mode})"] + site_lines + [""]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        file.write(f"Crawl diff: {old_dir} -> {new_dir}\n")
+        file.write(f"{len(old.keys() & new.keys())} websites in both crawls\n")
+        for count, value in counts.items():
+            file.write(f"{count}: {value}\n")
+        for title, sites in [("Added websites", new.keys() - old.keys()),
+                             ("Removed websites", old.keys() - new.keys())]:
+            if sites:
+                file.write(f"\n{title}:\n")
+                file.writelines(f"  {website_domain} ({crawl_mode})\n" for website_domain, crawl_mode in sorted(sites))
+        file.write("\n")
+        file.write("\n".join(lines))
+    return counts
+
+
+def main():
+    """Parse arguments, fingerprint both crawls and write the report of the websites that changed
+    """
+    args = parse_arguments()
+    cache.ENABLED = not args["no_cache"]
+    pool = ProcessPoolExecutor(max_workers=args["workers"]) if args["workers"] > 0 else None
+
+    try:
+        old = fingerprint_crawl(args["old"], pool, args["workers"])
+        new = fingerprint_crawl(args["new"], pool, args["workers"])
+        changed = changed_sites(old, new, args["threshold"])
+        print(f"{len(changed)} of the {len(old.keys() & new.keys())} websites in both crawls changed.")
+
+        # Only the records of the changed websites are read again, grouped by their file so a chunk reads few files
+        pairs = sorted(((site, old[site][0], new[site][0]) for site in changed), key=lambda pair: pair[1])
+        diffs = sorted(map_chunks(diff_sites, pairs, pool, args["workers"]))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    tags = TrackerTags(analyse.BLOCKLIST_PATH)
+    counts = write_report(args["output"], args["old"], args["new"], old, new, diffs, tags, args["threshold"])
+    tags.save()
+    print(", ".join(f"{value} {count}" for count, value in counts.items()))
+    print(f"The report has been written to {args['output']}!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
@@ -0,0 +1,11 @@
+"""Crawl files
+
+The crawl data is read with the reader of the crawler (crawler_src/result_reader.py), which is kept next to the writer
+of the output formats (crawler_src/result_writer.py) so the two always support the same formats.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crawler_src"))
+from result_reader import (CRAWL_FILE_EXTENSIONS, TRUNCATION_ERRORS, decode, iter_records, list_crawl_files,
+                           open_crawl_file, orjson)
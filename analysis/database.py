@@ -0,0 +1,384 @@
+"""Database
+
+An embedded SQLite store of the crawl data with a normalised table per kind of record, so new questions can be asked
+as SQL queries instead of loops over the crawl data:
+- visits: one row per visited website and crawl mode, including the visits that failed (error is not NULL)
+- requests, cookies, third_parties, redirects: the records of a visit, in the order they were stored in
+- blocklist_matches: the third-party domains and redirection hostnames that match the blocklist, with their entity and
+  category (see tracker_tags.py)
+- meta: the fingerprints of the crawl data and blocklist the database was built from
+The tables are indexed on the website, crawl mode, rank and (request) hostname. The database is built with ingest.py.
+The functions below answer the questions of the analyser with queries, and return their inputs in the same form as
+analyse.preprocess_data so the same functions generate the tables and figures.
+"""
+import json
+import sqlite3
+
+import pandas as pd
+
+DATABASE_PATH = "cache/crawl.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS visits (
+    visit_id INTEGER PRIMARY KEY,
+    source TEXT,
+    website_domain TEXT,
+    tranco_rank INTEGER,
+    crawl_mode TEXT,
+    pageload_start_ts TEXT,
+    pageload_end_ts TEXT,
+    page_load_time REAL,
+    post_pageload_url TEXT,
+    consent_status TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS requests (
+    visit_id INTEGER,
+    position INTEGER,
+    request_url TEXT,
+    request_hostname TEXT,
+    first_party INTEGER,
+    nr_cookies INTEGER,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS cookies (
+    visit_id INTEGER,
+    position INTEGER,
+    name TEXT,
+    domain TEXT,
+    expires TEXT,
+    max_age TEXT,
+    cookie TEXT
+);
+CREATE TABLE IF NOT EXISTS third_parties (visit_id INTEGER, position INTEGER, domain TEXT);
+CREATE TABLE IF NOT EXISTS redirects (visit_id INTEGER, position INTEGER, source TEXT, target TEXT);
+"""
+# The blocklist matches are replaced as a whole (see ingest.py), so the table is recreated with its current columns
+BLOCKLIST_MATCHES_TABLE = """
+CREATE TABLE IF NOT EXISTS blocklist_matches (name TEXT PRIMARY KEY, blocklist_domain TEXT, entity TEXT, category TEXT)
+"""
+# The indices are created after the data is inserted, which is faster than updating them for every row
+INDICES = """
+CREATE INDEX IF NOT EXISTS visits_site ON visits (website_domain, crawl_mode);
+CREATE INDEX IF NOT EXISTS visits_mode_rank ON visits (crawl_mode, tranco_rank);
+CREATE INDEX IF NOT EXISTS requests_visit ON requests (visit_id);
+CREATE INDEX IF NOT EXISTS requests_host ON requests (request_hostname);
+CREATE INDEX IF NOT EXISTS requests_cookies ON requests (nr_cookies);
+CREATE INDEX IF NOT EXISTS cookies_visit ON cookies (visit_id);
+CREATE INDEX IF NOT EXISTS third_parties_visit ON third_parties (visit_id);
+CREATE INDEX IF NOT EXISTS third_parties_domain ON third_parties (domain);
+CREATE INDEX IF NOT EXISTS redirects_visit ON redirects (visit_id);
+CREATE INDEX IF NOT EXISTS redirects_pair ON redirects (source, target);
+"""
+DATA_TABLES = ["visits", "requests", "cookies", "third_parties", "redirects"]
+
+# The per-visit metrics of the analyser, as expressions over the visits table (v) and the per-visit counts
+VISIT_COLUMNS = {
+    "website_domain": "v.website_domain",
+    "tranco_rank": "v.tranco_rank",
+    "crawl_mode": "v.crawl_mode",
+    "pageload_start_ts": "v.pageload_start_ts",
+    "pageload_end_ts": "v.pageload_end_ts",
+    "page_load_time": "v.page_load_time",
+    "post_pageload_url": "v.post_pageload_url",
+    "consent_status": "v.consent_status",
+    "nr_requests": "(SELECT COUNT(*) FROM requests r WHERE r.visit_id = v.visit_id)",
+    "nr_third_party_domains": "(SELECT COUNT(*) FROM third_parties t WHERE t.visit_id = v.visit_id)",
+    "nr_tracker_domains": "(SELECT COUNT(DISTINCT t.domain) FROM third_parties t "
+                          "JOIN blocklist_matches m ON m.name = t.domain WHERE t.visit_id = v.visit_id)",
+    "nr_tracker_entities": "(SELECT COUNT(DISTINCT m.entity) FROM third_parties t "
+                           "JOIN blocklist_matches m ON m.name = t.domain WHERE t.visit_id = v.visit_id)"
+}
+# The prevalence targets of the analyser, as queries returning the (key, number of occurrences) in a crawl mode.
+# Ties are resolved in favour of the key that was stored first, as in the prevalence counters of the analyser.
+PREVALENCE_QUERIES = {
+    "third_party_domains": """
+        SELECT t.domain, COUNT(*) AS n FROM third_parties t JOIN visits v USING (visit_id)
+        WHERE v.crawl_mode = ? GROUP BY t.domain ORDER BY n DESC, MIN(t.rowid) LIMIT ?""",
+    "tracker_domains": """
+        SELECT t.domain, COUNT(DISTINCT t.visit_id) AS n FROM third_parties t JOIN visits v USING (visit_id)
+        JOIN blocklist_matches m ON m.name = t.domain
+        WHERE v.crawl_mode = ? GROUP BY t.domain ORDER BY n DESC, MIN(t.rowid) LIMIT ?""",
+    "tracker_entities": """
+        SELECT m.entity, COUNT(DISTINCT t.visit_id) AS n FROM third_parties t JOIN visits v USING (visit_id)
+        JOIN blocklist_matches m ON m.name = t.domain
+        WHERE v.crawl_mode = ? GROUP BY m.entity ORDER BY n DESC, MIN(t.rowid) LIMIT ?""",
+    "tracker_redirection_pairs": """
+        SELECT r.source, r.target, COUNT(*) AS n FROM redirects r JOIN visits v USING (visit_id)
+        WHERE v.crawl_mode = ? AND (r.source IN (SELECT name FROM blocklist_matches)
+                                    OR r.target IN (SELECT name FROM blocklist_matches))
+        GROUP BY r.source, r.target ORDER BY n DESC, MIN(r.rowid) LIMIT ?"""
+}
+
+
+def connect(path=DATABASE_PATH):
+    """Open the database and create its tables if they do not exist yet
+
+    Parameters
+    ----------
+    path: str, default=DATABASE_PATH
+        The path of the SQLite database
+
+    Returns
+    -------
+    sqlite3.Connection
+        The connection to the database
+    """
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    connection.execute(BLOCKLIST_MATCHES_TABLE)
+    return connection
+
+
+def read_meta(connection, key):
+    """Read a value from the meta table
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    key: str
+        The key of the value, e.g., data_fingerprint
+
+    Returns
+    -------
+    str
+        The value, or None if it is not set
+    """
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def write_meta(connection, key, value):
+    """Write a value to the meta table
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    key: str
+        The key of the value
+    value: str
+        The value
+    """
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def clear_data(connection):
+    """Remove all crawl data from the database, e.g., before the crawl data is ingested again
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    """
+    for table in DATA_TABLES:
+        connection.execute(f"DELETE FROM {table}")
+
+
+def visit_rows(visit_id, source, json_file, page_load_time, request_hostnames, first_parties):
+    """Split a crawl record into the rows of the data tables
+
+    Parameters
+    ----------
+    visit_id: int
+        The id of the visit
+    source: str
+        The file (and line) the record was read from
+    json_file: dict
+        The crawl record
+    page_load_time: float
+        The page load time in seconds, None for failed visits
+    request_hostnames: list
+        The hostname of every request of the visit
+    first_parties: list
+        Whether every request of the visit is a first-party request
+
+    Returns
+    -------
+    dict
+        The rows to insert, by table
+    """
+    rows = {"visits": [(visit_id, source, json_file["website_domain"], json_file["tranco_rank"],
+                        json_file["crawl_mode"], json_file.get("pageload_start_ts"), json_file.get("pageload_end_ts"),
+                        page_load_time, json_file.get("post_pageload_url"), json_file.get("consent_status"),
+                        json_file.get("error"))],
+            "requests": [], "cookies": [], "third_parties": [], "redirects": []}
+    if "error" in json_file:
+        return rows
+
+    for position, request in enumerate(json_file["requests"]):
+        rows["requests"].append((visit_id, position, request.get("request_url"), request_hostnames[position],
+                                 first_parties[position], request.get("nr_cookies"), request.get("timestamp")))
+    for position, cookie in enumerate(json_file["cookies"]):
+        # The first key of a cookie is its name, the other keys are its attributes
+        name = next(iter(cookie), None)
+        attributes = {key.lower(): value for key, value in cookie.items()}
+        rows["cookies"].append((visit_id, position, name, attributes.get("domain"), attributes.get("expires"),
+                                attributes.get("max-age"), json.dumps(cookie)))
+    rows["third_parties"] = [(visit_id, position, domain)
+                             for position, domain in enumerate(json_file["third_party_domains"])]
+    rows["redirects"] = [(visit_id, position, pair[0], pair[1])
+                         for position, pair in enumerate(json_file["redirect_pairs"])]
+    return rows
+
+
+def insert_rows(connection, rows):
+    """Insert the rows of one or more visits
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    rows: dict
+        The rows to insert, by table
+    """
+    for table, table_rows in rows.items():
+        if table_rows:
+            placeholders = ", ".join("?" * len(table_rows[0]))
+            connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", table_rows)
+
+
+def query_visits(connection, columns):
+    """Query the per-visit metrics of the successful visits
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    columns: list
+        The columns to query, keys of VISIT_COLUMNS
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe with the visit id and the columns of every successful visit
+    """
+    expressions = "".join(f", {VISIT_COLUMNS[column]} AS {column}" for column in columns)
+    return pd.read_sql_query(f"SELECT v.visit_id{expressions} FROM visits v WHERE v.error IS NULL ORDER BY v.visit_id",
+                             connection)
+
+
+def query_errors(connection):
+    """Query the visits that failed
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe with the website domain, rank, crawl mode and error of every failed visit
+    """
+    return pd.read_sql_query("SELECT website_domain, tranco_rank, crawl_mode, error FROM visits "
+                             "WHERE error IS NOT NULL ORDER BY visit_id", connection)
+
+
+def query_cookies(connection):
+    """Query the cookies of every successful visit
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+
+    Returns
+    -------
+    dict
+        The list of cookies by visit id, for every visit that stored a cookie
+    """
+    cookies = dict()
+    for visit_id, cookie in connection.execute("SELECT visit_id, cookie FROM cookies ORDER BY visit_id, position"):
+        cookies.setdefault(visit_id, []).append(json.loads(cookie))
+    return cookies
+
+
+def query_top_requests(connection, column, n=1):
+    """Query the `n` requests with the highest value in `column` for every crawl mode
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    column: str
+        The column of the requests table to rank the requests by, e.g., nr_cookies
+    n: int, default=1
+        The number of requests to return per crawl mode
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe with the columns of analyse.REQUEST_COLUMNS, ties are resolved in favour of the request that
+        was stored first
+    """
+    return pd.read_sql_query(f"""
+        SELECT website_domain, crawl_mode, request_hostname, nr_cookies, first_party FROM (
+            SELECT v.website_domain, v.crawl_mode, r.request_hostname, r.nr_cookies, r.first_party = 1 AS first_party,
+                   ROW_NUMBER() OVER (PARTITION BY v.crawl_mode ORDER BY r.{column} DESC, r.rowid) AS position
+            FROM requests r JOIN visits v USING (visit_id))
+        WHERE position <= ? ORDER BY crawl_mode, position""", connection, params=(n,)).astype({"first_party": bool})
+
+
+class QueryPrevalence:
+    """Answers the prevalence questions with queries, with the interface of streaming.PrevalenceAggregator"""
+
+    def __init__(self, connection):
+        """
+        Parameters
+        ----------
+        connection: sqlite3.Connection
+            The connection to the database
+        """
+        self.connection = connection
+
+    def most_common(self, mode, target, n):
+        """Get the `n` most prevalent keys of `target` in the `mode` crawl
+
+        Parameters
+        ----------
+        mode: str
+            The crawl mode, either Desktop or Mobile
+        target: str
+            The target to get the most prevalent keys for, a key of PREVALENCE_QUERIES
+        n: int
+            The number of keys to return
+
+        Returns
+        -------
+        list
+            A list of (key, count) tuples, sorted from the most to the least prevalent key
+        """
+        rows = self.connection.execute(PREVALENCE_QUERIES[target], (mode, n)).fetchall()
+        if target == "tracker_redirection_pairs":
+            return [((source, target), count) for source, target, count in rows]
+        return [tuple(row) for row in rows]
+
+
+def question_inputs(connection, columns, request_table):
+    """Query the inputs of the questions of the analyser
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    columns: set
+        The columns of the crawl data that are needed for the questions
+    request_table: bool
+        Whether the request with the most cookies is needed for the questions
+
+    Returns
+    -------
+    dict
+        A dictionary holding the inputs of the questions, like analyse.preprocess_data. The request_dataframe only
+        holds the request with the most cookies per crawl mode and the prevalence counters are queries.
+    """
+    dataframe = query_visits(connection, [column for column in VISIT_COLUMNS if column in columns])
+    if "cookies" in columns:
+        cookies = query_cookies(connection)
+        dataframe["cookies"] = [cookies.get(visit_id, []) for visit_id in dataframe["visit_id"]]
+    return {"dataframe": dataframe.drop(columns="visit_id"), "err_dataframe": query_errors(connection),
+            "prevalence_counters": QueryPrevalence(connection),
+            "request_dataframe": query_top_requests(connection, "nr_cookies") if request_table else None}
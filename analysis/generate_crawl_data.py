@@ -0,0 +1,331 @@
+"""Synthetic crawl data generator
+
+Writes JSON files in the same format as the crawler (one file per website and crawl mode), so the analyser can be
+tested and benchmarked on crawls that are much larger than the ones we can run live. Third parties are drawn from the
+Disconnect blocklist (with a long tail of non-tracking domains) using a skewed popularity distribution, so the
+prevalence tables look like the ones of a real crawl.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from analyse import read_blocklist
+
+TOP_LEVEL_DOMAINS = ["com", "com", "com", "org", "net", "nl", "de", "co.uk", "io"]
+CONSENT_STATUSES = ["clicked", "clicked", "clicked", "not_found", "not_found", "errored"]
+ERRORS = ["Timeout", "Timeout", "TLS", "Other"]
+USER_AGENTS = {
+    "Desktop": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.5005.61 "
+               "Safari/537.36",
+    "Mobile": "Mozilla/5.0 (iPhone; CPU iPhone OS 13_2_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+              "Version/13.0.3 Mobile/15E148 Safari/604.1"
+}
+ACCEPT_VALUES = ["*/*", "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
+                 "text/css,*/*;q=0.1", "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"]
+CONTENT_TYPES = ["text/html; charset=utf-8", "application/javascript", "image/png", "image/gif", "text/css",
+                 "application/json", "font/woff2"]
+SERVERS = ["nginx", "cloudflare", "Apache", "AmazonS3", "ESF", "Microsoft-IIS/10.0", "sffe"]
+CACHE_CONTROLS = ["no-cache", "max-age=3600", "public, max-age=31536000", "private, no-store", "no-store"]
+PATHS = ["/", "/js/main.js", "/css/style.css", "/img/logo.png", "/pixel.gif", "/collect", "/sync", "/api/v1/event",
+         "/static/app.js", "/fonts/font.woff2"]
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S.%f"
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--sites", action="store", type=int, default=1000,
+                        help="The number of websites to generate crawl data for.")
+    parser.add_argument("-o", "--output", action="store", type=str, default="../synthetic_crawl_data",
+                        help="The directory the JSON files are written to.")
+    parser.add_argument("--modes", action="store", type=str, default="Desktop,Mobile",
+                        help="A comma-separated list of the crawl modes to generate data for.")
+    parser.add_argument("--requests", action="store", type=int, default=80,
+                        help="The average number of requests per website visit.")
+    parser.add_argument("--third-parties", action="store", type=int, default=2000,
+                        help="The number of non-tracking third-party domains in the pool.")
+    parser.add_argument("--error-rate", action="store", type=float, default=0.05,
+                        help="The fraction of website visits that end in a crawl error.")
+    parser.add_argument("--seed", action="store", type=int, default=42,
+                        help="The seed of the random number generator.")
+    return vars(parser.parse_args())
+
+
+def build_domain_pool(nr_third_parties, rng):
+    """Build the pool of third-party domains together with their (skewed) popularity weights
+
+    Parameters
+    ----------
+    nr_third_parties: int
+        The number of non-tracking third-party domains to add to the tracker domains of the blocklist
+    rng: random.Random
+        The random number generator
+
+    Returns
+    -------
+    domains: list
+        A list with all third-party domains
+    weights: list
+        A list with the popularity weight of every domain, following a Zipf-like distribution
+    """
+    tracker_domains = sorted(read_blocklist().keys())
+    other_domains = [f"cdn-{i}.{rng.choice(TOP_LEVEL_DOMAINS)}" for i in range(nr_third_parties)]
+
+    domains = tracker_domains + other_domains
+    rng.shuffle(domains)
+    weights = [1 / (i + 1) for i in range(len(domains))]
+
+    return domains, weights
+
+
+def generate_cookie(rng, domain):
+    """Generate a cookie dictionary in the format produced by the cookie parser of the crawler
+
+    Parameters
+    ----------
+    rng: random.Random
+        The random number generator
+    domain: str
+        The domain that sets the cookie
+
+    Returns
+    -------
+    dict
+        A dictionary with the name and value of the cookie followed by its attributes
+    """
+    name = rng.choice(["_ga", "_gid", "IDE", "uid", "session", "consent", "_fbp", "NID", "visitor_id"])
+    value = "%032x" % rng.getrandbits(128)
+    cookie = {name: value[:rng.randint(8, 32)], "Path": "/", "Domain": f".{domain}"}
+
+    lifespan = rng.random()
+    if lifespan < 0.4:
+        cookie["Max-Age"] = str(rng.randint(60, 400 * 24 * 3600))
+    elif lifespan < 0.8:
+        expiry = datetime.now() + timedelta(days=rng.randint(1, 3650))
+        cookie["Expires"] = expiry.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+    if rng.random() < 0.5:
+        cookie["Secure"] = True
+    if rng.random() < 0.3:
+        cookie["HttpOnly"] = True
+    if rng.random() < 0.5:
+        cookie["SameSite"] = rng.choice(["Lax", "None", "Strict"])
+    cookie["size"] = len(cookie[name])
+
+    return cookie
+
+
+def generate_request(rng, url, timestamp, mode, nr_cookies, location=None):
+    """Generate a request dictionary in the format produced by the crawler
+
+    Parameters
+    ----------
+    rng: random.Random
+        The random number generator
+    url: str
+        The URL of the request
+    timestamp: datetime
+        The time the request was sent
+    mode: str
+        The crawl mode, either Desktop or Mobile
+    nr_cookies: int
+        The number of cookies sent with the request
+    location: str, optional
+        The target of a redirection, added as location header to the response
+
+    Returns
+    -------
+    dict
+        A dictionary with the URL, timestamp, headers and number of cookies of the request
+    """
+    request_headers = {"user-agent": USER_AGENTS[mode],
+                       "accept": rng.choice(ACCEPT_VALUES),
+                       "accept-language": "en-GB,en;q=0.9",
+                       "accept-encoding": "gzip, deflate, br"}
+    if nr_cookies:
+        request_headers["cookie"] = "; ".join(f"c{i}={rng.getrandbits(32):x}" for i in range(nr_cookies))
+
+    response_headers = None
+    if rng.random() < 0.97:
+        response_headers = {"content-type": rng.choice(CONTENT_TYPES),
+                            "server": rng.choice(SERVERS),
+                            "cache-control": rng.choice(CACHE_CONTROLS),
+                            "date": timestamp.strftime("%a, %d %b %Y %H:%M:%S GMT")}
+        if location:
+            response_headers["location"] = location
+
+    return {"request_url": url,
+            "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+            "request_headers": request_headers,
+            "response_headers": response_headers,
+            "nr_cookies": nr_cookies}
+
+
+def generate_redirect_chain(rng, hosts, url, timestamp):
+    """Generate a redirect chain in the format produced by the crawler, which starts at `url` and visits `hosts`
+
+    Parameters
+    ----------
+    rng: random.Random
+        The random number generator of the redirect chains
+    hosts: list
+        The domains of the hops of the chain, of which the first is the domain of `url`
+    url: str
+        The URL of the first request of the chain
+    timestamp: datetime
+        The time the first request of the chain was sent
+
+    Returns
+    -------
+    list
+        A list with the URL, domain, response status, timestamp and offset (in seconds) of every hop
+    """
+    chain = []
+    offset = 0
+    for i, host in enumerate(hosts):
+        if i > 0:
+            url = f"https://sync.{host}/match?uid={rng.getrandbits(32):x}"
+            offset += rng.uniform(0.02, 0.3)
+        status = 302 if i < len(hosts) - 1 else rng.choice([200, 200, 204])
+        chain.append({"url": url, "domain": host, "status": status,
+                      "timestamp": (timestamp + timedelta(seconds=offset)).strftime(TIMESTAMP_FORMAT),
+                      "offset": round(offset, 6)})
+    return chain
+
+
+def generate_visit(params, rng, domain, rank, mode, pool):
+    """Generate the crawl result of a single website visit
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    rng: random.Random
+        The random number generator
+    domain: str
+        The domain that is visited
+    rank: int
+        The Tranco rank of the domain
+    mode: str
+        The crawl mode, either Desktop or Mobile
+    pool: tuple
+        The third-party domains and their popularity weights
+
+    Returns
+    -------
+    dict
+        A dictionary in the same format as the one written by the crawler
+    """
+    url_dict = {"website_domain": domain,
+                "tranco_rank": rank,
+                "crawl_mode": mode}
+
+    if rng.random() < params["error_rate"]:
+        url_dict.update({"error": rng.choice(ERRORS)})
+        return url_dict
+
+    domains, weights = pool
+    # Lower ranked (more popular) websites tend to include a few more third parties
+    nr_third_parties = max(0, int(rng.gauss(25, 12) * (1.2 if rank < params["sites"] / 10 else 1)))
+    third_party_domains = sorted(set(rng.choices(domains, weights=weights, k=nr_third_parties)))
+
+    nr_requests = max(1, int(rng.expovariate(1 / params["requests"])))
+    start = datetime(2022, 10, 1) + timedelta(seconds=rank * 30)
+    page_load_time = rng.lognormvariate(1, 0.6)
+    end = start + timedelta(seconds=page_load_time)
+
+    # The redirect chains are drawn from a separate generator, so the other fields do not depend on them
+    chain_rng = random.Random(f"{params['seed']}/{domain}/{mode}")
+    redirect_pairs = []
+    redirect_chains = []
+    post_pageload_url = f"https://www.{domain}/"
+    if rng.random() < 0.05:
+        target = f"{domain.split('.')[0]}-redirect.com"
+        redirect_pairs.append([domain, target])
+        post_pageload_url = f"https://www.{target}/"
+        redirect_chains.append(generate_redirect_chain(chain_rng, [domain, target], f"https://{domain}/", start))
+
+    requests = []
+    for i in range(nr_requests):
+        host = domain if not third_party_domains or rng.random() < 0.4 else rng.choice(third_party_domains)
+        url = f"https://{rng.choice(['www', 'static', 'cdn', 'px'])}.{host}{rng.choice(PATHS)}"
+        timestamp = start + timedelta(seconds=page_load_time * i / nr_requests)
+        nr_cookies = rng.choice([0, 0, 0, 1, 2, 3, 5, 8]) if rng.random() < 0.5 else 0
+
+        location = None
+        if host != domain and len(third_party_domains) > 1 and rng.random() < 0.03:
+            target_host = rng.choice(third_party_domains)
+            if target_host != host:
+                location = f"https://sync.{target_host}/match?uid={rng.getrandbits(32):x}"
+                redirect_pairs.append([host, target_host])
+                # Cookie syncing partners often redirect further to their own partners
+                hosts = [host, target_host]
+                while len(hosts) < 6 and chain_rng.random() < 0.5:
+                    next_host = chain_rng.choice(third_party_domains)
+                    if next_host != hosts[-1]:
+                        redirect_pairs.append([hosts[-1], next_host])
+                        hosts.append(next_host)
+                redirect_chains.append(generate_redirect_chain(chain_rng, hosts, url, timestamp))
+        requests.append(generate_request(rng, url, timestamp, mode, nr_cookies, location))
+
+    cookies = [generate_cookie(rng, rng.choice([domain] + third_party_domains))
+               for _ in range(rng.randint(0, 30))]
+
+    url_dict.update({"pageload_start_ts": start.strftime(TIMESTAMP_FORMAT),
+                     "pageload_end_ts": end.strftime(TIMESTAMP_FORMAT),
+                     "post_pageload_url": post_pageload_url,
+                     "consent_status": rng.choice(CONSENT_STATUSES),
+                     "cookies": cookies,
+                     "third_party_domains": third_party_domains,
+                     "redirect_pairs": redirect_pairs,
+                     "redirect_chains": redirect_chains,
+                     "requests": requests})
+
+    return url_dict
+
+
+def generate_crawl_data(params):
+    """Generate the JSON files for all synthetic website visits
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    """
+    rng = random.Random(params["seed"])
+    pool = build_domain_pool(params["third_parties"], rng)
+    modes = [mode.strip().capitalize() for mode in params["modes"].split(",")]
+    os.makedirs(params["output"], exist_ok=True)
+
+    for rank in range(1, params["sites"] + 1):
+        domain = f"site-{rank}.{rng.choice(TOP_LEVEL_DOMAINS)}"
+        for mode in modes:
+            url_dict = generate_visit(params, rng, domain, rank, mode, pool)
+            with open(f"{params['output']}/{domain}_{mode.lower()}.json", "w") as out_file:
+                json.dump(url_dict, out_file)
+
+        if rank % 1000 == 0:
+            print(f"Generated the crawl data for {rank} websites.")
+
+    print(f"The synthetic crawl data has been written to {params['output']}!")
+
+
+def main():
+    """Parse arguments and generate the synthetic crawl data
+    """
+    args = parse_arguments()
+    generate_crawl_data(args)
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
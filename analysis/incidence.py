@@ -0,0 +1,295 @@
+"""Incidence
+
+Analyses the structure of the third parties across the crawled websites with sparse site x third-party and site x
+tracker entity incidence matrices, built from the database of ingest.py:
+- reach: the fraction of the websites a third party or entity is present on (the column sums of the matrix)
+- co-occurrence: the number of websites on which two entities are both present (the product of the transposed
+  matrix with the matrix), and their Jaccard similarity
+- rank-bucketed prevalence: the reach within buckets of Tranco ranks (the product of a sparse bucket indicator matrix
+  with the matrix)
+All statistics are computed with sparse matrix products instead of loops over the websites, and a LaTeX table of the
+entity co-occurrence and of the entity reach per rank bucket is written for both crawl modes.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import database
+
+OUTPUT_DIR = "data"
+# The upper bounds of the Tranco rank buckets, the last bucket holds all websites with a higher rank
+RANK_BUCKETS = [100, 1000, 10000]
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", action="store", type=str, default=database.DATABASE_PATH,
+                        help="The path of the database built by ingest.py.")
+    parser.add_argument("--buckets", action="store", type=str, default=",".join(map(str, RANK_BUCKETS)),
+                        help="A comma-separated list of the upper bounds of the Tranco rank buckets.")
+    parser.add_argument("-n", "--top", action="store", type=int, default=10,
+                        help="The number of entity pairs and entities in the tables.")
+    return vars(parser.parse_args())
+
+
+def incidence_matrix(site_ids, key_rows, key_column):
+    """Build a binary sparse incidence matrix from the (visit id, key) pairs of a query
+
+    Parameters
+    ----------
+    site_ids: pandas.Index
+        The visit ids of the websites, in the order of the rows of the matrix
+    key_rows: pandas.core.frame.DataFrame
+        A dataframe with a visit_id column and a column holding the keys
+    key_column: str
+        The name of the column holding the keys
+
+    Returns
+    -------
+    matrix: scipy.sparse.csr_matrix
+        A websites x keys matrix holding 1 if the key is present on the website
+    labels: numpy.ndarray
+        The keys, in the order of the columns of the matrix
+    """
+    rows = site_ids.get_indexer(key_rows["visit_id"])
+    columns, labels = pd.factorize(key_rows[key_column])
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                               shape=(len(site_ids), len(labels)))
+    # Duplicate (website, key) pairs are summed when the matrix is built, a key is only counted once per website
+    matrix.data[:] = 1
+    return matrix, np.asarray(labels)
+
+
+def load_incidence(connection, crawl_mode):
+    """Build the incidence matrices of the successful visits of a crawl mode
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    crawl_mode: str
+        The crawl mode, either Desktop or Mobile
+
+    Returns
+    -------
+    dict
+        The website domains and Tranco ranks of the rows, the site x third-party matrix and its labels and the site x
+        entity matrix and its labels
+    """
+    sites = pd.read_sql_query("SELECT visit_id, website_domain, tranco_rank FROM visits "
+                              "WHERE crawl_mode = ? AND error IS NULL ORDER BY visit_id", connection,
+                              params=(crawl_mode,))
+    site_ids = pd.Index(sites["visit_id"])
+    third_parties = pd.read_sql_query("SELECT t.visit_id, t.domain FROM third_parties t JOIN visits v USING (visit_id) "
+                                      "WHERE v.crawl_mode = ? AND v.error IS NULL", connection, params=(crawl_mode,))
+    entities = pd.read_sql_query("SELECT DISTINCT t.visit_id, m.entity FROM third_parties t "
+                                 "JOIN visits v USING (visit_id) JOIN blocklist_matches m ON m.name = t.domain "
+                                 "WHERE v.crawl_mode = ? AND v.error IS NULL", connection, params=(crawl_mode,))
+
+    site_third_party, third_party_labels = incidence_matrix(site_ids, third_parties, "domain")
+    site_entity, entity_labels = incidence_matrix(site_ids, entities, "entity")
+    return {"sites": sites["website_domain"].to_numpy(), "ranks": sites["tranco_rank"].to_numpy(),
+            "site_third_party": site_third_party, "third_parties": third_party_labels,
+            "site_entity": site_entity, "entities": entity_labels}
+
+
+def reach(matrix):
+    """Compute the fraction of the websites every column of an incidence matrix is present on
+
+    Parameters
+    ----------
+    matrix: scipy.sparse.csr_matrix
+        A binary websites x keys incidence matrix
+
+    Returns
+    -------
+    numpy.ndarray
+        The reach of every key
+    """
+    return np.asarray(matrix.sum(axis=0)).ravel() / max(matrix.shape[0], 1)
+
+
+def cooccurrence(matrix):
+    """Compute the number of websites on which every pair of columns of an incidence matrix is present
+
+    Parameters
+    ----------
+    matrix: scipy.sparse.csr_matrix
+        A binary websites x keys incidence matrix
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        A symmetric keys x keys matrix, of which the diagonal holds the number of websites of every key
+    """
+    return (matrix.T @ matrix).tocsr()
+
+
+def top_pairs(cooccurrences, labels, n):
+    """Find the pairs of keys that co-occur on the most websites
+
+    Parameters
+    ----------
+    cooccurrences: scipy.sparse.csr_matrix
+        The keys x keys co-occurrence matrix
+    labels: numpy.ndarray
+        The keys, in the order of the rows and columns of the matrix
+    n: int
+        The number of pairs to return
+
+    Returns
+    -------
+    list
+        A list of (key, key, number of websites, Jaccard similarity) tuples, from the most to the least co-occurring
+        pair
+    """
+    counts = cooccurrences.diagonal()
+    pairs = sparse.triu(cooccurrences, k=1).tocoo()
+    order = np.argsort(-pairs.data, kind="stable")[:n]
+    return [(labels[pairs.row[i]], labels[pairs.col[i]], int(pairs.data[i]),
+             pairs.data[i] / (counts[pairs.row[i]] + counts[pairs.col[i]] - pairs.data[i])) for i in order]
+
+
+def rank_bucket_prevalence(matrix, ranks, buckets):
+    """Compute the reach of every column of an incidence matrix within buckets of Tranco ranks
+
+    Parameters
+    ----------
+    matrix: scipy.sparse.csr_matrix
+        A binary websites x keys incidence matrix
+    ranks: numpy.ndarray
+        The Tranco rank of every website
+    buckets: list
+        The upper bounds of the rank buckets, the last bucket holds all websites with a higher rank
+
+    Returns
+    -------
+    numpy.ndarray
+        A buckets x keys array with the fraction of the websites in a bucket the key is present on
+    """
+    bucket = np.searchsorted(buckets, ranks)
+    indicator = sparse.csr_matrix((np.ones(len(ranks), dtype=np.int32), (bucket, np.arange(len(ranks)))),
+                                  shape=(len(buckets) + 1, len(ranks)))
+    sizes = np.asarray(indicator.sum(axis=1)).ravel()
+    return (indicator @ matrix).toarray() / np.maximum(sizes, 1)[:, None]
+
+
+def bucket_labels(buckets):
+    """Describe the rank buckets
+
+    Parameters
+    ----------
+    buckets: list
+        The upper bounds of the rank buckets
+
+    Returns
+    -------
+    list
+        A label per bucket, e.g., 1-100, 101-1000 and 1001+
+    """
+    lower = [1] + [bound + 1 for bound in buckets]
+    return [f"{low}-{high}" for low, high in zip(lower, buckets)] + [f"{lower[-1]}+"]
+
+
+def generate_table_cooccurrence(crawl_mode, pairs):
+    """Generate a LaTeX table holding the tracker entities that co-occur on the most websites in the `crawl_mode` crawl
+
+    Parameters
+    ----------
+    crawl_mode: str
+        The crawl mode for which the table needs to be generated
+    pairs: list
+        A list of (entity, entity, number of websites, Jaccard similarity) tuples
+    """
+    with open(f"{OUTPUT_DIR}/table_entity_cooccurrence_{crawl_mode.lower()}.tex", "w") as file:
+        file.write("\\begin{table}[ht] \n")
+        file.write("\\caption{The tracker entities that co-occur on the most websites (%s crawl).} \n" % crawl_mode)
+        file.write("\\centering \n")
+        file.write("\\begin{tabular}{|l|l|l|r|r|} \n")
+        file.write("\\hline \n")
+        file.write("& \\textbf{Entity} & \\textbf{Entity} & \\textbf{\\# websites} & \\textbf{Jaccard} \\\\ \\hline \n")
+        for i, (first, second, count, jaccard) in enumerate(pairs):
+            file.write("\\textbf{%d} & %s & %s & %d & %.2f \\\\ \\hline \n" % (i + 1, first, second, count, jaccard))
+        file.write("\\end{tabular} \n")
+        file.write("\\label{tab:cooccurrence%s} \n" % crawl_mode)
+        file.write("\\end{table}")
+
+
+def generate_table_reach(crawl_mode, entity_labels, entities, entity_reach, prevalence, buckets):
+    """Generate a LaTeX table holding the reach of the tracker entities per rank bucket in the `crawl_mode` crawl
+
+    Parameters
+    ----------
+    crawl_mode: str
+        The crawl mode for which the table needs to be generated
+    entity_labels: numpy.ndarray
+        The names of all entities
+    entities: list
+        The indices of the entities in the table, from the highest to the lowest reach
+    entity_reach: numpy.ndarray
+        The reach of every entity over all websites
+    prevalence: numpy.ndarray
+        The buckets x entities array with the reach of every entity per rank bucket
+    buckets: list
+        The labels of the rank buckets
+    """
+    with open(f"{OUTPUT_DIR}/table_entity_reach_{crawl_mode.lower()}.tex", "w") as file:
+        file.write("\\begin{table}[ht] \n")
+        file.write("\\caption{The reach of the tracker entities per Tranco rank bucket (%s crawl).} \n" % crawl_mode)
+        file.write("\\centering \n")
+        file.write("\\begin{tabular}{|l|l|r|%s} \n" % ("r|" * len(buckets)))
+        file.write("\\hline \n")
+        file.write("& \\textbf{Entity} & \\textbf{All} & %s \\\\ \\hline \n"
+                   % " & ".join("\\textbf{%s}" % bucket for bucket in buckets))
+        for i, entity in enumerate(entities):
+            file.write("\\textbf{%d} & %s & %.1f\\%% & %s \\\\ \\hline \n"
+                       % (i + 1, entity_labels[entity], 100 * entity_reach[entity],
+                          " & ".join("%.1f\\%%" % (100 * value) for value in prevalence[:, entity])))
+        file.write("\\end{tabular} \n")
+        file.write("\\label{tab:reach%s} \n" % crawl_mode)
+        file.write("\\end{table}")
+
+
+def main():
+    """Parse arguments, build the incidence matrices of both crawl modes and generate their tables
+    """
+    args = parse_arguments()
+    if not os.path.isfile(args["database"]):
+        raise SystemExit(f"No database found at {args['database']}, run ingest.py first.")
+    buckets = sorted(int(bound) for bound in args["buckets"].split(","))
+    connection = database.connect(args["database"])
+
+    for crawl_mode in ["Desktop", "Mobile"]:
+        incidence = load_incidence(connection, crawl_mode)
+        site_entity = incidence["site_entity"]
+        print(f"{crawl_mode}: {site_entity.shape[0]} websites, {incidence['site_third_party'].shape[1]} third parties "
+              f"and {site_entity.shape[1]} tracker entities.")
+
+        pairs = top_pairs(cooccurrence(site_entity), incidence["entities"], args["top"])
+        generate_table_cooccurrence(crawl_mode, pairs)
+
+        entity_reach = reach(site_entity)
+        entities = np.argsort(-entity_reach, kind="stable")[:args["top"]]
+        prevalence = rank_bucket_prevalence(site_entity, incidence["ranks"], buckets)
+        generate_table_reach(crawl_mode, incidence["entities"], entities, entity_reach, prevalence,
+                             bucket_labels(buckets))
+    connection.close()
+
+    print(f"The co-occurrence and reach tables have been written to {OUTPUT_DIR}!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
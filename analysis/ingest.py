@@ -0,0 +1,156 @@
+"""Ingest
+
+Loads the crawl data into the SQLite database of database.py, after which the analyser can answer the questions with
+queries (analyse.py --database). The crawl data is only loaded again when a crawl file was added, removed or modified,
+and the blocklist matches are only recomputed when the crawl data or the blocklist changed.
+"""
+import argparse
+import os
+import time
+from urllib.parse import urlparse
+
+from tld import get_fld
+
+import analyse
+import cache
+import database
+from crawl_files import iter_records, list_crawl_files
+from tracker_tags import TrackerTags
+
+# The number of visits that are inserted at once
+BATCH_SIZE = 500
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--data", action="store", type=str, default=analyse.CRAWL_DATA_DIR,
+                        help="The directory with the crawl data to ingest.")
+    parser.add_argument("-o", "--output", action="store", type=str, default=database.DATABASE_PATH,
+                        help="The path of the SQLite database.")
+    parser.add_argument("-f", "--force", action="store_true", required=False,
+                        help="Ingest the crawl data even if it did not change since the last ingest.")
+    return vars(parser.parse_args())
+
+
+def ingest_crawl_data(connection, files):
+    """Replace the crawl data in the database by the records of the crawl files
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    files: list
+        The paths of the crawl files
+
+    Returns
+    -------
+    int
+        The number of ingested visits
+    """
+    database.clear_data(connection)
+    # Hostnames repeat a lot, so look up the first-party domain only once for every distinct hostname
+    hostname_domains = dict()
+    batch = {table: [] for table in database.DATA_TABLES}
+    visit_id = 0
+
+    for source, json_file in iter_records(files):
+        try:
+            page_load_time, request_hostnames, first_parties = None, [], []
+            if "error" not in json_file:
+                page_load_time = analyse.calculate_page_load_time(json_file['pageload_start_ts'],
+                                                                  json_file['pageload_end_ts'])
+                for request in json_file['requests']:
+                    hostname = urlparse(request.get("request_url")).hostname
+                    if hostname not in hostname_domains:
+                        hostname_domains[hostname] = hostname and get_fld(hostname, fix_protocol=True,
+                                                                          fail_silently=True)
+                    request_hostnames.append(hostname)
+                    first_parties.append(hostname_domains[hostname] == json_file['website_domain'])
+            rows = database.visit_rows(visit_id + 1, source, json_file, page_load_time, request_hostnames,
+                                       first_parties)
+        except KeyError:
+            print(f"Skipping {source} because of bad formatting.")
+            continue
+
+        visit_id += 1
+        for table, table_rows in rows.items():
+            batch[table].extend(table_rows)
+        if len(batch["visits"]) >= BATCH_SIZE:
+            database.insert_rows(connection, batch)
+            batch = {table: [] for table in database.DATA_TABLES}
+
+    database.insert_rows(connection, batch)
+    connection.executescript(database.INDICES)
+    return visit_id
+
+
+def match_blocklist(connection, tags):
+    """Replace the blocklist matches by the matches of the third-party domains and redirection hostnames
+
+    Parameters
+    ----------
+    connection: sqlite3.Connection
+        The connection to the database
+    tags: tracker_tags.TrackerTags
+        The tags of the domains and hostnames with the blocklist, shared with the analyser
+
+    Returns
+    -------
+    int
+        The number of names that match the blocklist
+    """
+    names = connection.execute("SELECT domain FROM third_parties UNION SELECT source FROM redirects "
+                               "UNION SELECT target FROM redirects").fetchall()
+    matches = [(name,) + tags.tag(name) for (name,) in names if tags.is_tracker(name)]
+
+    connection.execute("DROP TABLE IF EXISTS blocklist_matches")
+    connection.execute(database.BLOCKLIST_MATCHES_TABLE)
+    connection.executemany("INSERT INTO blocklist_matches VALUES (?, ?, ?, ?)", matches)
+    tags.save()
+    return len(matches)
+
+
+def main():
+    """Parse arguments and ingest the crawl data and blocklist matches that changed since the last ingest
+    """
+    args = parse_arguments()
+    os.makedirs(os.path.dirname(args["output"]) or ".", exist_ok=True)
+    files = list_crawl_files(args["data"])
+    data_key = cache.fingerprint_files(files)
+    tags = TrackerTags(analyse.BLOCKLIST_PATH)
+
+    connection = database.connect(args["output"])
+    # The database can be rebuilt from the crawl data, so it does not need to survive a crash during the ingest
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    with connection:
+        start = time.perf_counter()
+        data_changed = args["force"] or database.read_meta(connection, "data_fingerprint") != data_key
+        if data_changed:
+            nr_visits = ingest_crawl_data(connection, files)
+            database.write_meta(connection, "data_fingerprint", data_key)
+            print(f"Ingested {nr_visits} visits from {len(files)} files in {time.perf_counter() - start:.1f} s.")
+        else:
+            print(f"The crawl data in {args['data']} did not change since the last ingest.")
+
+        if data_changed or database.read_meta(connection, "blocklist_fingerprint") != tags.version:
+            nr_matches = match_blocklist(connection, tags)
+            database.write_meta(connection, "blocklist_fingerprint", tags.version)
+            print(f"Matched {nr_matches} third-party domains and redirection hostnames with the blocklist.")
+    connection.close()
+
+    print(f"The crawl data has been ingested into {args['output']}!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
@@ -0,0 +1,58 @@
+"""Lazy requests
+
+The requests of a visit, with all their headers, are by far the largest part of the crawl data, while the questions only
+use a few of their fields. The requests are therefore kept out of the site-level dataframe: a question declares the
+request fields it needs (e.g., request_url and nr_cookies), and only these fields are projected from the requests while
+the crawl data is read. The headers are only expanded when a header field is requested.
+"""
+from crawl_files import iter_records
+from request_list import RequestList
+
+# The fields of a request that hold headers, which may need to be expanded from the header table of the file
+HEADER_FIELDS = {"request_headers", "response_headers"}
+
+
+def project_requests(json_file, fields):
+    """Project the requests of a crawl record on the given fields
+
+    Parameters
+    ----------
+    json_file: dict
+        The crawl record of a successful visit
+    fields: list
+        The fields of the requests to keep, e.g., ["request_url", "nr_cookies"]
+
+    Yields
+    ------
+    tuple
+        The website domain and crawl mode of the visit, followed by the values of the fields of a request
+    """
+    requests = json_file['requests']
+    if HEADER_FIELDS.intersection(fields):
+        requests = RequestList(requests, json_file.get('header_table'))
+    visit = (json_file['website_domain'], json_file['crawl_mode'])
+    for request in requests:
+        yield visit + tuple(request.get(field) for field in fields)
+
+
+def iter_request_rows(files, fields):
+    """Read the projected requests of all successful visits, one crawl record at a time
+
+    Parameters
+    ----------
+    files: list
+        The paths of the crawl files
+    fields: list
+        The fields of the requests to keep
+
+    Yields
+    ------
+    tuple
+        The website domain and crawl mode of the visit, followed by the values of the fields of a request
+    """
+    for source, json_file in iter_records(files):
+        if "error" not in json_file:
+            try:
+                yield from project_requests(json_file, fields)
+            except KeyError:
+                print(f"Skipping {source} because of bad formatting.")
@@ -0,0 +1,344 @@
+"""Redirect graph
+
+Builds an indexed graph of the redirections of all websites of a crawl from the ordered redirect chains recorded by the
+crawler (redirect_chains, with the timing of every hop). Crawl data without redirect chains falls back to the
+redirection pairs, as chains of a single redirection. The domains are the nodes of the graph and every redirection
+between two domains is an edge, stored in an adjacency map that counts the websites the redirection occurs on. The graph
+answers the following questions for both crawl modes, of which a LaTeX table is written:
+- the longest redirect chains and their duration
+- the tracker-to-tracker sync paths: the chains of consecutive tracker domains (cookie syncing), and the number of
+  websites they occur on
+- the fan-out of the tracker entities: the domains and entities that can be reached from the domains of an entity
+"""
+import argparse
+from collections import Counter, defaultdict, deque
+import heapq
+import os
+
+import analyse
+from crawl_files import iter_records, list_crawl_files
+from tracker_tags import TrackerTags
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--data", action="store", type=str, default=analyse.CRAWL_DATA_DIR,
+                        help="The directory with the crawl data.")
+    parser.add_argument("-n", "--top", action="store", type=int, default=10,
+                        help="The number of chains, sync paths and entities in the tables.")
+    return vars(parser.parse_args())
+
+
+def record_chains(json_file):
+    """Get the redirect chains of a visit
+
+    Parameters
+    ----------
+    json_file: dict
+        The crawl record of a successful visit
+
+    Returns
+    -------
+    list
+        A list with the hops of every chain, see detect_redirect_chains in crawler_src/crawl.py. Crawl data without
+        redirect chains gives a chain without timing for every redirection pair.
+    """
+    if "redirect_chains" in json_file:
+        return json_file['redirect_chains']
+    return [[{"domain": source, "offset": None}, {"domain": target, "offset": None}]
+            for source, target in json_file['redirect_pairs']]
+
+
+class RedirectGraph:
+    """The redirections between domains of all websites of a crawl, indexed by domain"""
+
+    def __init__(self):
+        # The domain of every node and the node of every domain
+        self.domains = []
+        self.nodes = dict()
+        # The number of websites every redirection occurs on, indexed by the source and then the target node
+        self.successors = defaultdict(Counter)
+        # The website, (distinct consecutive) nodes, number of hops and duration of every chain
+        self.chains = []
+
+    def node(self, domain):
+        """Get the node of a domain, adding it to the graph if it is new
+
+        Parameters
+        ----------
+        domain: str
+            The domain
+
+        Returns
+        -------
+        int
+            The node of the domain
+        """
+        if domain not in self.nodes:
+            self.nodes[domain] = len(self.domains)
+            self.domains.append(domain)
+        return self.nodes[domain]
+
+    def add_website(self, website_domain, chains):
+        """Add the redirect chains of a website to the graph
+
+        Parameters
+        ----------
+        website_domain: str
+            The domain of the website
+        chains: list
+            The hops of every redirect chain of the website, see record_chains
+        """
+        edges = set()
+        for hops in chains:
+            nodes = []
+            for hop in hops:
+                # Hops within the same domain (e.g., to the www subdomain) are not a redirection between domains
+                if hop["domain"] and (not nodes or self.domains[nodes[-1]] != hop["domain"]):
+                    nodes.append(self.node(hop["domain"]))
+            edges.update(zip(nodes, nodes[1:]))
+            # The last hop has no timing if its request was not captured
+            duration = max((hop["offset"] for hop in hops if hop["offset"] is not None), default=None)
+            self.chains.append((website_domain, tuple(nodes), len(hops), duration))
+
+        # The adjacency map counts every redirection once per website
+        for source, target in edges:
+            self.successors[source][target] += 1
+
+    def reachable(self, sources):
+        """Find the nodes that can be reached from a set of nodes by following the redirections
+
+        Parameters
+        ----------
+        sources: set
+            The nodes to start from
+
+        Returns
+        -------
+        set
+            The nodes that are reachable in one or more redirections, excluding the sources themselves
+        """
+        seen = set(sources)
+        queue = deque(sources)
+        while queue:
+            for target in self.successors.get(queue.popleft(), ()):
+                if target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return seen - set(sources)
+
+    def longest_chains(self, n):
+        """Find the chains with the most hops
+
+        Parameters
+        ----------
+        n: int
+            The number of chains to return
+
+        Returns
+        -------
+        list
+            A list of (website domain, domains, number of hops, duration) tuples, from the longest to the shortest
+            chain, ties are resolved by the duration and then in favour of the chain that was added first
+        """
+        longest = heapq.nlargest(n, self.chains, key=lambda chain: (chain[2], chain[3] or 0))
+        return [(website_domain, [self.domains[node] for node in nodes], nr_hops, duration)
+                for website_domain, nodes, nr_hops, duration in longest]
+
+    def tracker_sync_paths(self, tags, n):
+        """Find the most common paths of consecutive tracker domains in the chains
+
+        Parameters
+        ----------
+        tags: tracker_tags.TrackerTags
+            The tags of the domains with the blocklist
+        n: int
+            The number of paths to return
+
+        Returns
+        -------
+        list
+            A list of (domains, number of websites) tuples, from the most to the least common path, ties are resolved in
+            favour of the path that was found first
+        """
+        trackers = {node for node, domain in enumerate(self.domains) if tags.is_tracker(domain)}
+        paths = Counter()
+        # The paths of the current website, in the order they were found (a path is counted once per website)
+        website_paths = dict()
+        previous_website = None
+        for website_domain, nodes, _, _ in self.chains:
+            if website_domain != previous_website:
+                paths.update(website_paths.keys())
+                website_paths, previous_website = dict(), website_domain
+            run = []
+            for node in nodes + (None,):
+                if node in trackers:
+                    run.append(node)
+                    continue
+                if len(run) > 1:
+                    website_paths[tuple(run)] = None
+                run = []
+        paths.update(website_paths.keys())
+        return [([self.domains[node] for node in path], count) for path, count in paths.most_common(n)]
+
+    def entity_fan_out(self, tags, n):
+        """Find the tracker entities of which the domains redirect to the most other domains
+
+        Parameters
+        ----------
+        tags: tracker_tags.TrackerTags
+            The tags of the domains with the blocklist
+        n: int
+            The number of entities to return
+
+        Returns
+        -------
+        list
+            A list of (entity, number of domains, number of direct targets, number of reachable domains, number of
+            reachable entities) tuples, from the highest to the lowest number of direct targets
+        """
+        entity_nodes = defaultdict(set)
+        for node, domain in enumerate(self.domains):
+            if tags.is_tracker(domain):
+                entity_nodes[tags.tag(domain)[1]].add(node)
+
+        fan_out = []
+        for entity, nodes in entity_nodes.items():
+            targets = {target for node in nodes for target in self.successors.get(node, ())} - nodes
+            reachable = self.reachable(nodes)
+            entities = {tags.tag(self.domains[node])[1] for node in reachable if tags.is_tracker(self.domains[node])}
+            fan_out.append((entity, len(nodes), len(targets), len(reachable), len(entities - {entity})))
+        return heapq.nlargest(n, fan_out, key=lambda entry: (entry[2], entry[3]))
+
+
+def build_redirect_graphs(files):
+    """Build the redirect graph of every crawl mode
+
+    Parameters
+    ----------
+    files: list
+        The paths of the crawl files
+
+    Returns
+    -------
+    dict
+        A dictionary with the crawl mode as key and its RedirectGraph as value
+    """
+    graphs = defaultdict(RedirectGraph)
+    for source, json_file in iter_records(files):
+        if "error" in json_file:
+            continue
+        try:
+            graphs[json_file['crawl_mode']].add_website(json_file['website_domain'], record_chains(json_file))
+        except KeyError:
+            print(f"Skipping {source} because of bad formatting.")
+    return graphs
+
+
+def generate_table_longest_chains(crawl_mode, chains):
+    """Generate a LaTeX table holding the longest redirect chains in the `crawl_mode` crawl
+
+    Parameters
+    ----------
+    crawl_mode: str
+        The crawl mode for which the table needs to be generated
+    chains: list
+        A list of (website domain, domains, number of hops, duration) tuples
+    """
+    with open(f"{analyse.OUTPUT_DIR}/table_longest_redirect_chains_{crawl_mode.lower()}.tex", "w") as file:
+        file.write("\\begin{table}[ht] \n")
+        file.write("\\caption{The longest redirect chains (%s crawl).} \n" % crawl_mode)
+        file.write("\\centering \n")
+        file.write("\\begin{tabular}{|l|l|l|r|r|} \n")
+        file.write("\\hline \n")
+        file.write("& \\textbf{Website} & \\textbf{Chain} & \\textbf{\\# hops} & \\textbf{Duration (s)} "
+                   "\\\\ \\hline \n")
+        for i, (website_domain, domains, nr_hops, duration) in enumerate(chains):
+            file.write("\\textbf{%d} & %s & %s & %d & %s \\\\ \\hline \n"
+                       % (i + 1, website_domain, " $\\rightarrow$ ".join(domains), nr_hops,
+                          "-" if duration is None else "%.2f" % duration))
+        file.write("\\end{tabular} \n")
+        file.write("\\label{tab:redirectChains%s} \n" % crawl_mode)
+        file.write("\\end{table}")
+
+
+def generate_table_sync_paths(crawl_mode, paths):
+    """Generate a LaTeX table holding the most common tracker-to-tracker sync paths in the `crawl_mode` crawl
+
+    Parameters
+    ----------
+    crawl_mode: str
+        The crawl mode for which the table needs to be generated
+    paths: list
+        A list of (domains, number of websites) tuples
+    """
+    with open(f"{analyse.OUTPUT_DIR}/table_tracker_sync_paths_{crawl_mode.lower()}.tex", "w") as file:
+        file.write("\\begin{table}[ht] \n")
+        file.write("\\caption{The most common tracker-to-tracker sync paths (%s crawl).} \n" % crawl_mode)
+        file.write("\\centering \n")
+        file.write("\\begin{tabular}{|l|l|r|} \n")
+        file.write("\\hline \n")
+        file.write("& \\textbf{Sync path} & \\textbf{\\# websites} \\\\ \\hline \n")
+        for i, (domains, count) in enumerate(paths):
+            file.write("\\textbf{%d} & %s & %d \\\\ \\hline \n" % (i + 1, " $\\rightarrow$ ".join(domains), count))
+        file.write("\\end{tabular} \n")
+        file.write("\\label{tab:syncPaths%s} \n" % crawl_mode)
+        file.write("\\end{table}")
+
+
+def generate_table_fan_out(crawl_mode, fan_out):
+    """Generate a LaTeX table holding the tracker entities that redirect to the most domains in the `crawl_mode` crawl
+
+    Parameters
+    ----------
+    crawl_mode: str
+        The crawl mode for which the table needs to be generated
+    fan_out: list
+        A list of (entity, number of domains, number of direct targets, number of reachable domains, number of
+        reachable entities) tuples
+    """
+    with open(f"{analyse.OUTPUT_DIR}/table_entity_fan_out_{crawl_mode.lower()}.tex", "w") as file:
+        file.write("\\begin{table}[ht] \n")
+        file.write("\\caption{The tracker entities with the highest redirection fan-out (%s crawl).} \n" % crawl_mode)
+        file.write("\\centering \n")
+        file.write("\\begin{tabular}{|l|l|r|r|r|r|} \n")
+        file.write("\\hline \n")
+        file.write("& \\textbf{Entity} & \\textbf{\\# domains} & \\textbf{\\# targets} & \\textbf{\\# reachable} & "
+                   "\\textbf{\\# reachable entities} \\\\ \\hline \n")
+        for i, entry in enumerate(fan_out):
+            file.write("\\textbf{%d} & %s & %d & %d & %d & %d \\\\ \\hline \n" % ((i + 1,) + entry))
+        file.write("\\end{tabular} \n")
+        file.write("\\label{tab:fanOut%s} \n" % crawl_mode)
+        file.write("\\end{table}")
+
+
+def main():
+    """Parse arguments, build the redirect graphs of both crawl modes and generate their tables
+    """
+    args = parse_arguments()
+    graphs = build_redirect_graphs(list_crawl_files(args["data"]))
+    tags = TrackerTags(analyse.BLOCKLIST_PATH)
+
+    for crawl_mode in ["Desktop", "Mobile"]:
+        graph = graphs[crawl_mode]
+        print(f"{crawl_mode}: {len(graph.chains)} redirect chains between {len(graph.domains)} domains.")
+        generate_table_longest_chains(crawl_mode, graph.longest_chains(args["top"]))
+        generate_table_sync_paths(crawl_mode, graph.tracker_sync_paths(tags, args["top"]))
+        generate_table_fan_out(crawl_mode, graph.entity_fan_out(tags, args["top"]))
+    tags.save()
+
+    print(f"The redirect chain tables have been written to {analyse.OUTPUT_DIR}!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
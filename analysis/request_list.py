@@ -0,0 +1,60 @@
+"""Request list
+
+Reads the requests of crawl files whose headers are stored in the compact representation of
+crawler_src/header_table.py: the header names and the values that repeat within a file are interned in a header table,
+and the headers of every request are a list of [name, value] pairs holding indices in that table. The requests are
+kept compact in the dataframe and the headers of a request are only expanded to a dictionary when it is accessed.
+"""
+from collections.abc import Sequence
+
+
+def expand_headers(headers, header_table):
+    """Expand compact headers to a dictionary
+
+    Parameters
+    ----------
+    headers: list
+        The [name, value] pairs of the compact representation, or None
+    header_table: dict
+        The header table of the file
+
+    Returns
+    -------
+    dict
+        The headers, or None if the request had no (response) headers
+    """
+    if headers is None:
+        return None
+    names, values = header_table["names"], header_table["values"]
+    return {names[name]: values[value] if isinstance(value, int) else value for name, value in headers}
+
+
+class RequestList(Sequence):
+    """The requests of a crawl file, of which the headers are expanded lazily"""
+
+    def __init__(self, requests, header_table=None):
+        """
+        Parameters
+        ----------
+        requests: list
+            The requests as stored in the crawl file
+        header_table: dict, optional
+            The header table of the file, None if the headers are stored as dictionaries
+        """
+        self.requests = requests
+        self.header_table = header_table
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RequestList(self.requests[index], self.header_table)
+        request = self.requests[index]
+        if self.header_table is None:
+            return request
+        return dict(request, request_headers=expand_headers(request["request_headers"], self.header_table),
+                    response_headers=expand_headers(request["response_headers"], self.header_table))
+
+    def __repr__(self):
+        return f"RequestList({len(self)} requests)"
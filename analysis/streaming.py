@@ -0,0 +1,161 @@
+"""Streaming aggregation
+
+Counts the prevalence of third parties, trackers and redirection pairs while the crawl records are read one at a time,
+so the memory usage grows with the number of distinct keys instead of with the total number of occurrences. For very
+large crawls the exact counters can be replaced by bounded-memory Space-Saving counters that approximate the most
+prevalent keys.
+"""
+from collections import Counter
+import heapq
+
+
+class SpaceSaving:
+    """Approximate counter of the heavy hitters in a stream using at most `capacity` counters (Metwally et al., 2005)
+
+    Every key whose true count is larger than (number of items / capacity) is guaranteed to be monitored, and the count
+    of a monitored key overestimates its true count by at most its recorded error.
+    """
+
+    def __init__(self, capacity):
+        """
+        Parameters
+        ----------
+        capacity: int
+            The maximal number of keys that are monitored at the same time
+        """
+        self.capacity = capacity
+        self.counts = dict()
+        self.errors = dict()
+        # Min-heap of (count, key) entries, outdated entries are skipped when popped and removed when compacting
+        self.heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def increment(self, key):
+        """Count a single occurrence of `key`
+
+        Parameters
+        ----------
+        key: hashable
+            The key that occurred in the stream
+        """
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.errors[key] = 0
+        else:
+            # Replace the key with the smallest count, the new key inherits its count as error
+            minimum, evicted = heapq.heappop(self.heap)
+            while self.counts.get(evicted) != minimum:
+                minimum, evicted = heapq.heappop(self.heap)
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[key] = minimum + 1
+            self.errors[key] = minimum
+
+        heapq.heappush(self.heap, (self.counts[key], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def update(self, keys):
+        """Count all occurrences in `keys`
+
+        Parameters
+        ----------
+        keys: iterable
+            The keys that occurred in the stream
+        """
+        for key in keys:
+            self.increment(key)
+
+    def most_common(self, n=None):
+        """Get the `n` keys with the highest (estimated) counts
+
+        Parameters
+        ----------
+        n: int, optional
+            The number of keys to return, all monitored keys are returned if it is not provided
+
+        Returns
+        -------
+        list
+            A list of (key, count) tuples, sorted from the most to the least common key
+        """
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return items if n is None else items[:n]
+
+
+def new_counter(capacity=None):
+    """Create a counter for a stream of keys
+
+    Parameters
+    ----------
+    capacity: int, optional
+        The maximal number of keys to monitor, an exact counter is used if it is not provided
+
+    Returns
+    -------
+    collections.Counter or SpaceSaving
+        A counter with the `update` and `most_common` methods
+    """
+    if capacity:
+        return SpaceSaving(capacity)
+    return Counter()
+
+
+class PrevalenceAggregator:
+    """Maintains a counter per crawl mode for every prevalence target, e.g., third_party_domains
+    """
+
+    def __init__(self, targets, capacity=None):
+        """
+        Parameters
+        ----------
+        targets: iterable
+            The names of the targets that are counted
+        capacity: int, optional
+            The maximal number of keys to monitor per counter, exact counters are used if it is not provided
+        """
+        self.targets = set(targets)
+        self.capacity = capacity
+        self.counters = {target: dict() for target in self.targets}
+
+    def add(self, mode, target, keys):
+        """Count the keys of `target` found in a single crawl record
+
+        Parameters
+        ----------
+        mode: str
+            The crawl mode of the record, either Desktop or Mobile
+        target: str
+            The target the keys belong to
+        keys: iterable
+            The keys found in the record
+        """
+        counters = self.counters[target]
+        if mode not in counters:
+            counters[mode] = new_counter(self.capacity)
+        counters[mode].update(keys)
+
+    def most_common(self, mode, target, n):
+        """Get the `n` most prevalent keys of `target` in the `mode` crawl
+
+        Parameters
+        ----------
+        mode: str
+            The crawl mode, either Desktop or Mobile
+        target: str
+            The target to get the most prevalent keys for
+        n: int
+            The number of keys to return
+
+        Returns
+        -------
+        list
+            A list of (key, count) tuples, sorted from the most to the least prevalent key
+        """
+        counter = self.counters[target].get(mode)
+        return counter.most_common(n) if counter is not None else []
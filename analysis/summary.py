@@ -0,0 +1,126 @@
+"""Summary statistics
+
+Computes the aggregates of the site table per crawl mode for the tables of the analyser: the number of websites per
+value of a categorical column (e.g., the error or consent status), and the count, minimum, maximum, median and any
+number of quantiles of numerical metrics (e.g., the page load time). The groups are factorized only once, and every
+metric is sorted once (by group and value), after which all of its order statistics are read from the sorted values.
+Adding a statistic or a quantile therefore does not add another sort, while every metric takes one sort of its own.
+"""
+import numpy as np
+import pandas as pd
+
+# The statistics that are computed for every metric, followed by the requested quantiles
+STATISTICS = ["count", "min", "max", "median"]
+
+
+def quantile_label(quantile):
+    """Get the name of the statistic holding a quantile
+
+    Parameters
+    ----------
+    quantile: float
+        The quantile, between 0 and 1
+
+    Returns
+    -------
+    str
+        The name of the statistic, e.g., p90 for the 0.9 quantile
+    """
+    return f"p{100 * quantile:g}"
+
+
+def order_statistic(sorted_values, starts, counts, quantile):
+    """Read a quantile of every group from the values sorted within their groups, interpolating linearly between the
+    two nearest values
+
+    Parameters
+    ----------
+    sorted_values: numpy.ndarray
+        The values of the metric, sorted by group and then by value
+    starts: numpy.ndarray
+        The position of the first value of every group
+    counts: numpy.ndarray
+        The number of (non-missing) values of every group, which come first within the group
+    quantile: float
+        The quantile, between 0 and 1
+
+    Returns
+    -------
+    numpy.ndarray
+        The quantile of every group, NaN for a group without values
+    """
+    position = quantile * (np.maximum(counts, 1) - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    low = sorted_values[starts + lower].astype(np.float64)
+    high = sorted_values[starts + upper].astype(np.float64)
+    if quantile == 0.5:
+        # The median of an even number of values is the mean of the middle two values
+        values = (low + high) / 2
+    else:
+        values = low + (high - low) * (position - lower)
+    return np.where(counts > 0, values, np.nan)
+
+
+def summarise(dataframe, metrics, quantiles=(), by="crawl_mode"):
+    """Compute the summary statistics of the metrics per group, with a single sort per metric
+
+    Parameters
+    ----------
+    dataframe: pandas.core.frame.DataFrame
+        The site table
+    metrics: list
+        The numerical columns to summarise
+    quantiles: list, optional
+        The quantiles (between 0 and 1) to compute in addition to STATISTICS
+    by: str, default=crawl_mode
+        The column to group the rows by
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe indexed by the (sorted) groups, with a (metric, statistic) column for every statistic in
+        STATISTICS and every quantile (see quantile_label). Missing values are ignored, and the minimum and maximum keep
+        the type of the metric.
+    """
+    codes, groups = pd.factorize(dataframe[by], sort=True)
+    summary = {}
+    for metric in metrics:
+        values = dataframe[metric].to_numpy()
+        present = ~pd.isna(values)
+        # Sort by group and then by value, with the missing values after the values of their group
+        order = np.lexsort((values, ~present, codes))
+        sorted_values = values[order]
+        starts = np.searchsorted(codes[order], np.arange(len(groups)))
+        counts = np.bincount(codes[present], minlength=len(groups))
+
+        last = starts + np.maximum(counts, 1) - 1
+        minimum, maximum = sorted_values[starts], sorted_values[last]
+        if not counts.all():
+            minimum, maximum = [np.where(counts > 0, extreme, np.nan) for extreme in [minimum, maximum]]
+        summary.update({(metric, "count"): counts, (metric, "min"): minimum, (metric, "max"): maximum,
+                        (metric, "median"): order_statistic(sorted_values, starts, counts, 0.5)})
+        for quantile in quantiles:
+            summary[(metric, quantile_label(quantile))] = order_statistic(sorted_values, starts, counts, quantile)
+
+    return pd.DataFrame(summary, index=pd.Index(groups, name=by))
+
+
+def count_values(dataframe, column, by="crawl_mode"):
+    """Count the rows per group and value of a categorical column in a single grouped pass
+
+    Parameters
+    ----------
+    dataframe: pandas.core.frame.DataFrame
+        The site table (or the table of the websites where errors occurred)
+    column: str
+        The categorical column, e.g., error or consent_status
+    by: str, default=crawl_mode
+        The column to group the rows by
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        A Pandas dataframe indexed by the groups with the number of rows of every value of the column
+    """
+    return dataframe.groupby([by, column], observed=True).size().unstack(fill_value=0)
@@ -0,0 +1,11 @@
+"""Makes the modules of analysis importable by their own names, as they are when the analyser is run from its
+directory
+"""
+import os
+import sys
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, SOURCE_DIR)
+# The crawl data of the tests is written with the modules of the crawler (e.g., header_table and result_writer)
+sys.path.append(os.path.join(os.path.dirname(SOURCE_DIR), "crawler_src"))
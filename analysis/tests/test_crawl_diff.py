@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import cache
+from crawl_diff import changed_sites, diff_sites, fingerprint_crawl, visit_fingerprint
+
+
+def visit(domain, third_parties=("t1.net", "cdn.com"), cookies=("id", "session"), redirects=(), consent="accepted",
+          load_time=1.5):
+    return {"website_domain": domain, "crawl_mode": "Desktop", "third_party_domains": list(third_parties),
+            "cookies": [{name: "1", "domain": domain} for name in cookies],
+            "redirect_pairs": [list(pair) for pair in redirects], "consent_status": consent,
+            "pageload_start_ts": "01/01/2026 12:00:00.000000",
+            "pageload_end_ts": f"01/01/2026 12:00:{load_time:09.6f}"}
+
+
+def write_crawl(directory, records, stream=False):
+    directory.mkdir()
+    if stream:
+        # A JSON Lines stream, of which the records are identified by their line number
+        with open(directory / "crawl_desktop_1.jsonl", "w") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        return str(directory)
+    for record in records:
+        with open(directory / f"{record['website_domain']}_desktop.json", "w") as file:
+            json.dump(record, file)
+    return str(directory)
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(cache, "ENABLED", False)
+
+
+def test_fingerprint_ignores_order_and_duplicates():
+    fingerprint = visit_fingerprint(visit("a.com"))
+
+    assert visit_fingerprint(visit("a.com", third_parties=["cdn.com", "t1.net", "cdn.com"])) == fingerprint
+    assert visit_fingerprint(visit("a.com", cookies=["session", "id"])) == fingerprint
+    assert visit_fingerprint(visit("a.com", third_parties=["cdn.com"])) != fingerprint
+    assert visit_fingerprint(visit("a.com", redirects=[("a.com", "t1.net")])) != fingerprint
+    assert fingerprint[3:] == ("accepted", None, 1.5)
+    assert visit_fingerprint({"website_domain": "a.com", "error": "TLS"}) == (None, None, None, None, "TLS", None)
+
+
+def test_changed_sites(tmp_path):
+    old = fingerprint_crawl(write_crawl(tmp_path / "old", [
+        visit("same.com"), visit("slower.com"), visit("tracker.com"), visit("flip.com"), visit("failed.com"),
+        visit("removed.com")]), None, 0)
+    new = fingerprint_crawl(write_crawl(tmp_path / "new", [
+        visit("same.com", load_time=2.0), visit("slower.com", load_time=3.0),
+        visit("tracker.com", third_parties=["t1.net", "cdn.com", "t2.com"]), visit("flip.com", consent="none"),
+        {"website_domain": "failed.com", "crawl_mode": "Desktop", "error": "Timeout"}, visit("added.com")],
+        stream=True), None, 0)
+
+    changed = changed_sites(old, new, threshold=1.0)
+    assert [domain for domain, _ in changed] == ["failed.com", "flip.com", "slower.com", "tracker.com"]
+
+
+def test_diff_sites_reads_the_changed_records(tmp_path):
+    old = fingerprint_crawl(write_crawl(tmp_path / "old", [visit("a.com"), visit("b.com")], stream=True), None, 0)
+    new = fingerprint_crawl(write_crawl(tmp_path / "new", [
+        visit("a.com"), visit("b.com", third_parties=["t1.net", "t2.com"], cookies=["id"],
+                              redirects=[("b.com", "t2.com")], load_time=4.0)]), None, 0)
+
+    [(site, diff)] = diff_sites([(site, old[site][0], new[site][0]) for site in changed_sites(old, new, 1.0)])
+    assert site == ("b.com", "Desktop")
+    assert diff == {"error": (None, None), "third_parties": (["t2.com"], ["cdn.com"]), "cookies": ([], ["session"]),
+                    "redirects": (["b.com -> t2.com"], []), "consent_status": ("accepted", "accepted"),
+                    "page_load_time": (1.5, 4.0)}
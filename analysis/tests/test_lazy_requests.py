@@ -0,0 +1,65 @@
+import copy
+import json
+
+import pytest
+
+from crawl_files import iter_records, list_crawl_files
+from header_table import compact_headers
+from lazy_requests import project_requests
+from request_list import RequestList, expand_headers
+from result_writer import OUTPUT_FORMATS, ResultWriter
+
+REQUESTS = [
+    {"request_url": "https://a.com/", "nr_cookies": 1,
+     "request_headers": {"user-agent": "Mozilla/5.0", "accept": "*/*"},
+     "response_headers": {"server": "nginx", "set-cookie": "id=1"}},
+    {"request_url": "https://b.com/x.js", "nr_cookies": 0,
+     "request_headers": {"user-agent": "Mozilla/5.0", "accept": "*/*"},
+     "response_headers": None}
+]
+
+
+def compact_record(requests):
+    requests = copy.deepcopy(requests)
+    record = {"website_domain": "a.com", "crawl_mode": "Desktop", "header_table": compact_headers(requests),
+              "requests": requests}
+    # The file is written and read as JSON
+    return json.loads(json.dumps(record))
+
+
+def test_request_list_expands_compact_headers():
+    record = compact_record(REQUESTS)
+    requests = RequestList(record["requests"], record["header_table"])
+
+    assert len(requests) == 2
+    assert list(requests) == REQUESTS
+    assert requests[1:][0] == REQUESTS[1]
+    # The stored requests stay compact
+    assert isinstance(record["requests"][0]["request_headers"], list)
+
+
+def test_request_list_without_header_table():
+    assert list(RequestList(REQUESTS)) == REQUESTS
+    assert expand_headers(None, {"names": [], "values": []}) is None
+
+
+def test_project_requests():
+    record = compact_record(REQUESTS)
+
+    assert list(project_requests(record, ["request_url", "nr_cookies"])) == [
+        ("a.com", "Desktop", "https://a.com/", 1), ("a.com", "Desktop", "https://b.com/x.js", 0)]
+    assert [row[2] for row in project_requests(record, ["response_headers"])] == [
+        {"server": "nginx", "set-cookie": "id=1"}, None]
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_compact_headers_through_crawl_files(tmp_path, output_format):
+    requests = copy.deepcopy(REQUESTS)
+    url_dict = {"website_domain": "a.com", "crawl_mode": "Desktop", "header_table": compact_headers(requests),
+                "requests": requests}
+    writer = ResultWriter(str(tmp_path), output_format)
+    writer.write("a.com", "Desktop", url_dict)
+    writer.close()
+
+    [(_, record)] = iter_records(list_crawl_files(str(tmp_path)))
+    assert list(RequestList(record["requests"], record["header_table"])) == REQUESTS
@@ -0,0 +1,75 @@
+from redirect_graph import RedirectGraph, record_chains
+
+# The tracker entity of every tracker domain
+ENTITIES = {"t1.net": "Tracker One", "t1-sync.net": "Tracker One", "t2.com": "Tracker Two", "t3.io": "Tracker Three"}
+
+
+class Tags:
+    """The subset of tracker_tags.TrackerTags used by the graph"""
+
+    def is_tracker(self, domain):
+        return domain in ENTITIES
+
+    def tag(self, domain):
+        return "Advertising", ENTITIES.get(domain)
+
+
+def chain(*domains, offsets=None):
+    offsets = offsets or [None] * len(domains)
+    return [{"domain": domain, "offset": offset} for domain, offset in zip(domains, offsets)]
+
+
+def build_graph():
+    graph = RedirectGraph()
+    graph.add_website("a.com", [
+        chain("a.com", "a-cdn.com", "t1.net", "t2.com", "t3.io", offsets=[0, 0.2, 0.4, 0.9, None]),
+        chain("a.com", "a.com", offsets=[0, 0.1])])
+    graph.add_website("b.com", [chain("t1.net", "t2.com", offsets=[0, 0.3]), chain("t1.net", "t2.com", "b.com")])
+    graph.add_website("c.com", [chain("t1-sync.net", "c.com")])
+    return graph
+
+
+def test_hops_within_a_domain_are_not_redirections():
+    graph = build_graph()
+    a, cdn = graph.nodes["a.com"], graph.nodes["a-cdn.com"]
+
+    assert graph.chains[1] == ("a.com", (a,), 2, 0.1)
+    assert dict(graph.successors[a]) == {cdn: 1}
+
+
+def test_redirections_are_counted_once_per_website():
+    graph = build_graph()
+    t1, t2 = graph.nodes["t1.net"], graph.nodes["t2.com"]
+
+    assert graph.successors[t1][t2] == 2
+
+
+def test_reachable():
+    graph = build_graph()
+    reachable = graph.reachable({graph.nodes["a.com"]})
+
+    assert {graph.domains[node] for node in reachable} == {"a-cdn.com", "t1.net", "t2.com", "t3.io", "b.com"}
+
+
+def test_longest_chains():
+    assert build_graph().longest_chains(2) == [
+        ("a.com", ["a.com", "a-cdn.com", "t1.net", "t2.com", "t3.io"], 5, 0.9),
+        ("b.com", ["t1.net", "t2.com", "b.com"], 3, None)]
+
+
+def test_tracker_sync_paths():
+    # A path is counted once per website, ties are listed in the order they were found
+    assert build_graph().tracker_sync_paths(Tags(), 10) == [(["t1.net", "t2.com", "t3.io"], 1),
+                                                             (["t1.net", "t2.com"], 1)]
+
+
+def test_entity_fan_out():
+    fan_out = {entry[0]: entry[1:] for entry in build_graph().entity_fan_out(Tags(), 10)}
+
+    # Tracker One has two domains, redirecting to t2.com and c.com, from which t3.io and b.com can be reached
+    assert fan_out["Tracker One"] == (2, 2, 4, 2)
+    assert fan_out["Tracker Three"] == (1, 0, 0, 0)
+
+
+def test_redirect_pairs_without_chains():
+    assert record_chains({"redirect_pairs": [["a.com", "t1.net"]]}) == [chain("a.com", "t1.net")]
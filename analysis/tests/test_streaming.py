@@ -0,0 +1,53 @@
+import random
+from collections import Counter
+
+from streaming import PrevalenceAggregator, SpaceSaving, new_counter
+
+
+def zipf_stream(length, keys, seed=0):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return rng.choices([f"key{rank}" for rank in range(1, keys + 1)], weights, k=length)
+
+
+def test_exact_while_below_capacity():
+    stream = zipf_stream(1000, 20)
+    counter = SpaceSaving(20)
+    counter.update(stream)
+
+    assert dict(counter.most_common()) == Counter(stream)
+    assert not any(counter.errors.values())
+
+
+def test_bounded_overestimate_of_heavy_hitters():
+    stream = zipf_stream(20000, 2000)
+    exact = Counter(stream)
+    counter = SpaceSaving(100)
+    counter.update(stream)
+
+    assert len(counter) == 100
+    for key, count in exact.items():
+        # Every key occurring more than length / capacity times is monitored
+        if count > len(stream) / 100:
+            assert key in counter.counts
+    for key, count in counter.counts.items():
+        assert exact[key] <= count <= exact[key] + counter.errors[key]
+    assert [key for key, _ in counter.most_common(5)] == [key for key, _ in exact.most_common(5)]
+
+
+def test_heap_stays_bounded():
+    counter = SpaceSaving(10)
+    counter.update(zipf_stream(5000, 500))
+
+    assert len(counter.heap) <= 4 * counter.capacity
+
+
+def test_aggregator_counts_per_mode():
+    aggregator = PrevalenceAggregator(["third_party_domains"])
+    aggregator.add("Desktop", "third_party_domains", ["a.com", "b.com"])
+    aggregator.add("Desktop", "third_party_domains", ["a.com"])
+    aggregator.add("Mobile", "third_party_domains", ["b.com"])
+
+    assert aggregator.most_common("Desktop", "third_party_domains", 1) == [("a.com", 2)]
+    assert aggregator.most_common("Mobile", "third_party_domains", 10) == [("b.com", 1)]
+    assert isinstance(new_counter(), Counter) and isinstance(new_counter(10), SpaceSaving)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from summary import STATISTICS, count_values, quantile_label, summarise
+
+
+@pytest.fixture
+def dataframe():
+    rng = np.random.default_rng(0)
+    size = 1001
+    load_time = rng.exponential(3, size)
+    load_time[rng.random(size) < 0.1] = np.nan
+    return pd.DataFrame({"crawl_mode": rng.choice(["Mobile", "Desktop"], size),
+                         "page_load_time": load_time,
+                         "nr_requests": rng.integers(0, 500, size),
+                         "consent_status": rng.choice(["accepted", "none", "unknown"], size)})
+
+
+def test_statistics_match_pandas(dataframe):
+    metrics = ["page_load_time", "nr_requests"]
+    summary = summarise(dataframe, metrics, quantiles=[0.1, 0.9])
+    grouped = dataframe.groupby("crawl_mode")
+
+    assert list(summary.index) == ["Desktop", "Mobile"]
+    assert list(summary.columns) == [(metric, statistic) for metric in metrics
+                                     for statistic in STATISTICS + ["p10", "p90"]]
+    for metric in metrics:
+        pd.testing.assert_series_equal(summary[(metric, "count")], grouped[metric].count(), check_names=False)
+        pd.testing.assert_series_equal(summary[(metric, "min")], grouped[metric].min(), check_names=False)
+        pd.testing.assert_series_equal(summary[(metric, "max")], grouped[metric].max(), check_names=False)
+        pd.testing.assert_series_equal(summary[(metric, "median")], grouped[metric].median().astype(float),
+                                       check_names=False)
+        for quantile in [0.1, 0.9]:
+            pd.testing.assert_series_equal(summary[(metric, quantile_label(quantile))],
+                                           grouped[metric].quantile(quantile).astype(float), check_names=False)
+
+
+def test_minimum_and_maximum_keep_the_type(dataframe):
+    summary = summarise(dataframe, ["nr_requests"])
+
+    assert summary[("nr_requests", "min")].dtype == dataframe["nr_requests"].dtype
+
+
+def test_group_without_values():
+    dataframe = pd.DataFrame({"crawl_mode": ["Desktop", "Desktop", "Mobile"], "page_load_time": [1.0, 2.0, np.nan]})
+    summary = summarise(dataframe, ["page_load_time"], quantiles=[0.9])
+
+    assert summary.loc["Desktop"].tolist() == [2, 1.0, 2.0, 1.5, 1.9]
+    assert summary.loc["Mobile", ("page_load_time", "count")] == 0
+    assert summary.loc["Mobile"].drop(("page_load_time", "count")).isna().all()
+
+
+def test_quantile_label():
+    assert [quantile_label(quantile) for quantile in [0.5, 0.9, 0.95, 0.999]] == ["p50", "p90", "p95", "p99.9"]
+
+
+def test_count_values(dataframe):
+    counts = count_values(dataframe, "consent_status")
+    expected = pd.crosstab(dataframe["crawl_mode"], dataframe["consent_status"])
+
+    pd.testing.assert_frame_equal(counts, expected, check_names=False)
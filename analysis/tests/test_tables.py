@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+import analyse
+from analyse import REQUEST_COLUMNS, generate_table_question_9
+
+
+@pytest.fixture
+def output_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(analyse, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_table_question_9(output_dir):
+    request_dataframe = pd.DataFrame([["a.com", "Desktop", "www.a.com", 3, True],
+                                      ["a.com", "Desktop", "t1.net", 7, False],
+                                      ["b.com", "Mobile", "b.com", 5, True]], columns=REQUEST_COLUMNS)
+    generate_table_question_9(request_dataframe)
+
+    table = (output_dir / "table_question_9.tex").read_text()
+    assert "\\textbf{Desktop} & t1.net & a.com & 7 & No \\\\" in table
+    assert "\\textbf{Mobile} & b.com & b.com & 5 & Yes \\\\" in table
+
+
+def test_table_question_9_without_requests_of_a_crawl_mode(output_dir):
+    request_dataframe = pd.DataFrame([["a.com", "Desktop", "t1.net", 7, False]], columns=REQUEST_COLUMNS)
+    generate_table_question_9(request_dataframe)
+
+    table = (output_dir / "table_question_9.tex").read_text()
+    assert "\\textbf{Desktop} & t1.net & a.com & 7 & No \\\\" in table
+    assert "\\textbf{Mobile} &  &  & 0 & No \\\\" in table
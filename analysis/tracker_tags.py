@@ -0,0 +1,151 @@
+"""Tracker tags
+
+Classifies the distinct third-party domains and redirection hostnames with the blocklist: every name is tagged once
+with the blocklist rule (domain) it matches, and the entity and category of that rule. The tags are stored in the cache
+under the version (content fingerprint) of the blocklist and are extended with the names that were not tagged yet, so
+a name is matched against a blocklist version only once. When the blocklist changes only this table is computed again,
+after which the tracker columns and prevalence targets are derived from the cached third-party domains of every
+website instead of parsing all crawl data again.
+"""
+import json
+
+import cache
+
+
+def read_blocklist_rules(path):
+    """Read the domains of the blocklist with their entity and category
+
+    Parameters
+    ----------
+    path: str
+        The path of the Disconnect blocklist
+
+    Returns
+    -------
+    dict
+        A dictionary with the domains of trackers as key and their (entity, category) as value
+    """
+    with open(path, 'rb') as f:
+        blocklist = json.load(f)
+
+    rules = dict()
+    for category, items in blocklist['categories'].items():
+        for item in items:
+            for entity, urls in item.items():
+                for url, domains in urls.items():
+                    if url == "performance":
+                        continue
+                    for domain in domains:
+                        rules[domain] = (entity, category)
+    return rules
+
+
+def domain_in_blocklist(tracker_domains, domain):
+    """Check whether `domain` is present in the set of tracker domains
+
+    Parameters
+    ----------
+    tracker_domains: set
+        A set of domains that are present in the blocklist
+    domain: str
+        The domain that needs to be checked
+
+    Returns
+    -------
+    bool
+        A boolean indicating whether the domain is present in the blocklist or not
+    """
+    if domain in tracker_domains:
+        return domain, True
+
+    # Check up to four domains formed by starting with the least five components
+    # Following the example of Mozilla's trackingprotection-tools library:
+    # (https://github.com/mozilla/trackingprotection-tools/blob/a55109119f0f66ddda92c133cee1d8ee31b64da9/trackingprotection_tools/DisconnectParser.py#L315)
+    domain = ".".join(domain.rsplit(".", 5)[1:])
+    count = 0
+    while domain != "":
+        count += 1
+        if count > 4:
+            return None, False
+        if domain in tracker_domains:
+            return domain, True
+        try:
+            domain = domain.split(".", 1)[1]
+        except IndexError:
+            return None, False
+    return None, False
+
+
+class TrackerTags:
+    """The blocklist tags of the distinct third-party domains and redirection hostnames, for one blocklist version"""
+
+    def __init__(self, blocklist_path):
+        """
+        Parameters
+        ----------
+        blocklist_path: str
+            The path of the Disconnect blocklist
+        """
+        self.version = cache.fingerprint_file_contents(blocklist_path)
+        self.rules = read_blocklist_rules(blocklist_path)
+        hit, table = cache.load("tracker_tags", self.version)
+        # The (rule, entity, category) of every tagged name, None if the name does not match the blocklist
+        self.table = table if hit else dict()
+        self.nr_stored = len(self.table)
+
+    def tag(self, name):
+        """Get the tag of a domain or hostname, matching it against the blocklist if it was not tagged yet
+
+        Parameters
+        ----------
+        name: str
+            The domain or hostname
+
+        Returns
+        -------
+        tuple
+            The matched blocklist domain, entity and category, or None if the name does not match the blocklist
+        """
+        if name not in self.table:
+            rule, matched = domain_in_blocklist(self.rules, name)
+            self.table[name] = (rule,) + self.rules[rule] if matched else None
+        return self.table[name]
+
+    def is_tracker(self, name):
+        """Check whether a domain or hostname matches the blocklist
+
+        Parameters
+        ----------
+        name: str
+            The domain or hostname
+
+        Returns
+        -------
+        bool
+            A boolean indicating whether the name matches the blocklist
+        """
+        return self.tag(name) is not None
+
+    def trackers(self, third_party_domains):
+        """Extract the tracker domains and their corresponding entities from the third-party domains of a website
+
+        Parameters
+        ----------
+        third_party_domains: list
+            The (distinct) third-party domains of a website
+
+        Returns
+        -------
+        tracker_domains: set
+            A set of all (distinct) tracker domains of the website
+        tracker_entities: set
+            A set of all (distinct) tracker entities of the website
+        """
+        tags = [(domain, self.tag(domain)) for domain in third_party_domains]
+        return {domain for domain, tag in tags if tag}, {tag[1] for _, tag in tags if tag}
+
+    def save(self):
+        """Store the tags in the cache if names were tagged since they were loaded"""
+        if len(self.table) > self.nr_stored:
+            cache.store("tracker_tags", self.version, self.table)
+            self.nr_stored = len(self.table)
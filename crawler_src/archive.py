@@ -0,0 +1,94 @@
+"""Traffic archives
+
+Stores the captured traffic of a visit in a compact, HAR-like archive (gzip-compressed JSON), so the crawl data can be
+recomputed from the archives later on (see replay.py) instead of crawling all domains again. An archive holds the
+metadata of the visit and, for every request, its URL, timestamp, request headers and the status and headers of its
+response. Headers are stored as lists of (name, value) pairs, so headers that occur multiple times are preserved.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+
+from capture import CapturedRequest, CapturedResponse, Headers
+
+ARCHIVE_VERSION = 1
+
+
+def archive_path(archive_dir, domain, crawl_mode):
+    """Get the path of the archive of a visit
+
+    Parameters
+    ----------
+    archive_dir: str
+        The directory the archives are stored in
+    domain: str
+        The domain that is visited
+    crawl_mode: str
+        The crawl mode of the visit, either Desktop or Mobile
+
+    Returns
+    -------
+    str
+        The path of the archive
+    """
+    return os.path.join(archive_dir, f"{domain}_{crawl_mode.lower()}.json.gz")
+
+
+def save_archive(archive_dir, url_dict, requests_url):
+    """Save the captured traffic of a visit, this needs to happen before the headers are truncated by get_headers
+
+    Parameters
+    ----------
+    archive_dir: str
+        The directory to store the archive in
+    url_dict: dict
+        A dictionary containing the metadata of the visit (domain, rank, crawl mode, page load times, post page load
+        URL and consent status)
+    requests_url: list
+        The requests captured during the visit
+    """
+    entries = []
+    for request in requests_url:
+        response = None
+        if request.response:
+            response = {"status": request.response.status_code,
+                        "headers": [[name, value] for name, value in request.response.headers.items()]}
+        entries.append({"url": request.url,
+                        "date": request.date.isoformat(),
+                        "headers": [[name, value] for name, value in request.headers.items()],
+                        "response": response})
+
+    os.makedirs(archive_dir, exist_ok=True)
+    with gzip.open(archive_path(archive_dir, url_dict["website_domain"], url_dict["crawl_mode"]), "wt") as out_file:
+        json.dump({"version": ARCHIVE_VERSION, "visit": url_dict, "entries": entries}, out_file,
+                  separators=(",", ":"))
+
+
+def load_archive(file_path):
+    """Load the captured traffic of a visit from an archive
+
+    Parameters
+    ----------
+    file_path: str
+        The path of the archive
+
+    Returns
+    -------
+    visit: dict
+        The metadata of the visit
+    requests_url: list
+        The captured requests, with the same interface as the requests of the capture backends
+    """
+    with gzip.open(file_path, "rt") as in_file:
+        archive = json.load(in_file)
+
+    requests_url = []
+    for entry in archive["entries"]:
+        response = None
+        if entry["response"]:
+            response = CapturedResponse(entry["response"]["status"], Headers(entry["response"]["headers"]))
+        requests_url.append(CapturedRequest(entry["url"], datetime.fromisoformat(entry["date"]),
+                                            Headers(entry["headers"]), response))
+
+    return archive["visit"], requests_url
@@ -0,0 +1,115 @@
+"""Capture backend benchmark
+
+Visits the same domains with every capture backend and compares the page load time, the CPU time spent in the crawler
+process (where SeleniumWire's proxy runs) and the captured data (number of requests, cookies, third parties and
+redirections) per visit.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from itertools import islice
+
+from capture import CAPTURE_BACKENDS
+from domain_source import iter_tranco
+from crawl import set_webdriver_options, get_url_requests_times, build_requests_list, \
+    get_all_cookies, get_third_party_domains, detect_redirections
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", action="store", type=str, default="tranco-top-500-safe.csv",
+                        help="A path to a CSV file containing domains to crawl and their Tranco ranks.")
+    parser.add_argument("-n", "--number", action="store", type=int, default=20,
+                        help="The number of domains (from the top of the list) to visit with every backend.")
+    parser.add_argument("-m", "--mobile", action="store_true", required=False,
+                        help="Enable mobile crawl mode.")
+    parser.add_argument("-o", "--output", action="store", type=str, required=False,
+                        help="A path to a JSON file to store the measurements of every visit in.")
+    arguments = parser.parse_args()
+    arguments.view = "headless"
+
+    return vars(arguments)
+
+
+def measure_visit(params, capture, domain):
+    """Visit a domain with a capture backend and measure the costs and the captured data
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    capture: capture.ProxyCapture or capture.DevToolsCapture
+        The backend that captures the traffic
+    domain: str
+        The domain that is visited
+
+    Returns
+    -------
+    dict
+        A dictionary with the measurements of the visit, or None if the page could not be loaded
+    """
+    driver = capture.create_driver(set_webdriver_options(params))
+    try:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        post_pageload_url, requests_url, _, _ = get_url_requests_times(driver, domain, capture)
+        if not post_pageload_url:
+            return None
+        requests = build_requests_list(requests_url)
+        measurements = {"wall_time": time.perf_counter() - wall_start,
+                        "cpu_time": time.process_time() - cpu_start,
+                        "nr_requests": len(requests),
+                        "nr_cookies": len(get_all_cookies(requests_url)),
+                        "nr_third_party_domains": len(get_third_party_domains(domain, requests_url)),
+                        "nr_redirections": len(detect_redirections(domain, requests_url, post_pageload_url))}
+    finally:
+        driver.quit()
+
+    return measurements
+
+
+def main():
+    """Parse arguments, visit the domains with every capture backend and print the comparison
+    """
+    args = parse_arguments()
+    domains = [domain for _, domain in islice(iter_tranco(args["input"]), args["number"])]
+    results = {name: {} for name in CAPTURE_BACKENDS}
+
+    for domain in domains:
+        # Alternate the backends per domain, so both see the same (network) conditions
+        for name, backend in CAPTURE_BACKENDS.items():
+            measurements = measure_visit(args, backend(), domain)
+            if measurements:
+                results[name][domain] = measurements
+                print(f"{name:<10} {domain:<30} {measurements['wall_time']:>7.2f} s wall "
+                      f"{measurements['cpu_time']:>7.2f} s CPU {measurements['nr_requests']:>5} requests")
+
+    # Only compare the domains that could be loaded with every backend
+    common = set.intersection(*(set(visits) for visits in results.values()))
+    print(f"\nMedian over {len(common)} domains:")
+    print(f"{'backend':<10} " + " ".join(f"{metric:>22}" for metric in next(iter(results["proxy"].values()), {})))
+    for name, visits in results.items():
+        metrics = [visits[domain] for domain in common]
+        if metrics:
+            print(f"{name:<10} " + " ".join(f"{statistics.median(m[metric] for m in metrics):>22.2f}"
+                                            for metric in metrics[0]))
+
+    if args["output"]:
+        with open(args["output"], "w") as out_file:
+            json.dump(results, out_file, indent=4)
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
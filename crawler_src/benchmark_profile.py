@@ -0,0 +1,188 @@
+"""Browser profile benchmark
+
+Visits the same domains with every browser profile preset and compares the startup time of the browser, the page load
+time, the CPU time and the peak memory (RSS) of the browser processes (ChromeDriver, Chrome and its child processes)
+per worker.
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from itertools import islice
+
+import psutil
+
+from browser_profile import PROFILE_PRESETS, profile_toggles, apply_profile, apply_driver_toggles, remove_profile_dir
+from capture import CAPTURE_BACKENDS
+from domain_source import iter_tranco
+from crawl import set_webdriver_options, get_url_requests_times
+from visit_watchdog import browser_processes
+
+# The interval (in seconds) at which the memory usage of the browser processes is sampled
+SAMPLE_INTERVAL = 0.2
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", action="store", type=str, default="tranco-top-500-safe.csv",
+                        help="A path to a CSV file containing domains to crawl and their Tranco ranks.")
+    parser.add_argument("-n", "--number", action="store", type=int, default=20,
+                        help="The number of domains (from the top of the list) to visit with every preset.")
+    parser.add_argument("-m", "--mobile", action="store_true", required=False,
+                        help="Enable mobile crawl mode.")
+    parser.add_argument("-c", "--capture", action="store", type=str, default="proxy", choices=list(CAPTURE_BACKENDS),
+                        help="The capture backend used with every preset.")
+    parser.add_argument("--block-images", action="store_true", required=False,
+                        help="Also block images with the lean preset.")
+    parser.add_argument("--block-media", action="store_true", required=False,
+                        help="Also block audio and video with the lean preset.")
+    parser.add_argument("-o", "--output", action="store", type=str, required=False,
+                        help="A path to a JSON file to store the measurements of every visit in.")
+    arguments = parser.parse_args()
+    arguments.view = "headless"
+
+    return vars(arguments)
+
+
+def sample_memory(peak, stop):
+    """Keep track of the peak memory usage of the browser processes until `stop` is set
+
+    Parameters
+    ----------
+    peak: dict
+        A dictionary in which the peak RSS (in bytes) is stored under "rss"
+    stop: threading.Event
+        The event that stops the sampling
+    """
+    while not stop.is_set():
+        rss = 0
+        for process in browser_processes():
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        peak["rss"] = max(peak["rss"], rss)
+        stop.wait(SAMPLE_INTERVAL)
+
+
+def browser_cpu_time(processes):
+    """Get the CPU time (user and system) spent by the browser processes
+
+    Parameters
+    ----------
+    processes: list
+        The browser processes
+
+    Returns
+    -------
+    float
+        The CPU time in seconds
+    """
+    cpu_time = 0
+    for process in processes:
+        try:
+            times = process.cpu_times()
+            cpu_time += times.user + times.system
+        except psutil.Error:
+            pass
+    return cpu_time
+
+
+def measure_visit(params, preset, domain):
+    """Visit a domain with a browser profile preset and measure the costs of the browser
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    preset: str
+        The browser profile preset
+    domain: str
+        The domain that is visited
+
+    Returns
+    -------
+    dict
+        A dictionary with the measurements of the visit, or None if the page could not be loaded
+    """
+    profile_params = dict(params, profile=preset, block_images=params["block_images"] and preset == "lean",
+                          block_media=params["block_media"] and preset == "lean")
+    toggles = profile_toggles(profile_params)
+    chrome_options = set_webdriver_options(profile_params)
+    profile_dir = apply_profile(chrome_options, toggles)
+    capture = CAPTURE_BACKENDS[params["capture"]]()
+
+    peak, stop = {"rss": 0}, threading.Event()
+    sampler = threading.Thread(target=sample_memory, args=(peak, stop))
+    sampler.start()
+
+    start = time.perf_counter()
+    driver = capture.create_driver(chrome_options)
+    apply_driver_toggles(driver, toggles)
+    startup_time = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        post_pageload_url, _, _, _ = get_url_requests_times(driver, domain, capture)
+        pageload_time = time.perf_counter() - start
+        # Take the CPU time before quitting, as the processes are gone afterwards
+        cpu_time = browser_cpu_time(browser_processes())
+    finally:
+        driver.quit()
+        stop.set()
+        sampler.join()
+        remove_profile_dir(profile_dir)
+
+    if not post_pageload_url:
+        return None
+    return {"startup_time": startup_time,
+            "pageload_time": pageload_time,
+            "browser_cpu_time": cpu_time,
+            "peak_rss_mb": peak["rss"] / 1024 ** 2}
+
+
+def main():
+    """Parse arguments, visit the domains with every browser profile preset and print the comparison
+    """
+    args = parse_arguments()
+    domains = [domain for _, domain in islice(iter_tranco(args["input"]), args["number"])]
+    results = {preset: {} for preset in PROFILE_PRESETS}
+
+    for domain in domains:
+        # Alternate the presets per domain, so all of them see the same (network) conditions
+        for preset in PROFILE_PRESETS:
+            measurements = measure_visit(args, preset, domain)
+            if measurements:
+                results[preset][domain] = measurements
+                print(f"{preset:<10} {domain:<30} {measurements['startup_time']:>6.2f} s startup "
+                      f"{measurements['pageload_time']:>6.2f} s load {measurements['browser_cpu_time']:>6.2f} s CPU "
+                      f"{measurements['peak_rss_mb']:>7.0f} MB")
+
+    # Only compare the domains that could be loaded with every preset
+    common = set.intersection(*(set(visits) for visits in results.values()))
+    print(f"\nMedian over {len(common)} domains:")
+    metrics = ["startup_time", "pageload_time", "browser_cpu_time", "peak_rss_mb"]
+    print(f"{'preset':<10} " + " ".join(f"{metric:>18}" for metric in metrics))
+    for preset, visits in results.items():
+        if common:
+            print(f"{preset:<10} " + " ".join(f"{statistics.median(visits[domain][metric] for domain in common):>18.2f}"
+                                              for metric in metrics))
+
+    if args["output"]:
+        with open(args["output"], "w") as out_file:
+            json.dump(results, out_file, indent=4)
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
@@ -0,0 +1,123 @@
+"""Browser profile presets
+
+The default preset starts Chrome with its full default feature set and a fresh profile directory on disk, as in the
+original crawls. The lean preset trades some realism for throughput:
+- tmpfs_profile: the profile directory is created in /dev/shm (memory) instead of on disk, and removed after the visit
+- disable_background_networking: no background requests (safe browsing updates, metrics, translate, ...)
+- disable_component_update: no component (e.g., CRL sets, widevine) downloads when the browser starts
+- disable_gpu: no GPU process, which is useless for headless crawls
+- disable_dev_shm_usage: shared memory is written to /tmp if /dev/shm is too small to hold the renderer's buffers
+Images and media can be blocked on top of either preset. These change what the crawler measures (e.g., the number of
+requests and cookies), which is why every visit records its toggles in the browser_profile field of the crawl data.
+"""
+import os
+import shutil
+import tempfile
+
+PROFILE_PRESETS = ["default", "lean"]
+TMPFS_DIR = "/dev/shm"
+# Below this size of /dev/shm, Chrome is told to use /tmp for its shared memory instead
+MIN_SHM_SIZE = 512 * 1024 * 1024
+# The URL patterns of media files that are blocked when block_media is enabled
+MEDIA_PATTERNS = ["*.mp4", "*.webm", "*.ogv", "*.mov", "*.m4v", "*.mp3", "*.m4a", "*.ogg", "*.wav", "*.m3u8",
+                  "*.mpd", "*.ts"]
+
+
+def shm_too_small():
+    """Check whether /dev/shm is missing or too small for Chrome's shared memory (as in many containers)
+
+    Returns
+    -------
+    bool
+        A boolean indicating whether Chrome should use /tmp instead of /dev/shm
+    """
+    try:
+        return shutil.disk_usage(TMPFS_DIR).total < MIN_SHM_SIZE
+    except OSError:
+        return True
+
+
+def profile_toggles(params):
+    """Determine the toggles of the browser profile selected by the command line arguments
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+
+    Returns
+    -------
+    dict
+        The preset and the value of every toggle
+    """
+    lean = params["profile"] == "lean"
+    return {"preset": params["profile"],
+            "tmpfs_profile": lean and os.path.isdir(TMPFS_DIR),
+            "disable_background_networking": lean,
+            "disable_component_update": lean,
+            "disable_gpu": lean,
+            "disable_dev_shm_usage": lean and shm_too_small(),
+            "block_images": params["block_images"],
+            "block_media": params["block_media"]}
+
+
+def apply_profile(chrome_options, toggles):
+    """Add the Chrome arguments and preferences of the toggles to the ChromeOptions
+
+    Parameters
+    ----------
+    chrome_options: selenium.webdriver.chrome.options.Options
+        ChromeOptions that are used to customize the ChromeDriver session
+    toggles: dict
+        The value of every toggle
+
+    Returns
+    -------
+    str
+        The profile directory that was created in tmpfs, or None if Chrome creates its own profile directory
+    """
+    profile_dir = None
+    if toggles["tmpfs_profile"]:
+        profile_dir = tempfile.mkdtemp(prefix="crawler-profile-", dir=TMPFS_DIR)
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+    if toggles["disable_background_networking"]:
+        chrome_options.add_argument("--disable-background-networking")
+    if toggles["disable_component_update"]:
+        chrome_options.add_argument("--disable-component-update")
+    if toggles["disable_gpu"]:
+        chrome_options.add_argument("--disable-gpu")
+    if toggles["disable_dev_shm_usage"]:
+        chrome_options.add_argument("--disable-dev-shm-usage")
+    if toggles["block_images"]:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    return profile_dir
+
+
+def apply_driver_toggles(driver, toggles):
+    """Apply the toggles that need a running browser: blocking media requests through the DevTools protocol
+
+    Parameters
+    ----------
+    driver: selenium.webdriver.Chrome
+        The webdriver that is used to visit the domain
+    toggles: dict
+        The value of every toggle
+    """
+    if not toggles["block_media"]:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": MEDIA_PATTERNS})
+
+
+def remove_profile_dir(profile_dir):
+    """Remove a profile directory created in tmpfs
+
+    Parameters
+    ----------
+    profile_dir: str
+        The profile directory, or None
+    """
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
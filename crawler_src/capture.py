@@ -0,0 +1,307 @@
+"""Traffic capture backends
+
+The crawler needs the URL, timestamp, request/response headers (including cookie headers) and redirects of every
+request made while loading a webpage. These can be captured in two ways:
+- proxy: SeleniumWire's intercepting proxy, which terminates and re-encrypts every TLS connection in Python
+- devtools: the Network domain events of Chrome's DevTools protocol, read from the performance log of ChromeDriver
+
+Both backends return request objects with the same interface as the requests of SeleniumWire (`url`, `date`,
+`headers` and `response.headers`), so the rest of the crawler does not depend on the backend that is used.
+"""
+import json
+from collections import deque
+from datetime import datetime
+
+from selenium import webdriver as selenium_webdriver
+from seleniumwire import webdriver as seleniumwire_webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+class Headers:
+    """Case-insensitive container of HTTP headers that may hold the same header multiple times (e.g., set-cookie),
+    mirroring the header objects of SeleniumWire
+    """
+
+    def __init__(self, items=()):
+        """
+        Parameters
+        ----------
+        items: iterable
+            The (name, value) pairs of the headers
+        """
+        self._items = [(name, value) for name, value in items]
+
+    def __contains__(self, name):
+        return any(key.lower() == name.lower() for key, _ in self._items)
+
+    def __getitem__(self, name):
+        """Get the value of the first header called `name`, or None if there is no such header"""
+        for key, value in self._items:
+            if key.lower() == name.lower():
+                return value
+        return None
+
+    def __setitem__(self, name, value):
+        """Replace the value of the first header called `name`, or add the header if it is not present yet"""
+        for i, (key, _) in enumerate(self._items):
+            if key.lower() == name.lower():
+                self._items[i] = (key, value)
+                return
+        self._items.append((name, value))
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        return [key for key, _ in self._items]
+
+    def items(self):
+        return list(self._items)
+
+
+class CapturedResponse:
+    """The response of a captured request"""
+
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class CapturedRequest:
+    """A request captured by one of the capture backends"""
+
+    def __init__(self, url, date, headers, response=None):
+        self.url = url
+        self.date = date
+        self.headers = headers
+        self.response = response
+
+
+def devtools_headers(headers):
+    """Convert a DevTools header dictionary to a Headers object with lowercase names
+
+    Parameters
+    ----------
+    headers: dict
+        The headers as reported by a DevTools Network event, multiple values of the same header are separated by
+        newlines (e.g., multiple set-cookie headers)
+
+    Returns
+    -------
+    Headers
+        The headers, with one entry for every value
+    """
+    items = []
+    for name, value in (headers or {}).items():
+        for line in str(value).split("\n"):
+            items.append((name.lower(), line))
+    return Headers(items)
+
+
+class ProxyCapture:
+    """Capture backend using the intercepting proxy of SeleniumWire"""
+
+    name = "proxy"
+
+    def create_driver(self, chrome_options):
+        """Start a Chrome webdriver whose traffic is captured
+
+        Parameters
+        ----------
+        chrome_options: selenium.webdriver.chrome.options.Options
+            ChromeOptions that are used to customize the ChromeDriver session
+
+        Returns
+        -------
+        seleniumwire.webdriver.Chrome
+            The webdriver that is used to visit the domain
+        """
+        return seleniumwire_webdriver.Chrome(service=Service(ChromeDriverManager().install()),
+                                             chrome_options=chrome_options)
+
+    def get_requests(self, driver):
+        """Retrieve the requests that have been captured so far
+
+        Parameters
+        ----------
+        driver: seleniumwire.webdriver.Chrome
+            The webdriver that is used to visit the domain
+
+        Returns
+        -------
+        list
+            The captured requests
+        """
+        return driver.requests
+
+
+class DevToolsCapture:
+    """Capture backend using the Network domain events of the Chrome DevTools protocol"""
+
+    name = "devtools"
+
+    def create_driver(self, chrome_options):
+        """Start a Chrome webdriver that logs the DevTools Network events to its performance log
+
+        Parameters
+        ----------
+        chrome_options: selenium.webdriver.chrome.options.Options
+            ChromeOptions that are used to customize the ChromeDriver session
+
+        Returns
+        -------
+        selenium.webdriver.Chrome
+            The webdriver that is used to visit the domain
+        """
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        return selenium_webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+
+    def get_requests(self, driver):
+        """Retrieve the requests that have been captured so far from the performance log
+
+        Parameters
+        ----------
+        driver: selenium.webdriver.Chrome
+            The webdriver that is used to visit the domain
+
+        Returns
+        -------
+        list
+            The captured requests, every hop of a redirect chain is a separate request
+        """
+        events = [json.loads(entry["message"])["message"] for entry in driver.get_log("performance")]
+        return parse_network_events(events)
+
+
+def from_network(response):
+    """Check whether a response was received over the network, Chrome only reports the raw headers (in the ExtraInfo
+    events) of such responses
+
+    Parameters
+    ----------
+    response: dict
+        The response as reported by a DevTools Network event
+
+    Returns
+    -------
+    bool
+        A boolean indicating whether the response was not served from a cache or a service worker
+    """
+    return not any(response.get(flag) for flag in ["fromDiskCache", "fromServiceWorker", "fromPrefetchCache"])
+
+
+def set_response(hop, response):
+    """Store the response of a hop
+
+    Parameters
+    ----------
+    hop: dict
+        The hop, holding its request and whether it went over the network
+    response: dict
+        The response as reported by a DevTools Network event
+    """
+    hop["request"].response = CapturedResponse(response.get("status"), devtools_headers(response.get("headers")))
+    hop["network"] = hop["network"] is not False and from_network(response)
+
+
+def match_extra_info(chain, extra_info, final=False):
+    """Replace the provisional headers of the hops of a request by the raw headers of the ExtraInfo events
+
+    Chrome sends the ExtraInfo events of the hops of a request in order, but not necessarily in order with the other
+    events: the raw headers of the next hop of a redirect may arrive before the hop itself. The raw headers are
+    therefore only matched to a hop once its response is known (and with it whether it went over the network), and to
+    the hops in order.
+
+    Parameters
+    ----------
+    chain: list
+        The hops of the request
+    extra_info: dict
+        The raw request and response headers that are not matched to a hop yet, in the order they arrived
+    final: bool, default=False
+        Whether all events have been read, the raw headers are then also matched to hops without a response
+    """
+    for kind in ["request", "response"]:
+        queue = extra_info[kind]
+        for hop in chain:
+            if not queue or (hop["network"] is None and not final):
+                break
+            if hop["network"] is False or hop[f"raw_{kind}_headers"]:
+                continue
+            if kind == "request":
+                hop["request"].headers = devtools_headers(queue.popleft())
+            elif hop["request"].response is not None:
+                hop["request"].response.headers = devtools_headers(queue.popleft())
+            else:
+                break
+            hop[f"raw_{kind}_headers"] = True
+
+
+def parse_network_events(events):
+    """Reconstruct the requests (with their headers, responses and redirects) from DevTools Network events
+
+    Parameters
+    ----------
+    events: list
+        The DevTools events, dictionaries with a method and params
+
+    Returns
+    -------
+    list
+        The captured requests, in the order in which they were sent
+    """
+    requests = []
+    # Every request id refers to a chain of hops when a request gets redirected, the last hop is the current one. A hop
+    # holds its request, whether it went over the network (None until its response is known) and whether its raw
+    # request and response headers were found.
+    hops = dict()
+    # The raw headers (from the ExtraInfo events) of every request id that are not matched to a hop yet
+    extra_infos = dict()
+
+    for event in events:
+        method = event.get("method")
+        params = event.get("params", {})
+        request_id = params.get("requestId")
+
+        if method == "Network.requestWillBeSent":
+            # A redirect reuses the request id, the response of the previous hop is sent along with the new hop
+            redirect_response = params.get("redirectResponse")
+            if redirect_response and hops.get(request_id):
+                set_response(hops[request_id][-1], redirect_response)
+
+            request = CapturedRequest(params["request"]["url"], datetime.fromtimestamp(params["wallTime"]),
+                                      devtools_headers(params["request"].get("headers")))
+            hops.setdefault(request_id, []).append({"request": request, "network": None,
+                                                    "raw_request_headers": False, "raw_response_headers": False})
+            requests.append(request)
+
+        elif method == "Network.responseReceived":
+            if hops.get(request_id):
+                set_response(hops[request_id][-1], params["response"])
+
+        elif method == "Network.requestServedFromCache":
+            if hops.get(request_id):
+                hops[request_id][-1]["network"] = False
+
+        elif method in ["Network.requestWillBeSentExtraInfo", "Network.responseReceivedExtraInfo"]:
+            # Hold the headers that were actually sent and received, including the cookie and set-cookie headers
+            kind = "request" if method == "Network.requestWillBeSentExtraInfo" else "response"
+            extra_infos.setdefault(request_id, {"request": deque(), "response": deque()})[kind].append(
+                params.get("headers"))
+
+        if request_id in extra_infos and request_id in hops:
+            match_extra_info(hops[request_id], extra_infos[request_id])
+
+    for request_id, chain in hops.items():
+        if request_id in extra_infos:
+            match_extra_info(chain, extra_infos[request_id], final=True)
+
+    return requests
+
+
+# The available capture backends, selectable with the --capture argument of the crawler
+CAPTURE_BACKENDS = {
+    ProxyCapture.name: ProxyCapture,
+    DevToolsCapture.name: DevToolsCapture
+}
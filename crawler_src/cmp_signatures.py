@@ -0,0 +1,143 @@
+"""Consent management platform signatures
+
+Most iframes on a webpage are ads, analytics, videos or social widgets that never hold a cookie consent button, while
+most consent banners are served by a handful of consent management platforms (CMPs). The signatures below identify the
+iframes and containers of those CMPs by their host, frame id/name and container ids, so the consent search can look at
+the CMP frames first and skip the frames that are obviously irrelevant.
+"""
+from urllib.parse import urlparse
+
+# Per CMP: the hosts serving its frames, prefixes of its frame ids/names and the ids of its containers in the webpage
+CMP_SIGNATURES = {
+    "OneTrust": {"hosts": ["onetrust.com", "cookielaw.org", "cookiepro.com"],
+                 "frames": ["onetrust"],
+                 "containers": ["onetrust-banner-sdk", "onetrust-consent-sdk"]},
+    "Quantcast": {"hosts": ["quantcast.com", "quantcast.mgr.consensu.org"],
+                  "frames": ["qc-cmp"],
+                  "containers": ["qc-cmp2-container", "qc-cmp2-ui"]},
+    "Didomi": {"hosts": ["didomi.io", "privacy-center.org"],
+               "frames": ["didomi"],
+               "containers": ["didomi-host", "didomi-popup"]},
+    "TrustArc": {"hosts": ["trustarc.com", "truste.com"],
+                 "frames": ["truste", "trustarc"],
+                 "containers": ["truste-consent-track", "truste-consent-content", "teconsent"]},
+    "Sourcepoint": {"hosts": ["sourcepoint.com", "privacy-mgmt.com", "sp-prod.net"],
+                    "frames": ["sp_message_iframe"],
+                    "containers": ["sp_message_container"]},
+    "Cookiebot": {"hosts": ["cookiebot.com"],
+                  "frames": ["cybotcookiebot"],
+                  "containers": ["CybotCookiebotDialog"]},
+    "Usercentrics": {"hosts": ["usercentrics.eu"],
+                     "frames": [],
+                     "containers": ["usercentrics-root", "usercentrics-cmp"]},
+    "Google Funding Choices": {"hosts": ["fundingchoicesmessages.google.com"],
+                               "frames": ["googlefcpresent"],
+                               "containers": ["fc-consent-root"]},
+    "IAB consensu.org": {"hosts": ["consensu.org"],
+                         "frames": [],
+                         "containers": []}
+}
+
+# Words in the src, id or name of a frame that hint at a consent frame of an unknown CMP
+CONSENT_KEYWORDS = ["consent", "cmp", "cookie", "gdpr", "privacy"]
+
+# Hosts of frames that never hold a cookie consent button of the visited webpage: ads, analytics, video, social and
+# captcha widgets
+IRRELEVANT_HOSTS = ["doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+                    "googletagmanager.com", "adnxs.com", "amazon-adsystem.com", "criteo.com", "criteo.net",
+                    "rubiconproject.com", "pubmatic.com", "taboola.com", "outbrain.com", "youtube.com",
+                    "youtube-nocookie.com", "vimeo.com", "facebook.com", "twitter.com", "instagram.com",
+                    "tiktok.com", "recaptcha.net", "hcaptcha.com", "spotify.com"]
+
+# The ids of all CMP containers and the CMP they belong to
+CONTAINER_IDS = {container: cmp for cmp, signature in CMP_SIGNATURES.items() for container in signature["containers"]}
+
+
+def matches_host(host, hosts):
+    """Check whether a host is one of the hosts or a subdomain of one of them
+
+    Parameters
+    ----------
+    host: str
+        The host to check
+    hosts: list
+        The hosts to match against
+
+    Returns
+    -------
+    bool
+        A boolean indicating whether the host matches
+    """
+    return any(host == candidate or host.endswith("." + candidate) for candidate in hosts)
+
+
+def classify_frame(frame_id, name, src, domain=None):
+    """Classify an iframe by its attributes
+
+    Parameters
+    ----------
+    frame_id: str
+        The id of the iframe
+    name: str
+        The name of the iframe
+    src: str
+        The src of the iframe
+    domain: str, optional
+        The domain that is visited, its own frames are never considered irrelevant
+
+    Returns
+    -------
+    score: int
+        2 for a known CMP frame, 1 for a frame hinting at consent, 0 for an unknown frame and -1 for an irrelevant frame
+    reason: str
+        The signature or host the classification is based on
+    """
+    frame_id, name, src = (frame_id or "").lower(), (name or "").lower(), src or ""
+    host = (urlparse(src).hostname or "") if src.startswith("http") else ""
+
+    for cmp, signature in CMP_SIGNATURES.items():
+        if host and matches_host(host, signature["hosts"]):
+            return 2, f"{cmp} host {host}"
+        for prefix in signature["frames"]:
+            if frame_id.startswith(prefix) or name.startswith(prefix):
+                return 2, f"{cmp} frame {frame_id or name}"
+
+    if host and matches_host(host, IRRELEVANT_HOSTS) and not (domain and matches_host(host, [domain])):
+        return -1, f"irrelevant host {host}"
+
+    text = " ".join([frame_id, name, src.lower()])
+    for keyword in CONSENT_KEYWORDS:
+        if keyword in text:
+            return 1, f"keyword {keyword}"
+
+    return 0, f"unknown frame {host or frame_id or name or 'without src'}"
+
+
+def rank_frames(frames, domain=None):
+    """Order the iframes of a webpage by their likelihood of holding the consent button
+
+    Parameters
+    ----------
+    frames: list
+        The (id, name, src) of every iframe, in DOM order
+    domain: str, optional
+        The domain that is visited
+
+    Returns
+    -------
+    ranking: list
+        The (index, reason) of the iframes to search, known CMP frames first and otherwise in DOM order
+    skipped: list
+        The (index, reason) of the irrelevant iframes
+    """
+    ranking, skipped = [], []
+    for index, (frame_id, name, src) in enumerate(frames):
+        score, reason = classify_frame(frame_id, name, src, domain)
+        if score < 0:
+            skipped.append((index, reason))
+        else:
+            ranking.append((score, index, reason))
+
+    # A stable sort keeps the DOM order among frames with the same score
+    ranking.sort(key=lambda frame: -frame[0])
+    return [(index, reason) for _, index, reason in ranking], skipped
@@ -0,0 +1,155 @@
+"""Adaptive concurrency
+
+The memory usage of a browser session varies widely across the Tranco list, so a fixed number of workers either
+underuses a large crawl host or makes a small one swap. The controller samples the CPU usage, the available memory and
+the memory (RSS) of every worker's process tree, and decides how many browser sessions should be active:
+- under memory pressure, new leases are paused and a worker is retired
+- under high CPU usage, a worker is retired
+- when there is room for another worker (CPU below the low watermark and enough available memory for a worker of the
+  current average size), a worker is added
+The number of workers changes one at a time and stays between the minimum and maximum, with a cooldown after every
+change so the effect of a change is measured before the next one is made.
+"""
+import time
+from collections import deque
+
+import psutil
+
+# The interval (in seconds) between two decisions of the controller
+CONTROL_INTERVAL = 5
+# The number of seconds after a change during which no other change is made
+COOLDOWN = 30
+# The fraction of memory that needs to stay available: leases are paused below MEMORY_LOW
+MEMORY_LOW = 0.10
+MEMORY_HEADROOM = 1.5
+CPU_HIGH = 90
+CPU_LOW = 70
+# The number of decisions kept in the metrics
+HISTORY = 100
+
+
+def process_tree_rss(pid):
+    """Get the memory usage of a process and all of its children (e.g., ChromeDriver, Chrome and its renderers)
+
+    Parameters
+    ----------
+    pid: int
+        The id of the process
+
+    Returns
+    -------
+    int
+        The resident set size in bytes, 0 if the process no longer exists
+    """
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0
+
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss
+
+
+class ConcurrencyController:
+    """Decides the number of active browser sessions from the load of the crawl host"""
+
+    def __init__(self, min_workers, max_workers):
+        """
+        Parameters
+        ----------
+        min_workers: int
+            The minimal number of active workers
+        max_workers: int
+            The maximal number of active workers
+        """
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.target = min_workers
+        self.paused = False
+        self.last_change = 0
+        self.decisions = deque(maxlen=HISTORY)
+        self.counts = {"scale_up": 0, "scale_down": 0, "pause": 0, "hold": 0}
+        # Start measuring the CPU usage, the first call of cpu_percent always returns 0
+        psutil.cpu_percent(interval=None)
+
+    def sample(self, worker_pids):
+        """Sample the load of the crawl host
+
+        Parameters
+        ----------
+        worker_pids: list
+            The process ids of the active workers
+
+        Returns
+        -------
+        dict
+            The CPU usage (percentage), the available memory (fraction and bytes) and the average RSS of a worker
+        """
+        memory = psutil.virtual_memory()
+        worker_rss = [process_tree_rss(pid) for pid in worker_pids]
+        return {"cpu": psutil.cpu_percent(interval=None),
+                "memory_available": memory.available / memory.total,
+                "memory_available_bytes": memory.available,
+                "worker_rss": sum(worker_rss) / len(worker_rss) if worker_rss else 0}
+
+    def decide(self, worker_pids):
+        """Decide the number of active workers and whether new leases should be paused
+
+        Parameters
+        ----------
+        worker_pids: list
+            The process ids of the active workers
+
+        Returns
+        -------
+        int
+            The number of workers that should be active
+        """
+        load = self.sample(worker_pids)
+        active = len(worker_pids)
+        now = time.time()
+        cooling_down = now - self.last_change < COOLDOWN
+        self.paused = load["memory_available"] < MEMORY_LOW
+
+        if self.paused:
+            action, reason = "pause", f"only {load['memory_available']:.0%} of the memory available"
+            target = max(self.min_workers, active - 1) if not cooling_down else self.target
+        elif cooling_down:
+            action, reason, target = "hold", "cooling down", self.target
+        elif load["cpu"] > CPU_HIGH and active > self.min_workers:
+            action, reason, target = "scale_down", f"CPU at {load['cpu']:.0f}%", active - 1
+        elif load["cpu"] < CPU_LOW and active < self.max_workers \
+                and load["memory_available_bytes"] > MEMORY_HEADROOM * load["worker_rss"]:
+            action, reason, target = "scale_up", f"CPU at {load['cpu']:.0f}%, memory available", active + 1
+        else:
+            action, reason, target = "hold", "within bounds", active
+
+        target = min(max(target, self.min_workers), self.max_workers)
+        if target != self.target:
+            self.last_change = now
+        self.target = target
+        self.counts[action] += 1
+        self.decisions.append({"ts": round(now, 1), "action": action, "reason": reason, "active": active,
+                               "target": target, "cpu": load["cpu"],
+                               "memory_available": round(load["memory_available"], 3),
+                               "worker_rss_mb": round(load["worker_rss"] / 1024 ** 2, 1)})
+        if action != "hold":
+            print(f"Concurrency: {action} to {target} worker(s) ({reason}).")
+        return target
+
+    def metrics(self):
+        """Get the decisions of the controller for the run metrics
+
+        Returns
+        -------
+        dict
+            The current target, whether leases are paused, the number of decisions per action and the recent decisions
+        """
+        return {"target": self.target, "paused": self.paused, "min_workers": self.min_workers,
+                "max_workers": self.max_workers, "counts": dict(self.counts), "decisions": list(self.decisions)}
@@ -0,0 +1,139 @@
+"""Consent cache
+
+Remembers per domain and crawl mode how the cookie consent was accepted during a previous crawl: the iframe the button
+was found in (if any), the accept word and the position of the button among the elements matching that word. The next
+crawl tries this locator first and only falls back to the full search over all accept words and iframes on a miss.
+
+The cache is stored as a JSON file. Multiple crawler processes may share the same file, every process merges its own
+updates into the latest version of the file when saving.
+"""
+import json
+import os
+from datetime import datetime
+
+CONSENT_CACHE_PATH = "consent_cache.json"
+# The number of updates after which the cache is written to disk during a crawl
+SAVE_INTERVAL = 25
+
+
+class ConsentCache:
+    """Persistent cache of the consent locators that succeeded, with hit/miss statistics"""
+
+    def __init__(self, path=CONSENT_CACHE_PATH):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the JSON file the cache is stored in
+        """
+        self.path = path
+        self.entries = self.read()
+        self.updates = dict()
+        # hit: the cached locator worked, stale: it did not, miss: there was no cached locator
+        self.stats = {"hit": 0, "stale": 0, "miss": 0}
+
+    def read(self):
+        """Read the cache file
+
+        Returns
+        -------
+        dict
+            The cached locators by domain and crawl mode, or an empty dictionary if there is no (valid) cache file
+        """
+        try:
+            with open(self.path) as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    @staticmethod
+    def key(domain, crawl_mode):
+        return f"{domain}|{crawl_mode}"
+
+    def get(self, domain, crawl_mode):
+        """Get the cached consent locator of a domain
+
+        Parameters
+        ----------
+        domain: str
+            The domain that is visited
+        crawl_mode: str
+            The crawl mode, either Desktop or Mobile
+
+        Returns
+        -------
+        dict
+            The locator, holding the frame, the accept word and the element index, or None if there is none
+        """
+        entry = self.entries.get(self.key(domain, crawl_mode))
+        return entry["locator"] if entry else None
+
+    def update(self, domain, crawl_mode, cached, locator):
+        """Count the outcome of the consent search and remember the locator that succeeded
+
+        Parameters
+        ----------
+        domain: str
+            The domain that is visited
+        crawl_mode: str
+            The crawl mode, either Desktop or Mobile
+        cached: dict
+            The cached locator that was tried first, or None
+        locator: dict
+            The locator that accepted the cookies, or None if they could not be accepted
+
+        Returns
+        -------
+        str
+            The outcome for the cache: hit, stale or miss
+        """
+        if cached is None:
+            outcome = "miss"
+        elif locator == cached:
+            outcome = "hit"
+        else:
+            outcome = "stale"
+        self.stats[outcome] += 1
+
+        if outcome != "hit":
+            key = self.key(domain, crawl_mode)
+            # A stale entry is removed if the full search did not find the button either
+            entry = {"locator": locator, "mode": crawl_mode, "updated": datetime.now().strftime("%d/%m/%Y")} \
+                if locator else None
+            self.entries[key] = entry
+            self.updates[key] = entry
+            if len(self.updates) >= SAVE_INTERVAL:
+                self.save()
+
+        return outcome
+
+    def save(self):
+        """Merge the updates of this process into the cache file
+        """
+        if not self.updates:
+            return
+
+        entries = self.read()
+        entries.update(self.updates)
+        entries = {key: entry for key, entry in entries.items() if entry}
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(entries, cache_file, indent=2)
+        os.replace(temp_path, self.path)
+
+        self.entries = entries
+        self.updates = dict()
+
+    def summary(self):
+        """Get a summary of the hit/miss statistics
+
+        Returns
+        -------
+        str
+            The number of hits, stale entries and misses
+        """
+        total = sum(self.stats.values())
+        hit_rate = self.stats["hit"] / total if total else 0
+        return (f"Consent cache: {self.stats['hit']} hits, {self.stats['stale']} stale, {self.stats['miss']} misses "
+                f"(hit rate {hit_rate:.0%})")
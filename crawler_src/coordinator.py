@@ -0,0 +1,606 @@
+"""Crawl coordinator
+
+Splits a crawl over multiple worker processes, which may run on other hosts. The coordinator owns the queue of domains
+and leases them one at a time to the workers over a small HTTP/JSON protocol:
+- POST /lease     {"worker", "crawl_mode"}  -> {"lease_id", "rank", "domain"}, {"wait": seconds} or {"done": true}
+- POST /complete  {"lease_id", "url_dict"}  -> {"ok": true}
+- GET  /status                              -> the progress of the crawl
+- GET  /metrics                             -> the progress and the decisions of the concurrency controller
+A lease that is not completed within the lease timeout (e.g., because the worker crashed) is put back at the end of
+the queue, as is a failed visit that may be retried according to the retry policy of its error (see retry.py). The
+results of all workers are written by the coordinator, so they end up in a single crawl_data tree.
+
+Workers are started with `python crawl.py -v headless --coordinator http://<host>:<port>`. For testing on a single
+machine, the coordinator can start a number of local workers itself with --local-workers. With --max-workers, the
+number of local workers is adapted to the load of the machine instead (see concurrency.py). If all local workers exit
+before the crawl is done (e.g., because the browser cannot be started) while no other worker holds a lease or contacts
+the coordinator, the coordinator stops with an error instead of waiting forever.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from browser_profile import PROFILE_PRESETS
+from capture import CAPTURE_BACKENDS
+from concurrency import CONTROL_INTERVAL, ConcurrencyController
+from crawl import convert_to_json
+from history import SCHEDULES, apply_schedule
+from domain_source import iter_tranco, parse_rank_range, parse_shard
+from result_writer import OUTPUT_FORMATS, ResultWriter
+from retry import record_attempt, retry_delay
+from visit_watchdog import VISIT_TIME_LIMIT
+
+LEASE_TIMEOUT = 600
+MAX_LEASES = 3
+# The number of seconds without any request of a worker after which the crawl is given up once all local workers exited
+IDLE_TIMEOUT = 60
+# The number of seconds the local workers get to exit after the crawl, before they are killed
+WORKER_SHUTDOWN_TIMEOUT = 60
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", action="store", type=str, required=True,
+                        help="A path to a CSV file containing domains to crawl and their Tranco ranks.")
+    parser.add_argument("--ranks", action="store", type=parse_rank_range, required=False,
+                        help="Only serve the domains of the input file within a range of ranks, e.g., 1000-2000.")
+    parser.add_argument("--shard", action="store", type=parse_shard, required=False,
+                        help="Only serve shard i of n of the input file, written as i/n with 0 <= i < n.")
+    parser.add_argument("--schedule", action="store", type=str, default="rank", choices=SCHEDULES,
+                        help="The order in which the domains of the input file are served: by rank, or by their cost "
+                             "in a previous crawl (see history.py).")
+    parser.add_argument("--history", action="store", type=str, default="../crawl_data",
+                        help="The directory with the output of the previous crawl, used by the longest-first and "
+                             "interleave schedules.")
+    parser.add_argument("--host", action="store", type=str, default="127.0.0.1",
+                        help="The address the coordinator listens on (use 0.0.0.0 for workers on other hosts).")
+    parser.add_argument("--port", action="store", type=int, default=8765,
+                        help="The port the coordinator listens on.")
+    parser.add_argument("--lease-timeout", action="store", type=int, default=LEASE_TIMEOUT,
+                        help="The number of seconds after which a leased domain is given to another worker.")
+    parser.add_argument("--visit-timeout", action="store", type=float, default=VISIT_TIME_LIMIT,
+                        help="The hard limit (in seconds) on a single visit of the local workers, which must be lower "
+                             "than the lease timeout.")
+    parser.add_argument("--local-workers", action="store", type=int, default=0,
+                        help="The number of worker processes to start on this machine.")
+    parser.add_argument("--min-workers", action="store", type=int, default=1,
+                        help="The minimal number of local workers when their number is adapted to the load.")
+    parser.add_argument("--max-workers", action="store", type=int, default=0,
+                        help="Adapt the number of local workers to the CPU and memory usage of this machine, up to "
+                             "this maximum.")
+    parser.add_argument("--metrics", action="store", type=str, required=False,
+                        help="A path to a JSON file to store the run metrics in when the crawl is done.")
+    parser.add_argument("-m", "--mobile", action="store_true", required=False,
+                        help="Enable mobile crawl mode for the local workers.")
+    parser.add_argument("-v", "--view", action="store", type=str, default="headless",
+                        choices=["headless", "headful"],
+                        help="Choose between headless and headful modes for the local workers.")
+    parser.add_argument("-c", "--capture", action="store", type=str, default="proxy", choices=list(CAPTURE_BACKENDS),
+                        help="The capture backend of the local workers.")
+    parser.add_argument("-p", "--profile", action="store", type=str, default="default", choices=PROFILE_PRESETS,
+                        help="The browser profile preset of the local workers.")
+    parser.add_argument("--block-images", action="store_true", required=False,
+                        help="Do not load images in the local workers.")
+    parser.add_argument("--block-media", action="store_true", required=False,
+                        help="Block requests for audio and video files in the local workers.")
+    parser.add_argument("--compact-headers", action="store_true", required=False,
+                        help="Let the local workers store the headers of the requests with interned names and values.")
+    parser.add_argument("--output-format", action="store", type=str, required=False, default="json",
+                        choices=OUTPUT_FORMATS,
+                        help="Write an (indented) JSON file per domain, a compressed JSON file per domain or a "
+                             "compressed JSON Lines stream (see result_writer.py).")
+    parser.add_argument("-a", "--archive", action="store", type=str, required=False,
+                        help="A directory for the local workers to store the traffic archives of their visits in.")
+    arguments = parser.parse_args()
+    if arguments.visit_timeout >= arguments.lease_timeout:
+        # A worker must give up on a visit before its lease expires, or the domain is crawled twice
+        parser.error(f"The visit timeout ({arguments.visit_timeout:g} seconds) must be lower than the lease timeout "
+                     f"({arguments.lease_timeout} seconds)!")
+
+    return vars(arguments)
+
+
+class CrawlCoordinator:
+    """Owns the queue of domains to crawl and the leases handed out to the workers"""
+
+    def __init__(self, domains, lease_timeout=LEASE_TIMEOUT, writer=None):
+        """
+        Parameters
+        ----------
+        domains: iterable
+            The (Tranco rank, domain) pairs to crawl, in the order in which they should be crawled, these are only
+            read when they are leased so large lists can be streamed
+        lease_timeout: int
+            The number of seconds after which a leased domain is put back in the queue
+        writer: result_writer.ResultWriter, optional
+            The writer of the crawl data, an indented JSON file per domain is written if it is not provided
+        """
+        self.source = iter(domains)
+        self.source_exhausted = False
+        # The domains that are put back after their lease expired or their visit failed, these are leased after the
+        # source is exhausted
+        self.queue = deque()
+        self.leases = dict()
+        # The tasks of expired leases, so a late result can still be accepted if the domain was not leased again
+        self.expired = dict()
+        self.completed = 0
+        self.failed = 0
+        # Set by the concurrency controller: whether new leases are paused and which workers should stop
+        self.paused = False
+        self.retired = set()
+        self.controller = None
+        self.lease_timeout = lease_timeout
+        self.last_contact = time.time()
+        self.lock = threading.Lock()
+        self.writer = writer or ResultWriter()
+        # The results are written by the request handler threads, which must not write to the same stream at once
+        self.write_lock = threading.Lock()
+
+    def requeue_expired(self):
+        """Put the domains of expired leases back at the end of the queue, or give up on them after MAX_LEASES leases
+        (the lock needs to be held by the caller)
+        """
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expires"] < now:
+                del self.leases[lease_id]
+                task = lease["task"]
+                if task["leases"] < MAX_LEASES:
+                    print(f"The lease of {task['domain']} by {lease['worker']} expired, re-queueing it.")
+                    self.queue.append(task)
+                    self.expired[lease_id] = task
+                else:
+                    print(f"Giving up on {task['domain']} after {task['leases']} expired leases.")
+                    self.forget_expired(task)
+                    url_dict = {"website_domain": task["domain"],
+                                "tranco_rank": task["rank"],
+                                "crawl_mode": lease["crawl_mode"],
+                                "error": "Timeout"}
+                    url_dict["attempts"] = record_attempt(task["attempts"], url_dict, lease["worker"])
+                    self.write_result(task["domain"], url_dict)
+                    self.failed += 1
+
+    def forget_expired(self, task):
+        """Forget the expired leases of a domain once it is leased again or completed, their late results are no longer
+        accepted (the lock needs to be held by the caller)
+
+        Parameters
+        ----------
+        task: dict
+            The task of the domain
+        """
+        for lease_id in [lease_id for lease_id, expired_task in self.expired.items() if expired_task is task]:
+            del self.expired[lease_id]
+
+    def next_task(self):
+        """Take the next domain from the source or, once the source is exhausted, from the re-queued domains
+        (the lock needs to be held by the caller)
+
+        Returns
+        -------
+        dict
+            The task holding the rank, the domain, its number of leases and its attempts so far, or None if no domain
+            can be leased right now
+        """
+        if not self.source_exhausted:
+            try:
+                rank, domain = next(self.source)
+                return {"rank": rank, "domain": domain, "leases": 0, "attempts": [], "not_before": 0}
+            except StopIteration:
+                self.source_exhausted = True
+
+        now = time.time()
+        for task in self.queue:
+            # Skip the domains that are still waiting for the backoff of their retry
+            if task["not_before"] <= now:
+                self.queue.remove(task)
+                return task
+        return None
+
+    def lease(self, worker, crawl_mode):
+        """Lease the next domain in the queue to a worker
+
+        Parameters
+        ----------
+        worker: str
+            The id of the worker
+        crawl_mode: str
+            The crawl mode of the worker, either Desktop or Mobile
+
+        Returns
+        -------
+        dict
+            The lease, a request to wait (while other leases may still expire or leases are paused) or a message that
+            the crawl is done (or that the worker should stop)
+        """
+        with self.lock:
+            self.last_contact = time.time()
+            self.requeue_expired()
+            if worker in self.retired:
+                return {"done": True}
+            if self.paused:
+                return {"wait": 10}
+            task = self.next_task()
+            if task is None:
+                return {"done": True} if not self.leases and not self.queue else {"wait": 10}
+
+            self.forget_expired(task)
+            task["leases"] += 1
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = {"task": task, "worker": worker, "crawl_mode": crawl_mode,
+                                     "expires": time.time() + self.lease_timeout}
+
+        return {"lease_id": lease_id, "rank": task["rank"], "domain": task["domain"]}
+
+    def complete(self, lease_id, url_dict):
+        """Store the result of a lease, or put the domain back in the queue if its visit failed and may be retried
+
+        Parameters
+        ----------
+        lease_id: str
+            The id of the lease
+        url_dict: dict
+            A dictionary containing various information retrieved from the URL being accessed by the webdriver
+
+        Returns
+        -------
+        bool
+            A boolean indicating whether the lease was still valid
+        """
+        with self.lock:
+            self.last_contact = time.time()
+            lease = self.leases.pop(lease_id, {})
+            task = lease.get("task")
+            if task is None:
+                task = self.expired.pop(lease_id, None)
+                if task is None or task not in self.queue:
+                    # The domain was leased to another worker in the meantime, keep the result of that worker
+                    return False
+                self.queue.remove(task)
+            self.forget_expired(task)
+
+            task["attempts"] = record_attempt(task["attempts"], url_dict, lease.get("worker"))
+            delay = retry_delay(task["attempts"])
+            if delay is not None:
+                print(f"Retrying {task['domain']} in {delay:.0f} seconds after a {url_dict['error']} error.")
+                task["leases"] = 0
+                task["not_before"] = time.time() + delay
+                self.queue.append(task)
+                return True
+
+            url_dict["attempts"] = task["attempts"]
+            self.completed += 1
+
+        self.write_result(task["domain"], url_dict)
+        return True
+
+    def write_result(self, domain, url_dict):
+        """Write the result of a domain to the crawl_data tree
+
+        Parameters
+        ----------
+        domain: str
+            The domain that is visited
+        url_dict: dict
+            A dictionary containing various information retrieved from the URL being accessed by the webdriver
+        """
+        with self.write_lock:
+            convert_to_json({"mobile": url_dict["crawl_mode"] == "Mobile"}, domain, url_dict, writer=self.writer)
+
+    def status(self):
+        """Get the progress of the crawl
+
+        Returns
+        -------
+        dict
+            Whether the source is exhausted and the number of re-queued, leased, completed and failed domains
+        """
+        with self.lock:
+            return {"source_exhausted": self.source_exhausted, "requeued": len(self.queue),
+                    "leased": len(self.leases), "completed": self.completed, "failed": self.failed,
+                    "paused": self.paused}
+
+    def metrics(self):
+        """Get the run metrics: the progress of the crawl and the decisions of the concurrency controller
+
+        Returns
+        -------
+        dict
+            The progress and, if the number of workers is adapted to the load, the decisions of the controller
+        """
+        metrics = self.status()
+        if self.controller:
+            metrics["concurrency"] = self.controller.metrics()
+        return metrics
+
+    def is_done(self):
+        """Check whether every domain has been crawled
+
+        Returns
+        -------
+        bool
+            A boolean indicating whether the queue is empty and no leases are outstanding
+        """
+        with self.lock:
+            self.requeue_expired()
+            return self.source_exhausted and not self.queue and not self.leases
+
+    def is_idle(self, seconds):
+        """Check whether no worker is crawling a domain and no worker has contacted the coordinator for a while
+
+        Parameters
+        ----------
+        seconds: float
+            The number of seconds without any request of a worker
+
+        Returns
+        -------
+        bool
+            A boolean indicating whether no leases are outstanding and the last request is older than `seconds`
+        """
+        with self.lock:
+            self.requeue_expired()
+            return not self.leases and time.time() - self.last_contact > seconds
+
+
+class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests of the workers"""
+
+    coordinator = None
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(self.coordinator.status())
+        elif self.path == "/metrics":
+            self.send_json(self.coordinator.metrics())
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/lease":
+            self.send_json(self.coordinator.lease(body.get("worker"), body.get("crawl_mode")))
+        elif self.path == "/complete":
+            self.send_json({"ok": self.coordinator.complete(body["lease_id"], body["url_dict"])})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def log_message(self, format, *args):
+        # Do not print a line for every request of the workers
+        pass
+
+
+def start_local_worker(params, url, index):
+    """Start a worker process on this machine
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    url: str
+        The URL of the coordinator
+    index: int
+        The index of the worker, which is part of its id
+
+    Returns
+    -------
+    worker_id: str
+        The id the worker uses when leasing domains
+    process: subprocess.Popen
+        The worker process
+    """
+    command = [sys.executable, "crawl.py", "-v", params["view"], "-c", params["capture"],
+               "--coordinator", url, "--worker-id", f"local-{index}", "--visit-timeout", str(params["visit_timeout"])]
+    if params["mobile"]:
+        command.append("-m")
+    if params["archive"]:
+        command.extend(["-a", params["archive"]])
+    command.extend(["-p", params["profile"]])
+    if params["block_images"]:
+        command.append("--block-images")
+    if params["block_media"]:
+        command.append("--block-media")
+    if params["compact_headers"]:
+        command.append("--compact-headers")
+
+    process = subprocess.Popen(command)
+    # The worker leases domains as <worker id>-<pid>, see crawl_from_coordinator
+    return f"local-{index}-{process.pid}", process
+
+
+def start_local_workers(params, url, number):
+    """Start worker processes on this machine
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    url: str
+        The URL of the coordinator
+    number: int
+        The number of workers to start
+
+    Returns
+    -------
+    dict
+        The worker processes by their id
+    """
+    workers = dict(start_local_worker(params, url, i) for i in range(number))
+
+    print(f"Started {len(workers)} local worker(s).")
+    return workers
+
+
+def control_local_workers(params, url, coordinator, workers):
+    """Let the concurrency controller decide the number of active local workers, and start or retire a worker to
+    reach that number
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    url: str
+        The URL of the coordinator
+    coordinator: CrawlCoordinator
+        The coordinator, which holds the concurrency controller
+    workers: dict
+        The worker processes by their id, new workers are added to it
+    """
+    active = {worker_id: process for worker_id, process in workers.items()
+              if process.poll() is None and worker_id not in coordinator.retired}
+    target = coordinator.controller.decide([process.pid for process in active.values()])
+    coordinator.paused = coordinator.controller.paused
+
+    if target > len(active) and not coordinator.source_exhausted:
+        worker_id, process = start_local_worker(params, url, len(workers))
+        workers[worker_id] = process
+    elif target < len(active):
+        # Retire the most recently started worker, it stops when it leases its next domain
+        coordinator.retired.add(list(active)[-1])
+
+
+def stop_local_workers(workers, timeout=WORKER_SHUTDOWN_TIMEOUT):
+    """Wait for the local workers to exit after the crawl, and kill the workers that did not exit in time
+
+    Parameters
+    ----------
+    workers: dict
+        The worker processes by their id
+    timeout: float, default=WORKER_SHUTDOWN_TIMEOUT
+        The number of seconds the workers get to exit, together
+    """
+    deadline = time.time() + timeout
+    for worker_id, process in workers.items():
+        try:
+            process.wait(timeout=max(deadline - time.time(), 0))
+        except subprocess.TimeoutExpired:
+            print(f"Killing the local worker {worker_id}, which did not exit after the crawl.")
+            process.kill()
+            process.wait()
+
+
+def start_server(coordinator, host, port):
+    """Serve the domain queue of a coordinator to the workers in a background thread
+
+    Parameters
+    ----------
+    coordinator: CrawlCoordinator
+        The coordinator
+    host: str
+        The address to listen on
+    port: int
+        The port to listen on, 0 to let the operating system pick a free port
+
+    Returns
+    -------
+    server: http.server.ThreadingHTTPServer
+        The server, which is stopped with its shutdown method
+    url: str
+        The URL of the coordinator for the local workers
+    """
+    CoordinatorRequestHandler.coordinator = coordinator
+    server = ThreadingHTTPServer((host, port), CoordinatorRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{server.server_address[1]}"
+    return server, url
+
+
+def wait_for_crawl(params, url, coordinator, workers, interval=CONTROL_INTERVAL, idle_timeout=IDLE_TIMEOUT):
+    """Wait until every domain is crawled, adapting the number of local workers to the load if requested
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    url: str
+        The URL of the coordinator
+    coordinator: CrawlCoordinator
+        The coordinator
+    workers: dict
+        The local worker processes by their id
+    interval: float, default=CONTROL_INTERVAL
+        The number of seconds between two checks of the progress
+    idle_timeout: float, default=IDLE_TIMEOUT
+        The number of seconds without any request of a worker after which the crawl is given up once all local
+        workers exited
+
+    Returns
+    -------
+    bool
+        A boolean indicating whether every domain was crawled, False if the local workers exited before that and no
+        other worker is crawling
+    """
+    while not coordinator.is_done():
+        time.sleep(interval)
+        if workers and all(process.poll() is not None for process in workers.values()) \
+                and coordinator.is_idle(idle_timeout):
+            exit_codes = sorted({process.returncode for process in workers.values()})
+            print(f"All local workers exited (exit codes {exit_codes}) and no worker is crawling, stopping the crawl!")
+            return False
+        if coordinator.controller:
+            control_local_workers(params, url, coordinator, workers)
+        print(f"Progress: {coordinator.status()}")
+    return True
+
+
+def main():
+    """Parse arguments, serve the domain queue to the workers until every domain is crawled
+    """
+    args = parse_arguments()
+    tranco_domains = iter_tranco(args["input"], args["ranks"], args["shard"])
+    tranco_domains = apply_schedule(tranco_domains, args)
+    writer = ResultWriter("../crawl_data", args["output_format"], "crawl_coordinator")
+    coordinator = CrawlCoordinator(tranco_domains, args["lease_timeout"], writer)
+
+    server, url = start_server(coordinator, args["host"], args["port"])
+    print(f"The coordinator is serving the domains of {args['input']} at {url}.")
+
+    if args["max_workers"]:
+        coordinator.controller = ConcurrencyController(args["min_workers"], args["max_workers"])
+        workers = start_local_workers(args, url, args["min_workers"])
+    else:
+        workers = start_local_workers(args, url, args["local_workers"])
+
+    completed = wait_for_crawl(args, url, coordinator, workers)
+
+    # Give the workers the chance to receive the done message before the server stops
+    stop_local_workers(workers)
+    server.shutdown()
+    writer.close()
+
+    if args["metrics"]:
+        with open(args["metrics"], "w") as metrics_file:
+            json.dump(coordinator.metrics(), metrics_file, indent=4)
+
+    if not completed:
+        sys.exit(f"The crawl stopped with {coordinator.status()}, the data of the crawled domains was saved locally.")
+    print("The crawl has completed successfully and all data was saved locally!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
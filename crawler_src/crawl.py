@@ -6,30 +6,48 @@ Denise Verbakel - s1018597
 
 The crawler was designed using Selenium and SeleniumWire, and Python requests for some error handling. It has multiple
 functionalities:
-- Multiple Modes: Headless/Headful, Mobile/Desktop, Single URL/Input File
+- Multiple Modes: Headless/Headful, Mobile/Desktop, Single URL/Input File/Coordinator Worker
+- Multiple Capture Backends: SeleniumWire Proxy/Chrome DevTools Protocol
+- Multiple Browser Profiles: Default/Lean, Optionally Blocking Images and Media
 - Error Checking: TLS Errors, Timeout Errors or Domain/Other Errors
+- Killing Hung Browsers After a Hard Time Limit per Visit
+- Retrying Failed Visits With Per-Error Backoff
 - Cookie Accepting and Cookie Accepting Error Handling
+- Caching the Cookie Consent Locators Between Crawls
 - Getting Number of Cookies/Parsing Cookies
 - Webpage Screenshots
 - Computing Webpage Loading Times
 - Request/Response Header Parsing
-- Detecting Redirections
+- Detecting Redirections and Reconstructing Redirect Chains
 - Detecting Third-Party Domains
 - Converting Data into JSON Files
+- Archiving the Captured Traffic for Offline Reprocessing (see replay.py)
 """
 import argparse
 import os
+import socket
 import time
-import json
+from collections import defaultdict, deque
+from itertools import chain
+from urllib.parse import urljoin
 import requests as python_requests
-import pandas as pd
 from tld import get_fld
 from datetime import datetime
 
+from archive import save_archive
+from browser_profile import PROFILE_PRESETS, profile_toggles, apply_profile, apply_driver_toggles
+from capture import CAPTURE_BACKENDS
+from cmp_signatures import CONTAINER_IDS, rank_frames
+from consent_cache import CONSENT_CACHE_PATH, ConsentCache
+from header_table import compact_headers
+from history import SCHEDULES, apply_schedule
+from domain_source import iter_tranco, lookup_rank, parse_rank_range, parse_shard
+from result_writer import OUTPUT_FORMATS, ResultWriter
+from retry import RetryQueue, record_attempt
+import visit_watchdog
+from visit_watchdog import VISIT_TIME_LIMIT, VisitWatchdog
 from seleniumwire import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 
 from selenium.common.exceptions import ElementClickInterceptedException, ElementNotInteractableException, \
     NoSuchFrameException, TimeoutException, StaleElementReferenceException, WebDriverException
@@ -37,6 +55,13 @@ from requests.exceptions import SSLError, Timeout, ConnectionError, TooManyRedir
 from tld.exceptions import TldDomainNotFound, TldBadUrl
 
 WINDOW_SIZE = "1920x1080"
+# The number of attempts to reach the crawl coordinator and the number of seconds between them
+COORDINATOR_ATTEMPTS = 6
+COORDINATOR_RETRY_DELAY = 10
+# The consent cache of this crawler process, set in main unless it is disabled with --no-consent-cache
+consent_cache = None
+# The writer of the crawl data of this crawler process, set in main
+result_writer = None
 
 
 def parse_arguments():
@@ -57,35 +82,56 @@ def parse_arguments():
     parser.add_argument("-v", "--view", action="store", type=str, required=True,
                         choices=["headless", "headful"],
                         help="Choose between headless and headful modes of the crawler.")
+    parser.add_argument("--ranks", action="store", type=parse_rank_range, required=False,
+                        help="Only crawl the domains of the input file within a range of ranks, e.g., 1000-2000.")
+    parser.add_argument("--shard", action="store", type=parse_shard, required=False,
+                        help="Only crawl shard i of n of the input file, written as i/n with 0 <= i < n.")
+    parser.add_argument("--schedule", action="store", type=str, default="rank", choices=SCHEDULES,
+                        help="The order in which the domains of the input file are crawled: by rank, or by their cost "
+                             "in a previous crawl (see history.py).")
+    parser.add_argument("--history", action="store", type=str, default="../crawl_data",
+                        help="The directory with the output of the previous crawl, used by the longest-first and "
+                             "interleave schedules.")
+    parser.add_argument("--coordinator", action="store", type=str, required=False,
+                        help="The URL of a crawl coordinator to lease domains from (see coordinator.py).")
+    parser.add_argument("--worker-id", action="store", type=str, required=False, default=socket.gethostname(),
+                        help="The id this worker reports to the crawl coordinator.")
+    parser.add_argument("-c", "--capture", action="store", type=str, required=False, default="proxy",
+                        choices=list(CAPTURE_BACKENDS),
+                        help="Choose how the traffic is captured: SeleniumWire's intercepting proxy or the Chrome "
+                             "DevTools protocol.")
+    parser.add_argument("-p", "--profile", action="store", type=str, required=False, default="default",
+                        choices=PROFILE_PRESETS,
+                        help="Choose the browser profile preset: Chrome's defaults or a lean profile for throughput "
+                             "(see browser_profile.py).")
+    parser.add_argument("--block-images", action="store_true", required=False,
+                        help="Do not load images.")
+    parser.add_argument("--block-media", action="store_true", required=False,
+                        help="Block requests for audio and video files.")
+    parser.add_argument("--visit-timeout", action="store", type=float, required=False, default=VISIT_TIME_LIMIT,
+                        help="The hard limit (in seconds) on a single visit, after which the browser is killed.")
+    parser.add_argument("--compact-headers", action="store_true", required=False,
+                        help="Store the headers of the requests with interned names and values (see header_table.py).")
+    parser.add_argument("--output-format", action="store", type=str, required=False, default="json",
+                        choices=OUTPUT_FORMATS,
+                        help="Write an (indented) JSON file per domain, a compressed JSON file per domain or a "
+                             "compressed JSON Lines stream per crawler process (see result_writer.py).")
+    parser.add_argument("-a", "--archive", action="store", type=str, required=False,
+                        help="A directory to store a compressed archive of the captured traffic of every visit in, "
+                             "which can be reprocessed without a browser using replay.py.")
+    parser.add_argument("--consent-cache", action="store", type=str, required=False, default=CONSENT_CACHE_PATH,
+                        help="A path to the file that caches how the cookie consent was accepted per domain.")
+    parser.add_argument("--no-consent-cache", action="store_true", required=False,
+                        help="Always search for the cookie consent button without trying the cached locator first.")
     arguments = parser.parse_args()
 
-    if (not arguments.url and not arguments.input) or (arguments.url and arguments.input):
-        parser.error("Invalid input: please provide either the -u or -i argument!")
+    if sum(bool(source) for source in [arguments.url, arguments.input, arguments.coordinator]) != 1:
+        parser.error("Invalid input: please provide either the -u, -i or --coordinator argument!")
 
     print("Arguments have been parsed successfully!")
     return vars(arguments)
 
 
-def read_tranco_top_500(file_path):
-    """Read a csv file containing domains to crawl and their Tranco ranks
-
-    Parameters
-    ----------
-    file_path: str
-        The path to the csv file
-
-    Returns
-    -------
-    dict
-        A dictionary with the Tranco ranks and the corresponding domain
-    """
-    tranco_df = pd.read_csv(file_path, header=0, index_col=0).squeeze("columns")
-    tranco_dict = tranco_df.to_dict()
-
-    print("The CSV file has been read successfully!")
-    return tranco_dict
-
-
 def set_webdriver_options(params):
     """Set the correct options for the Chrome webdriver
 
@@ -184,7 +230,7 @@ def check_errors(url):
     return None
 
 
-def get_url_requests_times(driver, url):
+def get_url_requests_times(driver, url, capture):
     """Retrieve the requests of the webpage found at URL and computing the start and end times of the page load as
     well as retrieving the URL after redirections
 
@@ -194,6 +240,8 @@ def get_url_requests_times(driver, url):
         The webdriver that is used to visit the domain
     url: str
         The URL being accessed by the webdriver
+    capture: capture.ProxyCapture or capture.DevToolsCapture
+        The backend that captured the traffic of the webdriver
 
     Returns
     ----------
@@ -221,7 +269,7 @@ def get_url_requests_times(driver, url):
     pageload_end_ts = datetime.now().strftime("%d/%m/%Y %H:%M:%S.%f")
 
     post_pageload_url = driver.current_url
-    requests_url = driver.requests
+    requests_url = capture.get_requests(driver)
 
     return post_pageload_url, requests_url, pageload_start_ts, pageload_end_ts
 
@@ -329,6 +377,79 @@ def detect_redirections(domain, requests, post_pageload_url):
     return redirections
 
 
+def redirect_hop(url, request=None, start=None):
+    """Describe a single hop of a redirect chain
+
+    Parameters
+    ----------
+    url: str
+        The URL of the hop
+    request: seleniumwire.webdriver.requests, optional
+        The captured request of the hop, None if the target of the last redirection was not captured
+    start: datetime, optional
+        The time the first request of the chain was sent
+
+    Returns
+    ----------
+    dict
+        The URL, first-party domain, response status, timestamp and offset (in seconds since the first hop) of the hop
+    """
+    hop = {"url": url, "domain": get_fld(url, fail_silently=True), "status": None, "timestamp": None, "offset": None}
+    if request is not None:
+        hop.update({"status": request.response.status_code if request.response else None,
+                    "timestamp": request.date.strftime("%d/%m/%Y %H:%M:%S.%f"),
+                    "offset": (request.date - start).total_seconds()})
+    return hop
+
+
+def detect_redirect_chains(requests):
+    """Reconstruct the ordered redirect chains of the requests of a visit, by following the location header of every
+    response to the next request for the URL it points to
+
+    Parameters
+    ----------
+    requests: list
+        The requests for the domain, in the order they were sent
+
+    Returns
+    ----------
+    list
+        A list with a chain (a list of hops, see redirect_hop) for every redirection that is not itself the target of a
+        redirection
+    """
+    # The indices of the requests per URL that are not yet the target of a redirection, in the order they were sent
+    pending = defaultdict(deque)
+    for index, request in enumerate(requests):
+        pending[request.url].append(index)
+
+    # The index of the request a request redirects to, or the URL of the target if that request was not captured
+    next_hops = dict()
+    for index, request in enumerate(requests):
+        if not request.response or "location" not in request.response.headers:
+            continue
+        target = urljoin(request.url, request.response.headers['location'])
+        candidates = pending[target]
+        # A redirection can only point to a request that is sent later
+        while candidates and candidates[0] <= index:
+            candidates.popleft()
+        next_hops[index] = candidates.popleft() if candidates else target
+
+    targets = {next_hop for next_hop in next_hops.values() if isinstance(next_hop, int)}
+    chains = []
+    for index in sorted(next_hops.keys() - targets):
+        start = requests[index].date
+        chain_hops = [redirect_hop(requests[index].url, requests[index], start)]
+        next_hop = next_hops[index]
+        while isinstance(next_hop, int):
+            chain_hops.append(redirect_hop(requests[next_hop].url, requests[next_hop], start))
+            next_hop = next_hops.get(next_hop)
+        if next_hop is not None:
+            chain_hops.append(redirect_hop(next_hop))
+        chains.append(chain_hops)
+
+    return chains
+
+
 def search_element_using_xpath(driver, accept_word):
     """Search for the accept word using the XPATH
 
@@ -387,7 +508,133 @@ def try_clicking_element(element):
         return False, status
 
 
-def search_and_click_iframes(driver, status, accept_word):
+def describe_frame(driver, frame, index):
+    """Describe an iframe in a way that it can be found again on a later visit (the driver needs to be switched to
+    the iframe, and is switched back to it afterwards)
+
+    Parameters
+    ----------
+    driver: seleniumwire.webdriver
+        The webdriver that is used to visit the domain
+    frame: selenium.WebElement
+        The iframe element
+    index: int
+        The position of the iframe among all iframes of the webpage
+
+    Returns
+    -------
+    dict
+        The index, id, name and src (without query string) of the iframe
+    """
+    frame_locator = {"index": index}
+    try:
+        driver.switch_to.default_content()
+        frame_locator.update({"id": frame.get_attribute("id") or None,
+                              "name": frame.get_attribute("name") or None,
+                              "src": (frame.get_attribute("src") or "").split("?")[0] or None})
+        driver.switch_to.frame(frame)
+    except (NoSuchFrameException, StaleElementReferenceException, WebDriverException):
+        pass
+    return frame_locator
+
+
+def find_frame(driver, frame_locator):
+    """Find the iframe described by a frame locator, matching on its id, name, src and finally its position
+
+    Parameters
+    ----------
+    driver: seleniumwire.webdriver
+        The webdriver that is used to visit the domain
+    frame_locator: dict
+        The description of the iframe, as created by describe_frame
+
+    Returns
+    -------
+    selenium.WebElement
+        The iframe, or None if it could not be found
+    """
+    list_of_iframes = driver.find_elements(By.TAG_NAME, "iframe")
+    for attribute in ["id", "name", "src"]:
+        if frame_locator.get(attribute):
+            for frame in list_of_iframes:
+                value = frame.get_attribute(attribute) or ""
+                if (value.split("?")[0] if attribute == "src" else value) == frame_locator[attribute]:
+                    return frame
+    if frame_locator["index"] < len(list_of_iframes):
+        return list_of_iframes[frame_locator["index"]]
+    return None
+
+
+def click_elements(elements, preferred=0):
+    """Try clicking the elements containing an accept word, starting with the preferred element
+
+    Parameters
+    ----------
+    elements: list
+        The elements containing the accept word
+    preferred: int
+        The index of the element to try first
+
+    Returns
+    ----------
+    bool
+        A boolean value specifying whether an element was clicked or not
+    status: str
+        Specifying the status of clicking the elements
+    index: int
+        The index of the element that was clicked, or None
+    """
+    status = "not_found"
+    order = [preferred] + [i for i in range(len(elements)) if i != preferred] if preferred < len(elements) \
+        else range(len(elements))
+    for i in order:
+        bool_val, status = try_clicking_element(elements[i])
+        if bool_val:
+            return True, status, i
+    return False, status, None
+
+
+def rank_consent_frames(driver, domain=None):
+    """Rank the iframes of the webpage by their likelihood of holding the consent button using the CMP signatures, and
+    look for the containers of known CMPs in the webpage itself
+
+    Parameters
+    ----------
+    driver: seleniumwire.webdriver
+        The webdriver that is used to visit the domain
+    domain: str, optional
+        The domain that is visited
+
+    Returns
+    ----------
+    ranked_frames: list
+        The (index, iframe) pairs to search, in the order in which they should be searched (empty if the iframes could
+        not be found)
+    containers: list
+        The ids of the CMP containers found in the webpage
+    """
+    try:
+        list_of_iframes = driver.find_elements(By.TAG_NAME, "iframe")
+    except WebDriverException:
+        print("Timed Out: could not find iframe elements!")
+        return [], []
+    try:
+        # Retrieve the attributes of all iframes and look for all containers in a single command each
+        attributes = driver.execute_script("return arguments[0].map(f => [f.id, f.name, f.src]);", list_of_iframes)
+        containers = driver.execute_script("return arguments[0].filter(id => document.getElementById(id) !== null);",
+                                           list(CONTAINER_IDS))
+    except WebDriverException:
+        print("Could not rank the iframes, searching them in DOM order!")
+        return list(enumerate(list_of_iframes)), []
+
+    ranking, skipped = rank_frames(attributes, domain)
+    print(f"Consent search order: {[f'{index}: {reason}' for index, reason in ranking]}"
+          + (f", skipped: {[f'{index}: {reason}' for index, reason in skipped]}" if skipped else "")
+          + (f", CMP containers: {[f'{CONTAINER_IDS[c]} {c}' for c in containers]}" if containers else ""))
+    return [(index, list_of_iframes[index]) for index, _ in ranking], containers
+
+
+def search_and_click_iframes(driver, status, accept_word, ranked_frames=None, domain=None):
     """Look for a WebElement containing the accept word in different iframes
 
     Parameters
@@ -398,6 +645,12 @@ def search_and_click_iframes(driver, status, accept_word):
         Specifying the status of clicking the element
     accept_word: str
         The accept cookies word to be searched
+    ranked_frames: list, optional
+        The (index, iframe) pairs to search in order, all iframes are searched in DOM order if it is not provided. If
+        an iframe is stale (e.g., because an earlier click changed the webpage), the iframes are ranked again and the
+        list is replaced in place, so the next accept words use the new ranking as well.
+    domain: str, optional
+        The domain that is visited, used when ranking the iframes again
 
     Returns
     ----------
@@ -405,22 +658,37 @@ def search_and_click_iframes(driver, status, accept_word):
         A boolean value specifying whether the element was clicked or not
     status: str
         Specifying the status of clicking an element in different iframes
+    locator: dict
+        The iframe, accept word and element index of the clicked element, or None
     """
     try:
-        list_of_iframes = driver.find_elements(By.TAG_NAME, "iframe")
-        for frame in list_of_iframes:
+        if ranked_frames is None:
+            ranked_frames = list(enumerate(driver.find_elements(By.TAG_NAME, "iframe")))
+        pending = deque(ranked_frames)
+        reranked = False
+        while pending:
+            index, frame = pending.popleft()
             try:
                 driver.switch_to.frame(frame)
-            except (NoSuchFrameException, StaleElementReferenceException, WebDriverException):
-                pass
+            except StaleElementReferenceException:
+                # The iframe is no longer part of the webpage, rank its current iframes again (once per accept word)
+                if not reranked:
+                    reranked = True
+                    ranked_frames[:] = rank_consent_frames(driver, domain)[0]
+                    pending = deque(ranked_frames)
+                continue
+            except (NoSuchFrameException, WebDriverException):
+                # Searching the webpage itself instead of the iframe would only repeat search_and_click_document
+                continue
 
             allow_all_cookies = search_element_using_xpath(driver, accept_word)
 
             if allow_all_cookies:
-                for element in allow_all_cookies:
-                    bool_val, status = try_clicking_element(element)
-                    if bool_val:
-                        return True, status
+                frame_locator = describe_frame(driver, frame, index)
+                bool_val, status, element_index = click_elements(allow_all_cookies)
+                if bool_val:
+                    return True, status, {"frame": frame_locator, "accept_word": accept_word,
+                                          "element": element_index}
                 if status == "errored":
                     break
             else:
@@ -431,20 +699,94 @@ def search_and_click_iframes(driver, status, accept_word):
             except TimeoutException:
                 print("Timed out: could not switch to default content")
                 pass
-        return False, status
+        return False, status, None
 
     except TimeoutException:
         print("Timed Out: could not find iframe elements!")
-        return False, "errored"
+        return False, "errored", None
+
+
+def click_cached_consent(driver, locator):
+    """Try accepting the cookies with the locator that succeeded during a previous crawl
+
+    Parameters
+    ----------
+    driver: seleniumwire.webdriver
+        The webdriver that is used to visit the domain
+    locator: dict
+        The iframe (or None for the main document), accept word and element index of the consent button
+
+    Returns
+    ----------
+    bool
+        A boolean value specifying whether cookies were accepted or not
+    status: str
+        Specifying the status of accepting cookies
+    """
+    try:
+        if locator["frame"]:
+            frame = find_frame(driver, locator["frame"])
+            if frame is None:
+                return False, "not_found"
+            driver.switch_to.frame(frame)
+
+        allow_all_cookies = search_element_using_xpath(driver, locator["accept_word"])
+        bool_val, status, element_index = click_elements(allow_all_cookies or [], locator["element"])
+        if not bool_val:
+            driver.switch_to.default_content()
+        return bool_val, status
+    except (NoSuchFrameException, StaleElementReferenceException, TimeoutException, WebDriverException):
+        try:
+            driver.switch_to.default_content()
+        except WebDriverException:
+            pass
+        return False, "not_found"
+
+
+def search_and_click_document(driver, status, accept_word):
+    """Look for a WebElement containing the accept word in the webpage itself
+
+    Parameters
+    ----------
+    driver: seleniumwire.webdriver
+        The webdriver that is used to visit the domain
+    status: str
+        Specifying the status of clicking the element
+    accept_word: str
+        The accept cookies word to be searched
+
+    Returns
+    ----------
+    bool
+        A boolean value specifying whether the element was clicked or not
+    status: str
+        Specifying the status of clicking the element
+    locator: dict
+        The accept word and element index of the clicked element, or None
+    """
+    allow_all_cookies = search_element_using_xpath(driver, accept_word)
+
+    if allow_all_cookies:
+        bool_val, status, element_index = click_elements(allow_all_cookies)
+        if bool_val:
+            return True, status, {"frame": None, "accept_word": accept_word, "element": element_index}
+    else:
+        status = "not_found"
 
+    return False, status, None
 
-def allow_cookies(driver):
+
+def allow_cookies(driver, cached=None, domain=None):
     """Look for the button for accepting cookies and accepts the cookies, if possible, otherwise logs the error given
 
     Parameters
     ----------
     driver: seleniumwire.webdriver
         The webdriver that is used to visit the domain
+    cached: dict, optional
+        The locator that accepted the cookies during a previous crawl, which is tried before the full search
+    domain: str, optional
+        The domain that is visited
 
     Returns
     ----------
@@ -452,32 +794,43 @@ def allow_cookies(driver):
         A boolean value specifying whether cookies were accepted or not
     status: str
         Specifying the status of accepting cookies
+    locator: dict
+        The iframe, accept word and element index of the clicked element, or None
     """
     status = ""
 
+    if cached:
+        accepted, status = click_cached_consent(driver, cached)
+        if accepted:
+            return True, status, cached
+
     # We open and read the full datalist of the priv-accept project.
     with open("accept_words.txt", encoding="utf8") as acceptwords_file:
         accept_words = acceptwords_file.read().splitlines()
 
+    ranked_frames, containers = rank_consent_frames(driver, domain)
+
     for accept_word in accept_words:
+        # The webpage itself is searched first if it holds the container of a known CMP, otherwise the iframes are
+        if not containers:
+            accepted_via_iframe, status, locator = search_and_click_iframes(driver, status, accept_word, ranked_frames,
+                                                                            domain)
+            if accepted_via_iframe:
+                return accepted_via_iframe, status, locator
 
-        accepted_via_iframe, status = search_and_click_iframes(driver, status, accept_word)
-        if accepted_via_iframe:
-            return accepted_via_iframe, status
-        else:
-            allow_all_cookies = search_element_using_xpath(driver, accept_word)
+        accepted, status, locator = search_and_click_document(driver, status, accept_word)
+        if accepted:
+            return accepted, status, locator
+        if status == "errored":
+            break
 
-            if allow_all_cookies:
-                for element in allow_all_cookies:
-                    bool_val, status = try_clicking_element(element)
-                    if bool_val:
-                        return True, status
-                if status == "errored":
-                    break
-            else:
-                status = "not_found"
+        if containers:
+            accepted_via_iframe, status, locator = search_and_click_iframes(driver, status, accept_word, ranked_frames,
+                                                                            domain)
+            if accepted_via_iframe:
+                return accepted_via_iframe, status, locator
 
-    return False, status
+    return False, status, None
 
 
 def consent_error_logging(status, domain):
@@ -627,6 +980,31 @@ def build_requests_list(requests_url):
     return requests
 
 
+def process_requests(url_dict, requests_url, compact=False):
+    """Add the data derived from the captured requests (cookies, third-party domains, redirections, redirect chains and
+    the requests themselves) to the dictionary of a visit
+
+    Parameters
+    ----------
+    url_dict: dict
+        A dictionary containing various information retrieved from the URL being accessed by the webdriver, including
+        the website domain and the post page load URL
+    requests_url: list
+        The requests for the URL being accessed
+    compact: bool, default=False
+        Whether the headers of the requests are stored in the compact representation of header_table.py
+    """
+    domain = url_dict["website_domain"]
+    requests = build_requests_list(requests_url)
+    url_dict.update({"cookies": get_all_cookies(requests_url),
+                     "third_party_domains": get_third_party_domains(domain, requests_url),
+                     "redirect_pairs": detect_redirections(domain, requests_url, url_dict["post_pageload_url"]),
+                     "redirect_chains": detect_redirect_chains(requests_url)})
+    if compact:
+        url_dict["header_table"] = compact_headers(requests)
+    url_dict["requests"] = requests
+
+
 def crawl_url(params, domain, rank):
     """Access a webpage, take screenshots, accept cookies and create a dictionary
     containing various information about the webpage visit
@@ -645,9 +1023,6 @@ def crawl_url(params, domain, rank):
     dict
         A dictionary containing various information retrieved from the URL being accessed by the webdriver
     """
-    chrome_options = set_webdriver_options(params)
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), chrome_options=chrome_options)
-
     error = check_errors(domain)
 
     url_dict = {"website_domain": domain,
@@ -655,35 +1030,57 @@ def crawl_url(params, domain, rank):
                 "crawl_mode": "Mobile" if params["mobile"] else "Desktop"}
 
     if error is None:
-        post_pageload_url, requests_url, pageload_start_ts, pageload_end_ts = get_url_requests_times(driver, domain)
-        if post_pageload_url:
-            time.sleep(10)
-            take_screenshots_consent(params, driver, domain, "pre")
-
-            # Skip latimes.com on mobile due to weird iframe location
-            if domain == "latimes.com" and params["mobile"]:
-                status = "errored"
-                print(consent_error_logging(status, domain))
-            else:
-                cookies_accepted, status = allow_cookies(driver)
-                print(consent_error_logging(status, domain))
+        # Every visit gets a fresh browser session, so a retry does not inherit the state of a failed visit
+        chrome_options = set_webdriver_options(params)
+        toggles = profile_toggles(params)
+        profile_dir = apply_profile(chrome_options, toggles)
+        capture = CAPTURE_BACKENDS[params["capture"]]()
+        driver = None
+        post_pageload_url = None
+
+        # The watchdog kills the browser if the visit exceeds the time limit, e.g., because a command hangs
+        watchdog = VisitWatchdog(params["visit_timeout"])
+        try:
+            with watchdog:
+                driver = capture.create_driver(chrome_options)
+                apply_driver_toggles(driver, toggles)
 
-                if cookies_accepted:
+                post_pageload_url, requests_url, pageload_start_ts, pageload_end_ts = \
+                    get_url_requests_times(driver, domain, capture)
+                if post_pageload_url:
                     time.sleep(10)
-                    take_screenshots_consent(params, driver, domain, "post")
-
-            driver.quit()
-
-            # Now it is time to process the gathered data:
-            requests = build_requests_list(requests_url)
+                    take_screenshots_consent(params, driver, domain, "pre")
+
+                    # Skip latimes.com on mobile due to weird iframe location
+                    if domain == "latimes.com" and params["mobile"]:
+                        status = "errored"
+                        print(consent_error_logging(status, domain))
+                    else:
+                        cached = consent_cache.get(domain, url_dict["crawl_mode"]) if consent_cache else None
+                        cookies_accepted, status, locator = allow_cookies(driver, cached, domain)
+                        print(consent_error_logging(status, domain))
+                        if consent_cache:
+                            url_dict["consent_cache"] = consent_cache.update(domain, url_dict["crawl_mode"], cached,
+                                                                             locator)
+
+                        if cookies_accepted:
+                            time.sleep(10)
+                            take_screenshots_consent(params, driver, domain, "post")
+        finally:
+            # Quit the browser on every path, also when the visit failed or was killed
+            watchdog.cleanup(driver, profile_dir)
+
+        if post_pageload_url and not watchdog.fired:
             url_dict.update({"pageload_start_ts": pageload_start_ts,
                              "pageload_end_ts": pageload_end_ts,
                              "post_pageload_url": post_pageload_url,
                              "consent_status": status,
-                             "cookies": get_all_cookies(requests_url),
-                             "third_party_domains": get_third_party_domains(domain, requests_url),
-                             "redirect_pairs": detect_redirections(domain, requests_url, post_pageload_url),
-                             "requests": requests})
+                             "browser_profile": toggles})
+            if params["archive"]:
+                save_archive(params["archive"], url_dict, requests_url)
+
+            # Now it is time to process the gathered data:
+            process_requests(url_dict, requests_url, params["compact_headers"])
         else:
             url_dict.update({"error": "Timeout"})
     else:
@@ -693,22 +1090,91 @@ def crawl_url(params, domain, rank):
 
 
 def crawl_list(params, domain_list):
-    """Crawl all the domains in the list and create a JSON file per domain
+    """Crawl all the domains in the list and create a JSON file per domain, failed visits are retried after the rest
+    of the list according to the retry policy of their error
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    domain_list: iterable
+        The (Tranco rank, domain) pairs to be crawled
+    """
+    retries = RetryQueue()
+    first_attempts = ((tranco_rank, domain, []) for tranco_rank, domain in domain_list)
+    for tranco_rank, domain, attempts in chain(first_attempts, retries):
+        url_dict = crawl_url(params, domain, tranco_rank)
+        attempts = record_attempt(attempts, url_dict)
+        if retries.schedule(tranco_rank, domain, attempts):
+            continue
+
+        url_dict["attempts"] = attempts
+        convert_to_json(params, domain, url_dict, writer=result_writer)
+
+
+def post_to_coordinator(params, path, message, timeout):
+    """Post a message to the crawl coordinator, retrying while the coordinator cannot be reached or does not reply with
+    JSON (e.g., while it is restarting)
+
+    Parameters
+    ----------
+    params: dict
+        A dictionary with the values for all command line arguments
+    path: str
+        The path of the request, either /lease or /complete
+    message: dict
+        The JSON body of the request
+    timeout: int
+        The number of seconds to wait for the reply
+
+    Returns
+    -------
+    dict
+        The reply of the coordinator, or None if it could not be reached after COORDINATOR_ATTEMPTS attempts
+    """
+    for attempt in range(COORDINATOR_ATTEMPTS):
+        if attempt:
+            time.sleep(COORDINATOR_RETRY_DELAY)
+        try:
+            return python_requests.post(f"{params['coordinator']}{path}", json=message, timeout=timeout).json()
+        except (ConnectionError, Timeout, ValueError) as error:
+            # The coordinator stops once all domains are crawled, or may be restarting
+            print(f"Could not reach the coordinator at {path} ({type(error).__name__}).")
+    return None
+
+
+def crawl_from_coordinator(params):
+    """Crawl the domains leased from a crawl coordinator until it reports that the crawl is done
 
     Parameters
     ----------
     params: dict
         A dictionary with the values for all command line arguments
-    domain_list: dict
-        A dictionary of domains to be crawled
     """
-    print("Please wait, we are trying to crawl your entire input list!")
-    for tranco_rank in domain_list:
-        url_dict = crawl_url(params, domain_list[tranco_rank], tranco_rank)
-        convert_to_json(params, domain_list[tranco_rank], url_dict)
+    worker = f"{params['worker_id']}-{os.getpid()}"
+    crawl_mode = "Mobile" if params["mobile"] else "Desktop"
+    print(f"Worker {worker} is leasing domains from {params['coordinator']}!")
+
+    while True:
+        lease = post_to_coordinator(params, "/lease", {"worker": worker, "crawl_mode": crawl_mode}, 30)
+        if lease is None:
+            print("Could not reach the coordinator, stopping the worker!")
+            return
+        if lease.get("done"):
+            return
+        if "wait" in lease:
+            time.sleep(lease["wait"])
+            continue
+
+        url_dict = crawl_url(params, lease["domain"], lease["rank"])
+        reply = post_to_coordinator(params, "/complete", {"lease_id": lease["lease_id"], "url_dict": url_dict}, 60)
+        if reply is None:
+            # The lease expires at the coordinator, which then gives the domain to another worker
+            print(f"Could not report the visit of {lease['domain']}, stopping the worker!")
+            return
 
 
-def convert_to_json(params, domain, url_dict):
+def convert_to_json(params, domain, url_dict, output_dir="../crawl_data", writer=None):
     """Create a JSON for a specific domain using the dictionary created by the crawl
 
     Parameters
@@ -719,33 +1185,45 @@ def convert_to_json(params, domain, url_dict):
         The domain that is visited
     url_dict: dict
          A dictionary containing various information retrieved from the URL being accessed by the webdriver
+    output_dir: str, optional
+        The directory to write the JSON file to
+    writer: result_writer.ResultWriter, optional
+        The writer of the crawl data, an indented JSON file is written to `output_dir` if it is not provided
     """
-    if params["mobile"]:
-        out_file = open(f"../crawl_data/{domain}_mobile.json", "w")
-    else:
-        out_file = open(f"../crawl_data/{domain}_desktop.json", "w")
-    json.dump(url_dict, out_file, indent=6)
-    out_file.close()
+    if writer is None:
+        writer = ResultWriter(output_dir, "json")
+    writer.write(domain, "Mobile" if params["mobile"] else "Desktop", url_dict)
 
 
 def main():
     """ Parse arguments and decide whether we crawl a list of domains or a single domain
     """
+    global consent_cache, result_writer
+
     args = parse_arguments()
+    if not args["no_consent_cache"]:
+        consent_cache = ConsentCache(args["consent_cache"])
+    crawl_mode = "mobile" if args["mobile"] else "desktop"
+    result_writer = ResultWriter("../crawl_data", args["output_format"], f"crawl_{crawl_mode}_{args['worker_id']}")
+
     if args["input"]:
-        tranco_domains = read_tranco_top_500(args["input"])
+        tranco_domains = iter_tranco(args["input"], args["ranks"], args["shard"])
+        tranco_domains = apply_schedule(tranco_domains, args)
+        print("Please wait, we are trying to crawl your entire input list!")
         crawl_list(args, tranco_domains)
 
     if args["url"]:
-        tranco_rank = None
-        tranco_domains = read_tranco_top_500("tranco-top-500-safe.csv")
-        for rank in tranco_domains.keys():
-            if tranco_domains[rank] == args["url"]:
-                tranco_rank = rank
-                break
-
-        url_dict = crawl_url(args, args["url"], tranco_rank)
-        convert_to_json(args, args["url"], url_dict)
+        tranco_rank = lookup_rank("tranco-top-500-safe.csv", args["url"])
+        crawl_list(args, [(tranco_rank, args["url"])])
+
+    if args["coordinator"]:
+        crawl_from_coordinator(args)
+
+    if consent_cache:
+        consent_cache.save()
+        print(consent_cache.summary())
+    print(visit_watchdog.summary())
+    result_writer.close()
 
     print("The crawl has completed successfully and your data was saved locally!")
 
@@ -0,0 +1,169 @@
+"""Domain source
+
+Streams (Tranco rank, domain) pairs from a Tranco CSV file instead of loading the whole list into memory, optionally
+restricted to a range of ranks and/or a single shard of the list. Looking up the rank of a single domain uses an
+on-disk index (an SQLite table next to the CSV file, keyed by domain) that is built once and rebuilt whenever the CSV
+changes.
+"""
+import csv
+import os
+import sqlite3
+
+# The tables of the index: the rank of every domain, and the size and modification time of the CSV file it was built
+# from (under the key "source")
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranks (domain TEXT PRIMARY KEY, rank INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def parse_rank_range(value):
+    """Parse a rank range of the form "start-end" (both inclusive), where start or end may be omitted
+
+    Parameters
+    ----------
+    value: str
+        The rank range, e.g., 1000-2000, 1000- or -500
+
+    Returns
+    -------
+    tuple
+        The first and last rank, None meaning unbounded
+    """
+    start, _, end = value.partition("-")
+    return int(start) if start else None, int(end) if end else None
+
+
+def parse_shard(value):
+    """Parse a shard of the form "i/n", selecting the i-th of n equally large shards (0 <= i < n)
+
+    Parameters
+    ----------
+    value: str
+        The shard, e.g., 0/4
+
+    Returns
+    -------
+    tuple
+        The index and the total number of shards
+    """
+    index, _, total = value.partition("/")
+    index, total = int(index), int(total)
+    if not 0 <= index < total:
+        raise ValueError(f"Invalid shard {value}: the index should be between 0 and {total - 1}")
+    return index, total
+
+
+def iter_tranco(file_path, ranks=None, shard=None):
+    """Stream the (Tranco rank, domain) pairs of a Tranco CSV file
+
+    Parameters
+    ----------
+    file_path: str
+        The path to the csv file, with or without a header row
+    ranks: tuple, optional
+        The first and last rank (both inclusive, None meaning unbounded) to select
+    shard: tuple, optional
+        The index and the total number of shards, the domains are assigned to the shards in a round-robin fashion so
+        every shard gets a similar mix of popular and less popular domains
+
+    Yields
+    ------
+    tuple
+        The Tranco rank and the domain, in the order of the file
+    """
+    first, last = ranks if ranks else (None, None)
+    position = 0
+
+    with open(file_path, newline="") as csv_file:
+        for row in csv.reader(csv_file):
+            if len(row) < 2 or not row[0].strip().isdigit():
+                # Skip the header row and empty lines
+                continue
+            rank, domain = int(row[0]), row[1].strip()
+
+            if first is not None and rank < first:
+                continue
+            if last is not None and rank > last:
+                # Tranco lists are sorted by rank, so no further domain can be in the range
+                break
+
+            if shard is None or position % shard[1] == shard[0]:
+                yield rank, domain
+            position += 1
+
+
+def source_signature(file_path):
+    """Get a signature of a file that changes whenever the file is modified
+
+    Parameters
+    ----------
+    file_path: str
+        The path to the file
+
+    Returns
+    -------
+    str
+        The size and modification time of the file
+    """
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def build_rank_index(file_path, index):
+    """Fill the on-disk domain -> rank index of a Tranco CSV file, replacing its previous contents
+
+    Parameters
+    ----------
+    file_path: str
+        The path to the csv file
+    index: sqlite3.Connection
+        The connection to the index
+    """
+    with index:
+        index.execute("DELETE FROM ranks")
+        # Keep the best rank if a domain occurs multiple times, the list is sorted by rank
+        index.executemany("INSERT OR IGNORE INTO ranks VALUES (?, ?)",
+                          ((domain, rank) for rank, domain in iter_tranco(file_path)))
+        index.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source_signature(file_path),))
+
+    print(f"The rank index of {file_path} has been built successfully!")
+
+
+def lookup_rank(file_path, domain, index_path=None):
+    """Look up the Tranco rank of a domain in the on-disk index, (re)building the index if necessary
+
+    Parameters
+    ----------
+    file_path: str
+        The path to the csv file
+    domain: str
+        The domain to look up
+    index_path: str, optional
+        The path of the index, defaults to the path of the csv file with an .index suffix
+
+    Returns
+    -------
+    int
+        The Tranco rank of the domain, or None if the domain is not in the list
+    """
+    index_path = index_path or f"{file_path}.index"
+    try:
+        index = sqlite3.connect(index_path)
+        index.executescript(INDEX_SCHEMA)
+    except sqlite3.DatabaseError:
+        # The index is not an SQLite database (e.g., an index of an older version), so start from scratch
+        index.close()
+        os.remove(index_path)
+        index = sqlite3.connect(index_path)
+        index.executescript(INDEX_SCHEMA)
+
+    try:
+        source = index.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if source is None or source[0] != source_signature(file_path):
+            build_rank_index(file_path, index)
+        rank = index.execute("SELECT rank FROM ranks WHERE domain = ?", (domain,)).fetchone()
+    finally:
+        index.close()
+
+    return rank[0] if rank is not None else None
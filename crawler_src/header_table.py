@@ -0,0 +1,51 @@
+"""Header table
+
+Most header names and many header values (e.g., user-agent, accept, cache-control and server) repeat for almost every
+request of a visit. In the compact representation, the headers of every request are stored as a list of
+[name, value] pairs, where the name is an index in the names of the header table of the file and the value is an
+index in the values of the header table if it occurs more than once in the file, or the value itself otherwise:
+
+    "header_table": {"names": ["user-agent", "cookie"], "values": ["Mozilla/5.0 ..."]},
+    "requests": [{"request_headers": [[0, 0], [1, "a=1; b=2"]], ...}, ...]
+
+analysis/request_list.py expands the headers again when they are needed.
+"""
+from collections import Counter
+
+
+def compact_headers(requests):
+    """Replace the header dictionaries of the requests by their compact representation
+
+    Parameters
+    ----------
+    requests: list
+        The requests as built by build_requests_list, their headers are replaced in place
+
+    Returns
+    -------
+    dict
+        The header table, holding the interned names and values
+    """
+    counts = Counter((name, value) for request in requests
+                     for headers in (request["request_headers"], request["response_headers"]) if headers
+                     for name, value in headers.items())
+    names = dict()
+    values = dict()
+
+    def encode(headers):
+        if headers is None:
+            return None
+        encoded = []
+        for name, value in headers.items():
+            name_index = names.setdefault(name, len(names))
+            if counts[(name, value)] > 1:
+                value = values.setdefault(value, len(values))
+            encoded.append([name_index, value])
+        return encoded
+
+    for request in requests:
+        request["request_headers"] = encode(request["request_headers"])
+        request["response_headers"] = encode(request["response_headers"])
+
+    return {"names": list(names), "values": list(values)}
+
@@ -0,0 +1,164 @@
+"""History-aware scheduling
+
+Estimates the cost of crawling every domain from the output of a previous crawl, so the domains can be dispatched in
+an order that shortens the total duration of a parallel crawl:
+- longest-first: the most expensive domains are crawled first, so no worker is left with a slow domain at the tail
+- interleave: expensive and cheap domains alternate, so the workers are not all waiting for slow domains at once
+Domains that could not be reached during the previous crawl (TLS or Other errors) are dispatched first: crawl_url
+checks for these errors before it starts a browser, so they only cost a cheap early check.
+Only the order in which the domains are crawled changes, the output files and their content stay the same.
+The previous crawl can be in any of the output formats of result_writer.py, it is read with result_reader.py.
+"""
+import os
+import statistics
+from datetime import datetime
+
+from result_reader import TRUNCATION_ERRORS, iter_records, list_crawl_files
+
+SCHEDULES = ["rank", "longest-first", "interleave"]
+# The time (in seconds) a visit takes besides loading the page: twice 10 seconds of waiting and the consent search
+VISIT_OVERHEAD = 30
+# The estimated cost (in seconds) of a domain whose page load timed out
+TIMEOUT_COST = 300
+# The errors of domains that are considered dead, which crawl_url detects before starting a browser
+DEAD_ERRORS = ["TLS", "Other"]
+
+
+def visit_cost(url_dict):
+    """Estimate the cost of crawling a domain from the output of a previous visit
+
+    Parameters
+    ----------
+    url_dict: dict
+        The output of the previous visit
+
+    Returns
+    -------
+    float
+        The estimated number of seconds the visit takes
+    """
+    attempts = len(url_dict.get("attempts", [])) or 1
+    if url_dict.get("error") in DEAD_ERRORS:
+        return 0
+    if url_dict.get("error"):
+        return TIMEOUT_COST * attempts
+
+    start = datetime.strptime(url_dict["pageload_start_ts"], "%d/%m/%Y %H:%M:%S.%f")
+    end = datetime.strptime(url_dict["pageload_end_ts"], "%d/%m/%Y %H:%M:%S.%f")
+    return (end - start).total_seconds() + VISIT_OVERHEAD
+
+
+def load_history(history_dir, domains, crawl_mode):
+    """Read the output of a previous crawl for the given domains
+
+    Parameters
+    ----------
+    history_dir: str
+        The directory with the crawl data of the previous crawl, in any of the output formats
+    domains: list
+        The (Tranco rank, domain) pairs to crawl
+    crawl_mode: str
+        The crawl mode, either Desktop or Mobile
+
+    Returns
+    -------
+    dict
+        The estimated cost and whether the domain was dead, by domain, for the domains with a previous visit
+    """
+    wanted = {domain for _, domain in domains}
+    # A file per domain is named after the domain and crawl mode, so only the files of the domains to crawl are read,
+    # while a JSON Lines stream can hold the visits of any domain
+    names = {f"{domain}_{crawl_mode.lower()}" for domain in wanted}
+    files = [file for file in list_crawl_files(history_dir)
+             if ".jsonl" in os.path.basename(file) or os.path.basename(file).rsplit(".json", 1)[0] in names]
+
+    history = dict()
+    for file in files:
+        try:
+            for _, url_dict in iter_records([file]):
+                domain = url_dict.get("website_domain")
+                if url_dict.get("crawl_mode") != crawl_mode or domain not in wanted:
+                    continue
+                try:
+                    history[domain] = {"cost": visit_cost(url_dict), "dead": url_dict.get("error") in DEAD_ERRORS}
+                except KeyError:
+                    # No valid previous visit
+                    continue
+        except (OSError, ValueError) + TRUNCATION_ERRORS:
+            # An unreadable file
+            continue
+
+    print(f"Found the history of {len(history)} out of {len(domains)} domains in {history_dir}.")
+    return history
+
+
+def schedule_domains(domains, history, schedule):
+    """Order the domains to crawl by their estimated cost
+
+    Parameters
+    ----------
+    domains: list
+        The (Tranco rank, domain) pairs to crawl
+    history: dict
+        The estimated cost and whether the domain was dead, by domain
+    schedule: str
+        The schedule: rank, longest-first or interleave
+
+    Returns
+    -------
+    list
+        The (Tranco rank, domain) pairs in the order in which they should be crawled
+    """
+    if schedule == "rank":
+        return list(domains)
+
+    # Domains without history are assumed to be as expensive as a typical domain
+    known_costs = [entry["cost"] for entry in history.values() if not entry["dead"]]
+    default_cost = statistics.median(known_costs) if known_costs else VISIT_OVERHEAD
+
+    dead, alive = [], []
+    for rank, domain in domains:
+        entry = history.get(domain)
+        if entry and entry["dead"]:
+            dead.append((rank, domain))
+        else:
+            alive.append((entry["cost"] if entry else default_cost, rank, domain))
+
+    # Sort by descending cost, keeping the rank order among domains with the same cost
+    alive.sort(key=lambda item: -item[0])
+    if schedule == "interleave":
+        ordered = []
+        low, high = 0, len(alive) - 1
+        while low <= high:
+            ordered.append(alive[low])
+            if low != high:
+                ordered.append(alive[high])
+            low, high = low + 1, high - 1
+        alive = ordered
+
+    print(f"Scheduled {len(dead)} previously dead domains first and {len(alive)} domains {schedule}.")
+    return dead + [(rank, domain) for _, rank, domain in alive]
+
+
+def apply_schedule(domains, params):
+    """Order the domains to crawl according to the schedule selected by the command line arguments
+
+    Parameters
+    ----------
+    domains: iterable
+        The (Tranco rank, domain) pairs to crawl
+    params: dict
+        A dictionary with the values for all command line arguments
+
+    Returns
+    -------
+    iterable
+        The (Tranco rank, domain) pairs in the order in which they should be crawled, the rank schedule keeps
+        streaming the domains while the other schedules need to read all of them first
+    """
+    if params["schedule"] == "rank":
+        return domains
+
+    domains = list(domains)
+    history = load_history(params["history"], domains, "Mobile" if params["mobile"] else "Desktop")
+    return schedule_domains(domains, history, params["schedule"])
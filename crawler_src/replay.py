@@ -0,0 +1,84 @@
+"""Replay
+
+Recomputes the crawl data from the traffic archives stored by `crawl.py --archive`, without starting a browser. The
+requests list, cookies, third-party domains and redirections are derived again with the current code of the crawler,
+so changes to the parsing only require a replay instead of a new crawl. The archives are processed in parallel.
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from archive import load_archive
+from crawl import process_requests, convert_to_json
+from result_writer import OUTPUT_FORMATS, ResultWriter
+
+
+def parse_arguments():
+    """Parse the command line ArgumentParser
+
+    Returns
+    -------
+    dict
+        A dictionary with the values for all command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--archive", action="store", type=str, required=True,
+                        help="The directory containing the traffic archives.")
+    parser.add_argument("-o", "--output", action="store", type=str, default="../crawl_data",
+                        help="The directory to write the recomputed JSON files to.")
+    parser.add_argument("-w", "--workers", action="store", type=int, default=os.cpu_count(),
+                        help="The number of processes that replay archives in parallel.")
+    parser.add_argument("--compact-headers", action="store_true", required=False,
+                        help="Store the headers of the requests with interned names and values (see header_table.py).")
+    parser.add_argument("--output-format", action="store", type=str, required=False, default="json",
+                        choices=OUTPUT_FORMATS,
+                        help="Write an (indented) JSON file per domain, a compressed JSON file per domain or a "
+                             "compressed JSON Lines stream (see result_writer.py).")
+    return vars(parser.parse_args())
+
+
+def replay_archive(file_path, compact=False):
+    """Recompute the crawl data of a single visit from its archive
+
+    Parameters
+    ----------
+    file_path: str
+        The path of the archive
+    compact: bool, default=False
+        Whether the headers of the requests are stored in the compact representation of header_table.py
+
+    Returns
+    -------
+    dict
+        A dictionary containing the recomputed crawl data of the visit
+    """
+    url_dict, requests_url = load_archive(file_path)
+    process_requests(url_dict, requests_url, compact)
+    return url_dict
+
+
+def main():
+    """Parse arguments and replay all archives in parallel
+    """
+    args = parse_arguments()
+    files = sorted(glob.glob(os.path.join(args["archive"], "*.json.gz")))
+    os.makedirs(args["output"], exist_ok=True)
+
+    # The visits are written by the main process, so a JSON Lines stream is only written to by a single process
+    with ProcessPoolExecutor(max_workers=args["workers"]) as executor, \
+            ResultWriter(args["output"], args["output_format"], "replay") as writer:
+        futures = [executor.submit(replay_archive, file, args["compact_headers"]) for file in files]
+        for future in futures:
+            url_dict = future.result()
+            convert_to_json({"mobile": url_dict["crawl_mode"] == "Mobile"}, url_dict["website_domain"], url_dict,
+                            writer=writer)
+
+    print(f"{len(files)} archives have been replayed successfully and the data was saved to {args['output']}!")
+
+
+if __name__ == '__main__':
+    # Change the current working directory to the directory of the running file:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main()
@@ -0,0 +1,130 @@
+"""Result reader
+
+Finds and reads the crawl data in all output formats of result_writer.py: a JSON file per domain, a
+gzip or zstd compressed JSON file per domain, or a (compressed) JSON Lines stream holding one visit per line. The
+records are decoded one at a time, so a JSON Lines stream is never held in memory as a whole, and with orjson if it is
+installed. zstd requires the zstandard package.
+"""
+import glob
+import gzip
+import io
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CRAWL_FILE_EXTENSIONS = [".json", ".json.gz", ".json.zst", ".jsonl", ".jsonl.gz", ".jsonl.zst"]
+# The errors raised when decompressing the incomplete end of a stream
+TRUNCATION_ERRORS = (EOFError, zlib.error, gzip.BadGzipFile) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def decode(data):
+    """Decode a single JSON document
+
+    Parameters
+    ----------
+    data: bytes
+        The UTF-8 encoded JSON document
+
+    Returns
+    -------
+    object
+        The decoded document
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def list_crawl_files(directory):
+    """Find the crawl files in a directory
+
+    Parameters
+    ----------
+    directory: str
+        The directory with the crawl data
+
+    Returns
+    -------
+    list
+        The sorted paths of all files with one of the CRAWL_FILE_EXTENSIONS
+    """
+    return sorted(file for extension in CRAWL_FILE_EXTENSIONS for file in glob.glob(f"{directory}/*{extension}"))
+
+
+def open_crawl_file(path, mode="rb"):
+    """Open a crawl file, decompressing or compressing it based on its extension
+
+    Parameters
+    ----------
+    path: str
+        The path of the crawl file
+    mode: str, default=rb
+        The binary mode to open the file in
+
+    Returns
+    -------
+    file object
+        A binary file object
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} requires the zstandard package (pip install zstandard).")
+        if "r" in mode:
+            # A stream that was appended to consists of several zstd frames, which are read as one stream
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True,
+                                                                                  read_across_frames=True))
+        return zstandard.ZstdCompressor().stream_writer(open(path, mode), closefd=True)
+    return open(path, mode)
+
+
+def iter_records(files):
+    """Decode the visits stored in the crawl files one at a time
+
+    Parameters
+    ----------
+    files: list
+        The paths of the crawl files
+
+    Yields
+    ------
+    source: str
+        The path of the file, followed by the line number for JSON Lines streams
+    record: dict
+        The crawl data of a single visit
+    """
+    for file in files:
+        with open_crawl_file(file) as f:
+            if ".jsonl" not in os.path.basename(file):
+                yield file, decode(f.read())
+                continue
+
+            line_number = 0
+            try:
+                for line_number, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = decode(line)
+                    except ValueError:
+                        # Every record is written followed by a newline, only the last line of a stream that was
+                        # interrupted while it was written can be incomplete
+                        if not line.endswith(b"\n"):
+                            raise EOFError(f"{file} ends in an incomplete record")
+                        print(f"Skipping {file}:{line_number} because of bad formatting.")
+                        continue
+                    yield f"{file}:{line_number}", record
+            except TRUNCATION_ERRORS:
+                # A stream that was interrupted while it was written ends in an incomplete record or frame, the
+                # records before it are complete
+                print(f"Stopped reading {file} after line {line_number} because it is truncated.")
@@ -0,0 +1,130 @@
+"""Result writer
+
+Writes the crawl data of every visit in one of the output formats:
+- json: one indented JSON file per domain, the original format of the crawler
+- json.gz, json.zst: one compressed JSON file per domain
+- jsonl.gz, jsonl.zst: one compressed JSON Lines stream per run, holding one visit per line
+The compressed formats are written without indentation and, if orjson is installed, with its faster encoder. The
+JSON Lines stream is flushed after every visit, so the visits that were written before an interruption can still be
+read. All formats are read back with result_reader.py. zstd requires the zstandard package.
+"""
+import gzip
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OUTPUT_FORMATS = ["json", "json.gz", "json.zst", "jsonl.gz", "jsonl.zst"]
+# The compression level of zstd, a good trade-off between the compression ratio and the CPU time of the crawler
+ZSTD_LEVEL = 10
+
+
+def encode(url_dict):
+    """Encode the data of a visit as a single line of JSON
+
+    Parameters
+    ----------
+    url_dict: dict
+        A dictionary containing various information retrieved from the URL being accessed by the webdriver
+
+    Returns
+    -------
+    bytes
+        The UTF-8 encoded JSON document, without indentation
+    """
+    if orjson is not None:
+        return orjson.dumps(url_dict)
+    return json.dumps(url_dict, separators=(",", ":")).encode()
+
+
+def open_compressed(path, mode):
+    """Open a gzip or zstd compressed file, based on its extension
+
+    Parameters
+    ----------
+    path: str
+        The path of the file, ending in .gz or .zst
+    mode: str
+        The binary mode to open the file in: wb or ab
+
+    Returns
+    -------
+    file object
+        A binary file object that compresses the data written to it
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    if zstandard is None:
+        raise RuntimeError("The zstd output formats require the zstandard package (pip install zstandard).")
+    # Every stream appended to the file is a separate zstd frame, which are read back as one stream
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, mode), closefd=True)
+
+
+class ResultWriter:
+    """Writes the crawl data of the visits to the output directory in the selected output format"""
+
+    def __init__(self, output_dir="../crawl_data", output_format="json", name="crawl"):
+        """
+        Parameters
+        ----------
+        output_dir: str, default=../crawl_data
+            The directory to write the crawl data to
+        output_format: str, default=json
+            One of OUTPUT_FORMATS
+        name: str, default=crawl
+            The name of the JSON Lines stream, the process id is added so parallel crawlers never share a stream
+        """
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.stream_path = os.path.join(output_dir, f"{name}_{os.getpid()}.{output_format}")
+        self.stream = None
+
+    def write(self, domain, crawl_mode, url_dict):
+        """Write the data of a single visit
+
+        Parameters
+        ----------
+        domain: str
+            The domain that is visited
+        crawl_mode: str
+            The crawl mode, either Desktop or Mobile
+        url_dict: dict
+            A dictionary containing various information retrieved from the URL being accessed by the webdriver
+        """
+        if self.output_format.startswith("jsonl"):
+            if self.stream is None:
+                self.stream = open_compressed(self.stream_path, "ab")
+            self.stream.write(encode(url_dict) + b"\n")
+            self.stream.flush()
+            return
+
+        path = os.path.join(self.output_dir, f"{domain}_{crawl_mode.lower()}.{self.output_format}")
+        if self.output_format == "json":
+            with open(path, "w") as out_file:
+                if "header_table" in url_dict:
+                    # The compact representation is meant to keep the files small, so it is written without indentation
+                    json.dump(url_dict, out_file, separators=(",", ":"))
+                else:
+                    json.dump(url_dict, out_file, indent=6)
+        else:
+            with open_compressed(path, "wb") as out_file:
+                out_file.write(encode(url_dict))
+
+    def close(self):
+        """Close the JSON Lines stream, if it was opened"""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
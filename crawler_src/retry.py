@@ -0,0 +1,116 @@
+"""Retry policies
+
+Failed visits are retried according to the class of their error, as reported in the error field of the crawl data:
+- Timeout: the page check or page load timed out (or the browser crashed), which is often transient
+- Other: the domain could not be reached, which is sometimes a transient DNS or connection problem
+- TLS: the certificate of the website is invalid, which will not change by trying again
+A retry waits for an exponential backoff and is put at the end of the queue, so it does not stall the rest of the
+crawl. Every attempt starts a fresh browser session, as crawl_url creates a new webdriver for every visit. The history
+of all attempts is stored in the attempts field of the crawl data.
+"""
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+# The maximal number of attempts and the backoff (in seconds) before the first retry per error class
+RETRY_POLICIES = {
+    "Timeout": {"max_attempts": 3, "backoff": 30},
+    "Other": {"max_attempts": 2, "backoff": 120},
+    "TLS": {"max_attempts": 1, "backoff": 0}
+}
+MAX_BACKOFF = 900
+
+
+def record_attempt(attempts, url_dict, worker=None):
+    """Add the outcome of a visit to the attempt history of a domain
+
+    Parameters
+    ----------
+    attempts: list
+        The previous attempts of the domain
+    url_dict: dict
+        A dictionary containing various information retrieved from the URL being accessed by the webdriver
+    worker: str, optional
+        The id of the worker that made the attempt
+
+    Returns
+    -------
+    list
+        The attempt history, including the new attempt
+    """
+    attempt = {"attempt": len(attempts) + 1,
+               "ts": datetime.now().strftime("%d/%m/%Y %H:%M:%S.%f"),
+               "error": url_dict.get("error")}
+    if worker:
+        attempt["worker"] = worker
+    return attempts + [attempt]
+
+
+def retry_delay(attempts):
+    """Decide whether a domain should be retried given its attempt history
+
+    Parameters
+    ----------
+    attempts: list
+        The attempt history of the domain
+
+    Returns
+    -------
+    float
+        The number of seconds to wait before the next attempt, or None if the domain should not be retried
+    """
+    error = attempts[-1]["error"]
+    policy = RETRY_POLICIES.get(error)
+    if error is None or policy is None or len(attempts) >= policy["max_attempts"]:
+        return None
+
+    # Count only the consecutive attempts that failed with the same error class for the backoff
+    streak = sum(1 for _ in itertools.takewhile(lambda attempt: attempt["error"] == error, reversed(attempts)))
+    return min(policy["backoff"] * 2 ** (streak - 1), MAX_BACKOFF)
+
+
+class RetryQueue:
+    """Holds the domains that are waiting for a retry, ordered by the time at which they may be retried"""
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, rank, domain, attempts):
+        """Put a domain in the queue if its policy allows another attempt
+
+        Parameters
+        ----------
+        rank: int
+            The Tranco rank of the domain
+        domain: str
+            The domain that is visited
+        attempts: list
+            The attempt history of the domain
+
+        Returns
+        -------
+        bool
+            A boolean indicating whether the domain will be retried
+        """
+        delay = retry_delay(attempts)
+        if delay is None:
+            return False
+
+        print(f"Retrying {domain} in {delay:.0f} seconds after a {attempts[-1]['error']} error "
+              f"(attempt {len(attempts)} failed).")
+        heapq.heappush(self.heap, (time.time() + delay, next(self.counter), rank, domain, attempts))
+        return True
+
+    def __iter__(self):
+        """Yield the (Tranco rank, domain, attempt history) of the queued domains, waiting until each of them may be
+        retried, also yielding the domains that are scheduled while iterating
+        """
+        while self.heap:
+            not_before, _, rank, domain, attempts = heapq.heappop(self.heap)
+            time.sleep(max(0, not_before - time.time()))
+            yield rank, domain, attempts
@@ -0,0 +1,7 @@
+"""Makes the modules of crawler_src importable by their own names, as they are when the crawler is run from its
+directory
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
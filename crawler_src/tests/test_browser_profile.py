@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from selenium.webdriver import ChromeOptions
+
+import browser_profile
+from browser_profile import MEDIA_PATTERNS, apply_driver_toggles, apply_profile, profile_toggles, remove_profile_dir
+
+LEAN_ARGUMENTS = ["--disable-background-networking", "--disable-component-update", "--disable-gpu",
+                  "--disable-dev-shm-usage"]
+
+
+class Driver:
+    """The subset of the webdriver used to apply the toggles, which records the DevTools commands"""
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, arguments):
+        self.commands.append((command, arguments))
+
+
+@pytest.fixture
+def tmpfs(monkeypatch, tmp_path):
+    # A small tmpfs, for which Chrome is told to use /tmp for its shared memory
+    monkeypatch.setattr(browser_profile, "TMPFS_DIR", str(tmp_path))
+    monkeypatch.setattr(browser_profile, "MIN_SHM_SIZE", float("inf"))
+    return tmp_path
+
+
+def params(profile="default", block_images=False, block_media=False):
+    return {"profile": profile, "block_images": block_images, "block_media": block_media}
+
+
+def test_default_profile_adds_nothing(tmpfs):
+    toggles = profile_toggles(params())
+    chrome_options = ChromeOptions()
+
+    assert not any(value for toggle, value in toggles.items() if toggle != "preset")
+    assert apply_profile(chrome_options, toggles) is None
+    assert chrome_options.arguments == []
+    assert chrome_options.experimental_options == {}
+
+
+def test_lean_profile(tmpfs):
+    toggles = profile_toggles(params("lean"))
+    chrome_options = ChromeOptions()
+    profile_dir = apply_profile(chrome_options, toggles)
+
+    assert os.path.dirname(profile_dir) == str(tmpfs) and os.path.isdir(profile_dir)
+    assert chrome_options.arguments == [f"--user-data-dir={profile_dir}"] + LEAN_ARGUMENTS
+    remove_profile_dir(profile_dir)
+    assert not os.path.exists(profile_dir)
+
+
+def test_lean_profile_without_tmpfs(monkeypatch, tmp_path):
+    monkeypatch.setattr(browser_profile, "TMPFS_DIR", str(tmp_path / "missing"))
+    toggles = profile_toggles(params("lean"))
+
+    # Without /dev/shm the profile stays on disk, and Chrome has to use /tmp for its shared memory
+    assert not toggles["tmpfs_profile"] and toggles["disable_dev_shm_usage"]
+    assert apply_profile(ChromeOptions(), toggles) is None
+
+
+def test_block_images(tmpfs):
+    chrome_options = ChromeOptions()
+    apply_profile(chrome_options, profile_toggles(params(block_images=True)))
+
+    assert chrome_options.arguments == ["--blink-settings=imagesEnabled=false"]
+    assert chrome_options.experimental_options == {"prefs": {"profile.managed_default_content_settings.images": 2}}
+
+
+def test_block_media():
+    driver = Driver()
+    apply_driver_toggles(driver, profile_toggles(params(block_media=True)))
+
+    assert driver.commands == [("Network.enable", {}), ("Network.setBlockedURLs", {"urls": MEDIA_PATTERNS})]
+
+
+def test_media_is_not_blocked_by_default():
+    driver = Driver()
+    apply_driver_toggles(driver, profile_toggles(params(block_images=True)))
+
+    assert driver.commands == []
@@ -0,0 +1,62 @@
+from itertools import permutations
+
+from capture import parse_network_events
+
+
+def request_will_be_sent(url, redirect_status=None, request_id="1"):
+    params = {"requestId": request_id, "wallTime": 1767268800, "request": {"url": url, "headers": {"Accept": "*/*"}}}
+    if redirect_status:
+        params["redirectResponse"] = {"status": redirect_status, "headers": {"Location": url}}
+    return {"method": "Network.requestWillBeSent", "params": params}
+
+
+def response_received(status, request_id="1", **flags):
+    return {"method": "Network.responseReceived",
+            "params": {"requestId": request_id, "response": {"status": status, "headers": {}, **flags}}}
+
+
+def extra_info(kind, headers, request_id="1"):
+    method = "Network.requestWillBeSentExtraInfo" if kind == "request" else "Network.responseReceivedExtraInfo"
+    return {"method": method, "params": {"requestId": request_id, "headers": headers}}
+
+
+def summarise(requests):
+    return [(request.url, request.headers["cookie"], request.response.status_code if request.response else None,
+             request.response.headers["set-cookie"] if request.response else None) for request in requests]
+
+
+def orderings(events, *sequences):
+    """Yield every ordering of the events that keeps the order of the events within each of the sequences"""
+    for ordering in permutations(range(len(events))):
+        if all([index for index in ordering if index in sequence] == list(sequence) for sequence in sequences):
+            yield [events[index] for index in ordering]
+
+
+def test_redirect_in_any_order():
+    # A 302 from http://a/ to http://b/, the ExtraInfo events of a hop may arrive before or after the hop itself
+    events = [request_will_be_sent("http://a/"), request_will_be_sent("http://b/", redirect_status=302),
+              response_received(200), extra_info("request", {"Cookie": "a=1"}),
+              extra_info("request", {"Cookie": "b=1"}), extra_info("response", {"Set-Cookie": "a=2"}),
+              extra_info("response", {"Set-Cookie": "b=2"})]
+    expected = [("http://a/", "a=1", 302, "a=2"), ("http://b/", "b=1", 200, "b=2")]
+
+    for ordering in orderings(events, (0, 1, 2), (3, 4), (5, 6)):
+        assert summarise(parse_network_events(ordering)) == expected
+
+
+def test_cached_redirect_has_no_raw_headers():
+    # The cached 301 of http://a/ is not sent over the network, only http://b/ gets raw headers
+    events = [request_will_be_sent("http://a/"), extra_info("request", {"Cookie": "b=1"}),
+              request_will_be_sent("http://b/", redirect_status=301), response_received(200)]
+    events[2]["params"]["redirectResponse"]["fromDiskCache"] = True
+
+    assert summarise(parse_network_events(events)) == [("http://a/", None, 301, None), ("http://b/", "b=1", 200, None)]
+
+
+def test_request_without_response():
+    events = [extra_info("request", {"Cookie": "a=1"}, request_id="2"), request_will_be_sent("http://a/"),
+              request_will_be_sent("http://c/", request_id="2"), response_received(200),
+              extra_info("response", {"Set-Cookie": "a=2"})]
+
+    assert summarise(parse_network_events(events)) == [("http://a/", None, 200, "a=2"),
+                                                       ("http://c/", "a=1", None, None)]
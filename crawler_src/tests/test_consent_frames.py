@@ -0,0 +1,107 @@
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+
+from crawl import allow_cookies, rank_consent_frames, search_and_click_iframes
+
+
+class Button:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def is_displayed(self):
+        return True
+
+    def click(self):
+        self.driver.clicked = self.driver.current
+
+
+class Frame:
+    def __init__(self, frame_id, src="", has_button=False):
+        self.frame_id, self.src, self.has_button = frame_id, src, has_button
+        self.stale = False
+
+    def get_attribute(self, name):
+        return {"id": self.frame_id, "name": "", "src": self.src}[name]
+
+
+class SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def frame(self, frame):
+        if frame.stale or frame not in self.driver.frames:
+            raise StaleElementReferenceException("stale element reference")
+        self.driver.current = frame
+
+    def default_content(self):
+        self.driver.current = None
+
+
+class Driver:
+    """The subset of the webdriver used by the consent search, the iframes of the webpage are in `frames`"""
+
+    def __init__(self, frames, find_error=None):
+        self.frames = frames
+        self.find_error = find_error
+        self.current = None
+        self.clicked = None
+        self.switch_to = SwitchTo(self)
+        self.searched = []
+
+    def find_elements(self, by, value):
+        if by == By.TAG_NAME:
+            if self.find_error:
+                raise self.find_error
+            return list(self.frames)
+        self.searched.append(self.current.frame_id if self.current else None)
+        if self.current is not None and self.current.has_button and "accept" in value:
+            return [Button(self)]
+        return []
+
+    def execute_script(self, script, argument):
+        if "map" in script:
+            return [[frame.frame_id, "", frame.src] for frame in argument]
+        return []
+
+
+def test_iframes_that_cannot_be_found_are_not_searched():
+    driver = Driver([], find_error=TimeoutException("timed out"))
+
+    assert rank_consent_frames(driver, "a.com") == ([], [])
+
+
+def test_allow_cookies_survives_a_failing_iframe_search(monkeypatch, tmp_path):
+    (tmp_path / "accept_words.txt").write_text("accept\n")
+    monkeypatch.chdir(tmp_path)
+    driver = Driver([], find_error=TimeoutException("timed out"))
+
+    assert allow_cookies(driver, domain="a.com") == (False, "not_found", None)
+
+
+def test_stale_iframes_are_ranked_again():
+    consent = Frame("sp_message_iframe_1", has_button=True)
+    old = Frame("old")
+    driver = Driver([old, consent])
+    ranked_frames, _ = rank_consent_frames(driver, "a.com")
+
+    # An earlier click replaced the iframes of the webpage, including the consent iframe
+    old.stale = consent.stale = True
+    new_consent = Frame("sp_message_iframe_2", has_button=True)
+    driver.frames = [Frame("other"), new_consent]
+
+    accepted, status, locator = search_and_click_iframes(driver, "", "accept", ranked_frames, "a.com")
+    assert (accepted, status) == (True, "clicked")
+    assert driver.clicked is new_consent
+    assert locator["frame"]["id"] == "sp_message_iframe_2"
+    # The webpage itself is not searched in place of the stale iframes, and the new ranking is kept
+    assert None not in driver.searched
+    assert [frame for _, frame in ranked_frames] == [new_consent, driver.frames[0]]
+
+
+def test_iframes_are_ranked_again_once_per_accept_word():
+    driver = Driver([Frame("a")])
+    ranked_frames, _ = rank_consent_frames(driver, "a.com")
+    driver.frames = []
+
+    assert search_and_click_iframes(driver, "", "accept", ranked_frames, "a.com") == (False, "", None)
+    assert ranked_frames == []
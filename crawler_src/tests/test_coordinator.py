@@ -0,0 +1,224 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import coordinator
+import crawl
+from coordinator import MAX_LEASES, CrawlCoordinator, start_server, stop_local_workers, wait_for_crawl
+from result_reader import iter_records, list_crawl_files
+from result_writer import ResultWriter
+
+DOMAINS = [(1, "a.com"), (2, "b.com"), (3, "c.com")]
+
+# A local worker that speaks the lease protocol without a browser, the visit of c.com fails with an error
+FAKE_WORKER = textwrap.dedent("""
+    import sys
+    import time
+    import requests
+    url = sys.argv[1]
+    while True:
+        lease = requests.post(url + "/lease", json={"worker": "fake", "crawl_mode": "Desktop"}).json()
+        if lease.get("done"):
+            break
+        if "wait" in lease:
+            time.sleep(0.05)
+            continue
+        url_dict = {"website_domain": lease["domain"], "tranco_rank": lease["rank"], "crawl_mode": "Desktop"}
+        if lease["domain"] == "c.com":
+            url_dict["error"] = "TLS"
+        requests.post(url + "/complete", json={"lease_id": lease["lease_id"], "url_dict": url_dict})
+""")
+
+
+def make_coordinator(directory, domains=DOMAINS):
+    return CrawlCoordinator(domains, writer=ResultWriter(str(directory), "json"))
+
+
+def crawled(directory):
+    return {record["website_domain"]: record for _, record in iter_records(list_crawl_files(str(directory)))}
+
+
+def expire(crawl_coordinator, lease_id):
+    crawl_coordinator.leases[lease_id]["expires"] = 0
+
+
+def test_expired_lease_is_requeued_after_the_source(tmp_path):
+    crawl_coordinator = make_coordinator(tmp_path)
+    first = crawl_coordinator.lease("w1", "Desktop")
+    expire(crawl_coordinator, first["lease_id"])
+
+    # The domain of the expired lease is only leased again once the source is exhausted
+    assert [crawl_coordinator.lease("w2", "Desktop")["domain"] for _ in range(3)] == ["b.com", "c.com", "a.com"]
+    assert crawl_coordinator.status()["leased"] == 3
+
+
+def test_late_result_of_expired_lease_is_accepted_until_leased_again(tmp_path):
+    crawl_coordinator = make_coordinator(tmp_path, DOMAINS[:2])
+    first = crawl_coordinator.lease("w1", "Desktop")
+    second = crawl_coordinator.lease("w1", "Desktop")
+    expire(crawl_coordinator, first["lease_id"])
+    expire(crawl_coordinator, second["lease_id"])
+    assert not crawl_coordinator.is_done()
+    assert crawl_coordinator.status()["leased"] == 0
+
+    assert crawl_coordinator.complete(first["lease_id"], {"crawl_mode": "Desktop", "website_domain": "a.com"})
+    # b.com was leased to another worker before the result of the expired lease came in, keep its new lease
+    crawl_coordinator.lease("w2", "Desktop")
+    # The expired leases are forgotten once their domain is completed or leased again
+    assert crawl_coordinator.expired == {}
+    assert not crawl_coordinator.complete(second["lease_id"], {"crawl_mode": "Desktop", "website_domain": "b.com"})
+    assert list(crawled(tmp_path)) == ["a.com"]
+
+
+def test_domain_is_given_up_after_max_leases(tmp_path):
+    crawl_coordinator = make_coordinator(tmp_path, DOMAINS[:1])
+    for _ in range(MAX_LEASES):
+        lease = crawl_coordinator.lease("w1", "Desktop")
+        assert lease["domain"] == "a.com"
+        expire(crawl_coordinator, lease["lease_id"])
+
+    assert crawl_coordinator.is_done()
+    assert crawl_coordinator.lease("w1", "Desktop") == {"done": True}
+    record = crawled(tmp_path)["a.com"]
+    assert record["error"] == "Timeout"
+    assert crawl_coordinator.status()["failed"] == 1
+    assert crawl_coordinator.expired == {}
+
+
+def test_failed_visit_waits_for_its_retry(tmp_path):
+    crawl_coordinator = make_coordinator(tmp_path, DOMAINS[:1])
+    lease = crawl_coordinator.lease("w1", "Desktop")
+    assert crawl_coordinator.complete(lease["lease_id"], {"crawl_mode": "Desktop", "error": "Timeout"})
+
+    assert crawl_coordinator.lease("w1", "Desktop") == {"wait": 10}
+    assert not crawl_coordinator.is_done()
+    crawl_coordinator.queue[0]["not_before"] = 0
+    assert crawl_coordinator.lease("w1", "Desktop")["domain"] == "a.com"
+
+
+def test_worker_crawls_leased_domains(tmp_path, monkeypatch):
+    crawl_coordinator = make_coordinator(tmp_path)
+    server, url = start_server(crawl_coordinator, "127.0.0.1", 0)
+    monkeypatch.setattr(crawl, "crawl_url", lambda params, domain, rank: {
+        "website_domain": domain, "tranco_rank": rank, "crawl_mode": "Desktop"})
+    try:
+        crawl.crawl_from_coordinator({"worker_id": "test", "mobile": False, "coordinator": url})
+    finally:
+        server.shutdown()
+
+    assert crawl_coordinator.is_done()
+    records = crawled(tmp_path)
+    assert sorted(records) == ["a.com", "b.com", "c.com"]
+    assert records["a.com"]["attempts"][0]["worker"].startswith("test-")
+
+
+def test_worker_retries_and_gives_up_on_unreachable_coordinator(monkeypatch):
+    class NotJson:
+        def json(self):
+            raise ValueError("Expecting value")
+
+    posts = []
+    monkeypatch.setattr(crawl, "COORDINATOR_RETRY_DELAY", 0)
+    monkeypatch.setattr(crawl.python_requests, "post", lambda url, **kwargs: posts.append(url) or NotJson())
+
+    crawl.crawl_from_coordinator({"worker_id": "test", "mobile": False, "coordinator": "http://127.0.0.1:1"})
+    assert posts == ["http://127.0.0.1:1/lease"] * crawl.COORDINATOR_ATTEMPTS
+
+
+def test_complete_is_retried(monkeypatch):
+    class Reply:
+        def __init__(self, data):
+            self.data = data
+
+        def json(self):
+            return self.data
+
+    replies = iter([Reply({"lease_id": "x", "rank": 1, "domain": "a.com"}), None, Reply({"ok": True}),
+                    Reply({"done": True})])
+
+    def post(url, **kwargs):
+        reply = next(replies)
+        if reply is None:
+            raise crawl.ConnectionError()
+        return reply
+
+    monkeypatch.setattr(crawl, "COORDINATOR_RETRY_DELAY", 0)
+    monkeypatch.setattr(crawl.python_requests, "post", post)
+    monkeypatch.setattr(crawl, "crawl_url", lambda params, domain, rank: {})
+    crawl.crawl_from_coordinator({"worker_id": "test", "mobile": False, "coordinator": "http://127.0.0.1:1"})
+    assert next(replies, "exhausted") == "exhausted"
+
+
+@pytest.mark.parametrize("number", [1, 2])
+def test_local_workers_complete_the_crawl(tmp_path, number):
+    crawl_coordinator = make_coordinator(tmp_path)
+    server, url = start_server(crawl_coordinator, "127.0.0.1", 0)
+    workers = {f"local-{i}": subprocess.Popen([sys.executable, "-c", FAKE_WORKER, url]) for i in range(number)}
+    try:
+        assert wait_for_crawl({}, url, crawl_coordinator, workers, interval=0.05)
+        for process in workers.values():
+            assert process.wait(timeout=30) == 0
+    finally:
+        server.shutdown()
+
+    records = crawled(tmp_path)
+    assert sorted(records) == ["a.com", "b.com", "c.com"]
+    assert records["c.com"]["error"] == "TLS"
+    assert crawl_coordinator.status()["completed"] == 3
+
+
+def test_crawl_stops_when_all_local_workers_exit(tmp_path):
+    crawl_coordinator = make_coordinator(tmp_path)
+    # A worker that crashes at its start, e.g., because the browser is not installed
+    workers = {"local-0": subprocess.Popen([sys.executable, "-c", "raise SystemExit(1)"])}
+    workers["local-0"].wait()
+
+    assert not wait_for_crawl({}, "", crawl_coordinator, workers, interval=0.01, idle_timeout=0)
+    assert not crawl_coordinator.is_done()
+
+
+def test_crawl_waits_for_remote_workers_after_local_workers_exit(tmp_path, monkeypatch):
+    crawl_coordinator = make_coordinator(tmp_path, DOMAINS[:1])
+    workers = {"local-0": subprocess.Popen([sys.executable, "-c", "pass"])}
+    workers["local-0"].wait()
+    lease = crawl_coordinator.lease("remote", "Desktop")
+
+    # The remote worker keeps the crawl going while it holds a lease and while it keeps leasing domains
+    checks = []
+
+    def sleep(seconds):
+        checks.append(seconds)
+        if len(checks) == 3:
+            crawl_coordinator.complete(lease["lease_id"], {"crawl_mode": "Desktop", "website_domain": "a.com"})
+        elif len(checks) == 4:
+            assert crawl_coordinator.lease("remote", "Desktop") == {"done": True}
+
+    monkeypatch.setattr(coordinator.time, "sleep", sleep)
+    assert wait_for_crawl({}, "", crawl_coordinator, workers, interval=0, idle_timeout=60)
+    assert len(checks) == 4
+
+
+def test_visit_timeout_must_be_lower_than_lease_timeout(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["coordinator.py", "-i", "domains.csv", "--lease-timeout", "300"])
+    with pytest.raises(SystemExit):
+        coordinator.parse_arguments()
+
+    monkeypatch.setattr(sys, "argv", sys.argv + ["--visit-timeout", "240"])
+    assert coordinator.parse_arguments()["visit_timeout"] == 240
+
+
+def test_capture_backend_must_exist(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["coordinator.py", "-i", "domains.csv", "-c", "pcap"])
+    with pytest.raises(SystemExit):
+        coordinator.parse_arguments()
+
+
+def test_local_workers_that_do_not_exit_are_killed():
+    workers = {"local-0": subprocess.Popen([sys.executable, "-c", "pass"]),
+               "local-1": subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])}
+
+    stop_local_workers(workers, timeout=1)
+    assert workers["local-0"].returncode == 0
+    assert workers["local-1"].returncode != 0
@@ -0,0 +1,42 @@
+import os
+
+from domain_source import iter_tranco, lookup_rank, parse_rank_range, parse_shard
+
+
+def write_list(path, rows):
+    with open(path, "w") as csv_file:
+        csv_file.writelines(f"{rank},{domain}\n" for rank, domain in rows)
+
+
+def test_iter_tranco_selects_ranks_and_shards(tmp_path):
+    path = tmp_path / "tranco.csv"
+    write_list(path, [(rank, f"site-{rank}.com") for rank in range(1, 11)])
+
+    assert [rank for rank, _ in iter_tranco(path, parse_rank_range("3-6"))] == [3, 4, 5, 6]
+    assert [rank for rank, _ in iter_tranco(path, shard=parse_shard("1/3"))] == [2, 5, 8]
+
+
+def test_lookup_rank_builds_and_rebuilds_the_index(tmp_path):
+    path = tmp_path / "tranco.csv"
+    write_list(path, [(1, "a.com"), (2, "b.com"), (3, "a.com")])
+
+    # A domain that occurs multiple times keeps its best rank
+    assert lookup_rank(str(path), "a.com") == 1
+    assert lookup_rank(str(path), "b.com") == 2
+    assert lookup_rank(str(path), "missing.com") is None
+    assert os.path.isfile(f"{path}.index")
+
+    # The index is rebuilt as soon as the list changes
+    write_list(path, [(1, "c.com"), (2, "a.com"), (3, "b.com")])
+    os.utime(path, ns=(0, 0))
+    assert lookup_rank(str(path), "a.com") == 2
+    assert lookup_rank(str(path), "c.com") == 1
+
+
+def test_lookup_rank_replaces_an_index_that_is_not_a_database(tmp_path):
+    path = tmp_path / "tranco.csv"
+    write_list(path, [(1, "a.com")])
+    with open(f"{path}.index", "w") as index_file:
+        index_file.write("not a database" * 100)
+
+    assert lookup_rank(str(path), "a.com") == 1
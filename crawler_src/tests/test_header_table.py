@@ -0,0 +1,27 @@
+import copy
+
+from header_table import compact_headers
+
+REQUESTS = [
+    {"request_url": "https://a.com/", "request_headers": {"user-agent": "Mozilla/5.0", "accept": "*/*"},
+     "response_headers": {"server": "nginx", "set-cookie": "id=1"}},
+    {"request_url": "https://b.com/x.js", "request_headers": {"user-agent": "Mozilla/5.0", "accept": "*/*"},
+     "response_headers": {"server": "nginx", "content-length": "0"}},
+    {"request_url": "https://c.com/", "request_headers": {"user-agent": "Mozilla/5.0", "referer": "https://a.com/"},
+     "response_headers": None}
+]
+
+
+def test_only_repeated_values_are_interned():
+    requests = copy.deepcopy(REQUESTS)
+    header_table = compact_headers(requests)
+
+    assert header_table["names"] == ["user-agent", "accept", "server", "set-cookie", "content-length", "referer"]
+    assert sorted(header_table["values"]) == ["*/*", "Mozilla/5.0", "nginx"]
+    assert requests[0]["response_headers"] == [[2, header_table["values"].index("nginx")], [3, "id=1"]]
+    assert requests[2]["response_headers"] is None
+
+
+def test_empty_visit():
+    assert compact_headers([]) == {"names": [], "values": []}
+
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from history import VISIT_OVERHEAD, load_history, schedule_domains
+from result_writer import OUTPUT_FORMATS, ResultWriter, zstandard
+
+
+def visit(domain, crawl_mode, seconds):
+    return {"website_domain": domain, "tranco_rank": 1, "crawl_mode": crawl_mode,
+            "pageload_start_ts": "01/10/2022 00:00:00.000000",
+            "pageload_end_ts": "01/10/2022 00:00:%02d.000000" % seconds}
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_load_history_reads_every_output_format(tmp_path, output_format):
+    if "zst" in output_format and zstandard is None:
+        pytest.skip("zstandard is not installed")
+    with ResultWriter(str(tmp_path), output_format) as writer:
+        writer.write("a.com", "Desktop", visit("a.com", "Desktop", 5))
+        writer.write("a.com", "Mobile", visit("a.com", "Mobile", 50))
+        writer.write("b.com", "Desktop", {"website_domain": "b.com", "tranco_rank": 2, "crawl_mode": "Desktop",
+                                          "error": "TLS"})
+        writer.write("c.com", "Desktop", visit("c.com", "Desktop", 9))
+
+    history = load_history(str(tmp_path), [(1, "a.com"), (2, "b.com"), (4, "d.com")], "Desktop")
+
+    assert history == {"a.com": {"cost": 5 + VISIT_OVERHEAD, "dead": False}, "b.com": {"cost": 0, "dead": True}}
+
+
+def test_load_history_skips_unreadable_files(tmp_path):
+    with open(os.path.join(tmp_path, "a.com_desktop.json"), "w") as json_file:
+        json_file.write("{\"website_domain\": ")
+
+    assert load_history(str(tmp_path), [(1, "a.com")], "Desktop") == {}
+
+
+def test_schedule_domains():
+    domains = [(1, "a.com"), (2, "b.com"), (3, "c.com"), (4, "d.com")]
+    history = {"a.com": {"cost": 10, "dead": False}, "b.com": {"cost": 0, "dead": True},
+               "c.com": {"cost": 90, "dead": False}, "d.com": {"cost": 50, "dead": False}}
+
+    assert schedule_domains(domains, history, "rank") == domains
+    assert schedule_domains(domains, history, "longest-first") == [(2, "b.com"), (3, "c.com"), (4, "d.com"),
+                                                                     (1, "a.com")]
+    assert schedule_domains(domains, history, "interleave") == [(2, "b.com"), (3, "c.com"), (1, "a.com"),
+                                                                  (4, "d.com")]
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from crawl import detect_redirect_chains
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def request(url, offset, status=200, location=None):
+    headers = {"location": location} if location else {}
+    return SimpleNamespace(url=url, date=START + timedelta(seconds=offset),
+                           response=SimpleNamespace(status_code=status, headers=headers))
+
+
+def hops(chain):
+    return [(hop["url"], hop["domain"], hop["status"], hop["offset"]) for hop in chain]
+
+
+def test_chain_is_followed_through_every_hop():
+    requests = [request("https://a.com/", 0, 301, "https://www.a.com/"),
+                request("https://tracker.net/pixel", 0.1),
+                request("https://www.a.com/", 0.5, 302, "/home"),
+                request("https://www.a.com/home", 1.0)]
+
+    assert [hops(chain) for chain in detect_redirect_chains(requests)] == [[
+        ("https://a.com/", "a.com", 301, 0.0),
+        ("https://www.a.com/", "a.com", 302, 0.5),
+        ("https://www.a.com/home", "a.com", 200, 1.0)]]
+
+
+def test_uncaptured_target_ends_the_chain():
+    requests = [request("https://a.com/sync", 0, 302, "https://b.com/sync?id=1")]
+
+    [chain] = detect_redirect_chains(requests)
+    assert hops(chain) == [("https://a.com/sync", "a.com", 302, 0.0), ("https://b.com/sync?id=1", "b.com", None, None)]
+    assert chain[-1]["timestamp"] is None
+
+
+def test_repeated_urls_are_matched_to_later_requests():
+    # The same redirect happens twice, every redirection points to the next request for its target
+    requests = [request("https://www.a.com/", 0),
+                request("https://a.com/", 1, 301, "https://www.a.com/"),
+                request("https://www.a.com/", 2),
+                request("https://a.com/", 3, 301, "https://www.a.com/"),
+                request("https://www.a.com/", 4)]
+
+    chains = detect_redirect_chains(requests)
+    assert [[hop["offset"] for hop in chain] for chain in chains] == [[0.0, 1.0], [0.0, 1.0]]
+    assert [chain[0]["timestamp"] for chain in chains] == [
+        (START + timedelta(seconds=1)).strftime("%d/%m/%Y %H:%M:%S.%f"),
+        (START + timedelta(seconds=3)).strftime("%d/%m/%Y %H:%M:%S.%f")]
+
+
+def test_no_redirections():
+    assert detect_redirect_chains([request("https://a.com/", 0), request("https://a.com/x.js", 1)]) == []
+    assert detect_redirect_chains([SimpleNamespace(url="https://a.com/", date=START, response=None)]) == []
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+from result_reader import iter_records, list_crawl_files, open_crawl_file
+from result_writer import OUTPUT_FORMATS, ResultWriter, zstandard
+
+RECORDS = [{"website_domain": f"site-{i}.com", "crawl_mode": "Desktop", "tranco_rank": i,
+            "third_party_domains": [f"tracker-{j}.net" for j in range(i)], "consent_status": "clicked"}
+           for i in range(1, 30)]
+
+
+def requires_zstandard(output_format):
+    if "zst" in output_format and zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_records_round_trip(tmp_path, output_format):
+    requires_zstandard(output_format)
+    with ResultWriter(str(tmp_path), output_format) as writer:
+        for record in RECORDS:
+            writer.write(record["website_domain"], record["crawl_mode"], record)
+
+    records = [record for _, record in iter_records(list_crawl_files(str(tmp_path)))]
+
+    assert sorted(records, key=lambda record: record["tranco_rank"]) == RECORDS
+
+
+@pytest.mark.parametrize("output_format", ["jsonl.gz", "jsonl.zst"])
+def test_truncated_stream_keeps_the_complete_records(tmp_path, output_format):
+    requires_zstandard(output_format)
+    with ResultWriter(str(tmp_path), output_format) as writer:
+        for record in RECORDS[:-1]:
+            writer.write(record["website_domain"], record["crawl_mode"], record)
+        path = writer.stream_path
+    # The last record is appended as a new stream (like a restarted crawler) that is interrupted halfway
+    size = os.path.getsize(path)
+    with ResultWriter(str(tmp_path), output_format) as writer:
+        writer.write(RECORDS[-1]["website_domain"], RECORDS[-1]["crawl_mode"], RECORDS[-1])
+    with open(path, "r+b") as stream:
+        stream.truncate((size + os.path.getsize(path)) // 2)
+
+    sources_records = list(iter_records([path]))
+
+    # The interrupted last record is dropped, the records before it are read in order
+    assert [record for _, record in sources_records] == RECORDS[:-1]
+    assert [source for source, _ in sources_records][:2] == [f"{path}:1", f"{path}:2"]
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "jsonl.gz", "jsonl.zst"])
+def test_bad_line_in_the_middle_is_skipped(tmp_path, output_format, capsys):
+    requires_zstandard(output_format)
+    path = str(tmp_path / f"crawl_1.{output_format}")
+    # A crawler that was interrupted halfway through a record and restarted, and interrupted again at the end
+    with open_crawl_file(path, "wb") as stream:
+        stream.write(b"\n".join([json.dumps(RECORDS[0]).encode(), b'{"website_domain": "site-',
+                                  json.dumps(RECORDS[1]).encode(), b'{"website_domain"']))
+
+    sources_records = list(iter_records([path]))
+
+    assert sources_records == [(f"{path}:1", RECORDS[0]), (f"{path}:3", RECORDS[1])]
+    assert capsys.readouterr().out.splitlines() == [
+        f"Skipping {path}:2 because of bad formatting.",
+        f"Stopped reading {path} after line 4 because it is truncated."]
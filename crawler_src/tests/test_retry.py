@@ -0,0 +1,82 @@
+import pytest
+
+import retry
+from retry import MAX_BACKOFF, RetryQueue, record_attempt, retry_delay
+
+
+def attempts(*errors):
+    history = []
+    for error in errors:
+        history = record_attempt(history, {"error": error} if error else {}, "w1")
+    return history
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the clock of the retry module, sleeping advances the time instead of waiting"""
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, "time", lambda: now[0])
+    monkeypatch.setattr(retry.time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def test_record_attempt():
+    history = attempts("Timeout", None)
+    assert [attempt["attempt"] for attempt in history] == [1, 2]
+    assert [attempt["error"] for attempt in history] == ["Timeout", None]
+    assert history[0]["worker"] == "w1"
+
+
+@pytest.mark.parametrize("errors, delay", [
+    (["Timeout"], 30),
+    (["Timeout", "Timeout"], 60),
+    (["Timeout", "Timeout", "Timeout"], None),
+    (["Other"], 120),
+    (["Other", "Other"], None),
+    (["TLS"], None),
+    ([None], None),
+    (["Unknown"], None),
+    # Only the consecutive attempts with the same error class count for the backoff
+    (["Other", "Timeout"], 30)
+])
+def test_retry_delay(errors, delay):
+    assert retry_delay(attempts(*errors)) == delay
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setitem(retry.RETRY_POLICIES, "Timeout", {"max_attempts": 10, "backoff": 300})
+    assert retry_delay(attempts(*["Timeout"] * 5)) == MAX_BACKOFF
+
+
+def test_queue_yields_domains_in_order_of_their_retry_time(clock):
+    queue = RetryQueue()
+    assert queue.schedule(1, "a.com", attempts("Other"))
+    assert queue.schedule(2, "b.com", attempts("Timeout"))
+    assert queue.schedule(3, "c.com", attempts("Timeout", "Timeout"))
+    assert not queue.schedule(4, "d.com", attempts("TLS"))
+    assert len(queue) == 3
+
+    order = [(domain, clock[0]) for _, domain, _ in queue]
+    assert order == [("b.com", 1030.0), ("c.com", 1060.0), ("a.com", 1120.0)]
+    assert len(queue) == 0
+
+
+def test_queue_keeps_the_scheduling_order_of_equal_retry_times(clock):
+    queue = RetryQueue()
+    for rank, domain in enumerate(["a.com", "b.com", "c.com"], start=1):
+        queue.schedule(rank, domain, attempts("Timeout"))
+
+    assert [domain for _, domain, _ in queue] == ["a.com", "b.com", "c.com"]
+
+
+def test_queue_yields_domains_scheduled_while_iterating(clock):
+    queue = RetryQueue()
+    queue.schedule(1, "a.com", attempts("Timeout"))
+
+    visited = []
+    for rank, domain, history in queue:
+        visited.append((domain, len(history)))
+        # The retry fails again and is scheduled while the queue is being iterated
+        queue.schedule(rank, domain, history + attempts("Timeout"))
+
+    assert visited == [("a.com", 1), ("a.com", 2)]
@@ -0,0 +1,150 @@
+"""Visit watchdog
+
+A wedged Chrome or ChromeDriver can block a WebDriver command (e.g., driver.get, save_screenshot or find_elements)
+forever, which stalls the worker. The watchdog enforces a hard wall-clock limit on every visit from a separate thread:
+when the limit is exceeded it kills the browser processes (ChromeDriver, Chrome and all of their children), so the
+blocked command fails and the visit is recorded as a Timeout.
+
+After every visit, whether it succeeded, failed or was killed, the watchdog shuts down the proxy of SeleniumWire (which
+frees its port), removes the profile directories and kills the browser processes that are still alive. The number of
+such leaked processes is reported, so a long crawl keeps a stable memory footprint.
+"""
+import threading
+
+import psutil
+
+from browser_profile import remove_profile_dir
+
+# The hard limit (in seconds) on a visit, which must stay below the lease timeout of the coordinator
+VISIT_TIME_LIMIT = 480
+
+# The totals of this crawler process
+stats = {"visits": 0, "killed_visits": 0, "leaked_processes": 0}
+
+
+def browser_processes():
+    """Get the browser processes started by this crawler process
+
+    Returns
+    -------
+    list
+        All descendants of this process: ChromeDriver, Chrome and its helper processes
+    """
+    return psutil.Process().children(recursive=True)
+
+
+def kill_processes(processes):
+    """Kill processes and collect the profile directories they were using
+
+    Parameters
+    ----------
+    processes: list
+        The processes to kill
+
+    Returns
+    -------
+    set
+        The user data directories of the killed Chrome processes
+    """
+    profile_dirs = set()
+    for process in processes:
+        try:
+            for argument in process.cmdline():
+                if argument.startswith("--user-data-dir="):
+                    profile_dirs.add(argument.split("=", 1)[1])
+            process.kill()
+        except psutil.Error:
+            pass
+
+    psutil.wait_procs(processes, timeout=5)
+    return profile_dirs
+
+
+class VisitWatchdog:
+    """Enforces the hard time limit on a visit and cleans up the browser afterwards"""
+
+    def __init__(self, time_limit=VISIT_TIME_LIMIT):
+        """
+        Parameters
+        ----------
+        time_limit: float
+            The maximal number of seconds the visit may take
+        """
+        self.time_limit = time_limit
+        self.fired = False
+        self.profile_dirs = set()
+        self.timer = None
+
+    def fire(self):
+        """Kill the browser processes of the visit, called by the timer thread when the time limit is exceeded
+        """
+        self.fired = True
+        processes = browser_processes()
+        print(f"The visit exceeded {self.time_limit} seconds, killing {len(processes)} browser processes!")
+        self.profile_dirs |= kill_processes(processes)
+
+    def __enter__(self):
+        self.timer = threading.Timer(self.time_limit, self.fire)
+        self.timer.daemon = True
+        self.timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.cancel()
+        # The exceptions of WebDriver commands that failed because their browser was killed are expected
+        return self.fired
+
+    def cleanup(self, driver, profile_dir=None):
+        """Quit the webdriver, free the proxy port, remove the profile directories and kill any browser process that
+        is still alive
+
+        Parameters
+        ----------
+        driver: seleniumwire.webdriver or selenium.webdriver.Chrome
+            The webdriver that was used to visit the domain, or None if it could not be started
+        profile_dir: str, optional
+            The profile directory that was created for the visit
+
+        Returns
+        -------
+        int
+            The number of browser processes that were still alive after quitting the webdriver
+        """
+        if driver is not None:
+            try:
+                # SeleniumWire shuts down its proxy before quitting ChromeDriver
+                driver.quit()
+            except Exception:
+                backend = getattr(driver, "backend", None)
+                if backend is not None:
+                    try:
+                        backend.shutdown()
+                    except Exception:
+                        pass
+
+        # Give the browser processes a moment to exit after ChromeDriver is stopped
+        _, leaked = psutil.wait_procs(browser_processes(), timeout=2)
+        self.profile_dirs |= kill_processes(leaked)
+        if profile_dir:
+            self.profile_dirs.add(profile_dir)
+        for directory in self.profile_dirs:
+            remove_profile_dir(directory)
+
+        stats["visits"] += 1
+        stats["killed_visits"] += self.fired
+        stats["leaked_processes"] += len(leaked)
+        if leaked:
+            print(f"Killed {len(leaked)} browser processes that were still alive after the visit!")
+        return len(leaked)
+
+
+def summary():
+    """Get a summary of the watchdog statistics of this crawler process
+
+    Returns
+    -------
+    str
+        The number of visits, killed visits and leaked processes
+    """
+    return (f"Watchdog: {stats['visits']} browser sessions, {stats['killed_visits']} killed after the time limit, "
+            f"{stats['leaked_processes']} leaked processes reaped")